@@ -0,0 +1,95 @@
+"""
+Catalog index benchmark: build a synthetic catalog, then time `CatalogIndex.search` for the
+`build_queries` output of a few preference sets under their `budget_split` caps.
+
+    python benchmarks/bench_catalog.py                    # 1M synthetic SKUs
+    python benchmarks/bench_catalog.py --skus 3000000 --queries 2000 --out /tmp/catalog
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fashion_buddy.catalog import CATEGORY_WORDS, CatalogIndex, build_index, parse_sizes  # noqa: E402
+from fashion_buddy.shopping import STYLE_KEYWORDS, budget_split, build_queries  # noqa: E402
+
+COLORS = ["black", "white", "navy", "beige", "cream", "grey", "olive", "burgundy", "red", "blue", "pink", "camel"]
+MATERIALS = ["cotton", "linen", "wool", "silk", "denim", "leather", "suede", "satin", "knit", "jersey"]
+FITS = ["slim", "regular", "oversized", "relaxed", "straight", "cropped", "tailored"]
+BRANDS = [f"brand{i}" for i in range(400)]
+SIZES = {"Top": ["XS", "S", "M", "L", "XL"], "Bottom": ["34", "36", "38", "40", "42", "44", "30-32", "32-32"],
+         "Outerwear": ["XS", "S", "M", "L", "XL"], "Shoes": [str(s) for s in range(36, 47)], "Accessory": []}
+PRICE = {"Top": (8, 180), "Bottom": (15, 220), "Outerwear": (30, 600), "Shoes": (20, 400), "Accessory": (5, 300)}
+STYLE_WORDS = sorted({w for ws in STYLE_KEYWORDS.values() for p in ws for w in p.split()})
+
+
+def synthetic(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    cats = list(CATEGORY_WORDS)
+    for i in range(n):
+        cat = rng.choice(cats)
+        noun = rng.choice(CATEGORY_WORDS[cat])
+        words = [rng.choice(FITS), rng.choice(MATERIALS), noun]
+        if rng.random() < 0.3:
+            words.insert(0, rng.choice(STYLE_WORDS))
+        lo, hi = PRICE[cat]
+        yield {
+            "id": f"sku{i}", "title": " ".join(words), "category": cat, "brand": rng.choice(BRANDS),
+            "colors": rng.sample(COLORS, rng.randint(1, 2)),
+            "price": round(rng.uniform(lo, hi), 2),
+            "gender": rng.choice(["female", "male", "unisex"]),
+            "sizes": rng.sample(SIZES[cat], min(len(SIZES[cat]), rng.randint(2, 5))),
+            "url": f"https://shop.example/p/{i}", "retailer": rng.choice(["Zalando", "ASOS", "H&M", "Amazon"]),
+        }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--skus", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=1000)
+    ap.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "bench_catalog"))
+    ap.add_argument("--reuse", action="store_true", help="skip the build if --out already holds an index")
+    args = ap.parse_args()
+
+    build = None
+    if not (args.reuse and os.path.exists(os.path.join(args.out, "meta.json"))):
+        build = build_index(synthetic(args.skus), args.out)
+    t0 = time.perf_counter()
+    idx = CatalogIndex(args.out)
+    open_ms = (time.perf_counter() - t0) * 1e3
+
+    rng = random.Random(1)
+    prefs = [("wedding", "Smart Casual", "Female", ["navy", "cream"], "M, 38"),
+             ("date", "Evening", "Female", ["black"], "S, 37"),
+             ("office", "Business", "Male", ["grey", "white"], "L, 42"),
+             ("", "Streetwear", "", ["olive"], ""),
+             ("party", "Casual", "Male", [], "XL, 44")]
+    times, hits, bad = [], 0, 0
+    for i in range(args.queries):
+        event, vibe, gender, colors, sizes = prefs[i % len(prefs)]
+        queries = build_queries(event, vibe, gender, colors, sizes)
+        for item, cap in budget_split(rng.choice([150, 300, 600])):
+            t = time.perf_counter()
+            res = idx.search(queries[item][0], item, max_price=cap, sizes=sizes, gender=gender, k=5)
+            times.append(time.perf_counter() - t)
+            hits += bool(res)
+            want = set(parse_sizes(sizes))
+            bad += sum(h["price"] > cap or bool(want and h["sizes"] and not want & set(h["sizes"])) for h in res)
+    times.sort()
+    pct = lambda q: round(times[min(len(times) - 1, int(q / 100 * (len(times) - 1)))] * 1e3, 3)
+    print(json.dumps({
+        "skus": idx.n, "build": build, "open_ms": round(open_ms, 2),
+        "searches": len(times), "non_empty": round(hits / len(times), 3), "filter_violations": bad,
+        "search_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99), "max": round(times[-1] * 1e3, 3)},
+    }, indent=2))
+    if bad:
+        raise SystemExit(f"{bad} hits ignored the price or size filter")
+
+
+if __name__ == "__main__":
+    main()
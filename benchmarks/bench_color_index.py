@@ -0,0 +1,74 @@
+"""
+Color index benchmark: build an index of synthetic palettes, then time single and batched
+`ColorIndex.search_batch` queries and check recall@n against an exact chamfer scan.
+
+    python benchmarks/bench_color_index.py                   # 1M uniformly random palettes
+    python benchmarks/bench_color_index.py --items 3000000 --batch 32 --out /tmp/colors
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fashion_buddy.color_index import CHUNK, ColorIndex, build_color_index  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=1_000_000)
+    ap.add_argument("--k", type=int, default=4, help="colors per item palette")
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--batch", type=int, default=16)
+    ap.add_argument("-n", type=int, default=10)
+    ap.add_argument("--recall-queries", type=int, default=5, help="queries checked against the exact scan")
+    ap.add_argument("--out", default=os.path.join(tempfile.gettempdir(), "bench_colors"))
+    ap.add_argument("--reuse", action="store_true", help="skip the build if --out already holds an index")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    build = None
+    if not (args.reuse and os.path.exists(os.path.join(args.out, "meta.json"))):
+        palettes = rng.integers(0, 256, (args.items, args.k, 3), dtype=np.uint8)
+        weights = rng.random((args.items, args.k), dtype=np.float32)
+        build = build_color_index([f"item{i}" for i in range(args.items)], palettes, weights, args.out)
+        del palettes, weights
+    t0 = time.perf_counter()
+    idx = ColorIndex(args.out)
+    open_ms = (time.perf_counter() - t0) * 1e3
+
+    queries = [[tuple(int(v) for v in c) for c in rng.integers(0, 256, (4, 3))] for _ in range(args.queries)]
+    single = []
+    for q in queries:
+        t = time.perf_counter()
+        idx.search(q, n=args.n)
+        single.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    batched = idx.search_batch(queries[:args.batch], n=args.n)
+    per_query = (time.perf_counter() - t) / len(batched)
+
+    recall = []
+    for q, got in zip(queries[:args.recall_queries], batched):
+        qq, qw = idx._queries([q])
+        exact = np.concatenate([idx._dist(idx.lab[a:a + CHUNK], idx.weight[a:a + CHUNK], qq, qw)[:, 0]
+                                for a in range(0, idx.n, CHUNK)])
+        truth = {idx.ids[i].decode() for i in np.argsort(exact, kind="stable")[:args.n]}
+        recall.append(len(truth & {i for i, _ in got}) / args.n)
+
+    single.sort()
+    pct = lambda q: round(single[min(len(single) - 1, int(q / 100 * (len(single) - 1)))] * 1e3, 2)
+    print(json.dumps({
+        "items": idx.n, "k": idx.k, "build": build, "open_ms": round(open_ms, 2),
+        "single_ms": {"p50": pct(50), "p95": pct(95), "max": round(single[-1] * 1e3, 2)},
+        "batched_ms_per_query": round(per_query * 1e3, 2), "batch": len(batched),
+        f"recall@{args.n}": round(sum(recall) / len(recall), 3) if recall else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Image ingestion benchmark: legacy per-page `to_jpeg_bytes` vs `fashion_buddy.imaging.to_jpeg_bytes`.
+
+Each variant runs in a fresh subprocess so peak RSS (ru_maxrss) is not polluted by the other one.
+
+    python benchmarks/bench_ingest.py                      # synthetic 24 MP JPEG
+    python benchmarks/bench_ingest.py --image photo.jpg --min-side 1024 --max-side 1600 --quality 95
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def legacy_to_jpeg_bytes(file, min_side=512, max_side=1024, quality=90) -> bytes:
+    # verbatim copy of the helper the pages used before the shared ingestion module
+    from PIL import Image
+    img = Image.open(file).convert("RGB")
+    w, h = img.size
+    long_side, short_side = max(w, h), min(w, h)
+    if short_side < min_side:
+        scale = min_side / short_side
+    elif long_side > max_side:
+        scale = max_side / long_side
+    else:
+        scale = 1.0
+    if scale != 1.0:
+        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def make_sample(path: str, size=(6000, 4000)):
+    from PIL import Image
+    l = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 60)
+    Image.merge("RGB", (l, l.transpose(Image.Transpose.FLIP_LEFT_RIGHT), l.transpose(Image.Transpose.FLIP_TOP_BOTTOM))) \
+        .save(path, format="JPEG", quality=92)
+
+
+def run_one(variant: str, image: str, min_side: int, max_side: int, quality: int, repeat: int) -> dict:
+    with open(image, "rb") as f:
+        data = f.read()
+    if variant == "legacy":
+        fn = legacy_to_jpeg_bytes
+    else:
+        from fashion_buddy import imaging
+        fn = imaging.to_jpeg_bytes
+    times = []
+    for i in range(repeat):
+        # fresh bytes object each round so the memo in the new path doesn't hide decode cost
+        payload = data + b"\0" * i if variant == "shared" else io.BytesIO(data)
+        t0 = time.perf_counter()
+        out = fn(payload, min_side, max_side, quality)
+        times.append(time.perf_counter() - t0)
+    return {
+        "variant": variant,
+        "best_s": round(min(times), 4),
+        "mean_s": round(sum(times) / len(times), 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "out_bytes": len(out),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--image")
+    ap.add_argument("--min-side", type=int, default=512)
+    ap.add_argument("--max-side", type=int, default=1024)
+    ap.add_argument("--quality", type=int, default=90)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--make-sample", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.make_sample:
+        make_sample(args.make_sample)
+        return
+    if args.child:
+        print(json.dumps(run_one(args.child, args.image, args.min_side, args.max_side, args.quality, args.repeat)))
+        return
+
+    image = args.image
+    if not image:
+        image = os.path.join(tempfile.gettempdir(), "bench_ingest_24mp.jpg")
+        if not os.path.exists(image):
+            # in a subprocess too: Linux children inherit the parent's ru_maxrss high-water mark
+            subprocess.check_call([sys.executable, __file__, "--make-sample", image])
+    results = []
+    for variant in ("legacy", "shared"):
+        cmd = [sys.executable, __file__, "--child", variant, "--image", image,
+               "--min-side", str(args.min_side), "--max-side", str(args.max_side),
+               "--quality", str(args.quality), "--repeat", str(args.repeat)]
+        results.append(json.loads(subprocess.check_output(cmd)))
+    print(json.dumps({"image": image, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
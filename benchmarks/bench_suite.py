@@ -0,0 +1,279 @@
+"""
+Benchmark suite: micro-benchmarks of the hot helpers plus end-to-end try-on and chat runs against
+the local stand-in APIs (benchmarks/mock_servers.py), so no paid calls are made.
+
+    python benchmarks/bench_suite.py --out bench.json
+    python benchmarks/bench_suite.py --only micro
+    python benchmarks/bench_suite.py --latency segfit=2 --error-rate segfit=0.1 --requests 40 --concurrency 8
+    python benchmarks/bench_suite.py --out new.json --compare bench.json --fail-on-regression 0.15
+
+Results are JSON (with the git commit) so runs are comparable across commits; `--compare` prints
+the relative change of every timing against a previous file.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import MockConfig, MockServers, parse_per_api, sample_jpeg  # noqa: E402
+
+
+def _pct(xs, q):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(q / 100 * (len(xs) - 1))))] if xs else None
+
+
+def _stats(times, unit=1e3) -> dict:
+    """Timings in ms (unit=1e3) or s (unit=1)."""
+    r = lambda v: None if v is None else round(v * unit, 4)
+    return {"n": len(times), "best": r(min(times)), "mean": r(sum(times) / len(times)),
+            "p50": r(_pct(times, 50)), "p95": r(_pct(times, 95)), "p99": r(_pct(times, 99))}
+
+
+def timeit(fn, repeat: int, setup=None) -> dict:
+    times = []
+    for i in range(repeat):
+        arg = setup(i) if setup else None
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append(time.perf_counter() - t0)
+    return _stats(times)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+# ---------- micro ----------
+def bench_micro(repeat: int) -> dict:
+    from PIL import Image
+    from fashion_buddy.imaging import load_image, to_jpeg_bytes
+    from fashion_buddy.outfit import best_outfits
+    from fashion_buddy.semantic_cache import SemanticCache
+    from fashion_buddy.palette import extract_palette, palette_from_bytes
+    from fashion_buddy.shopping import build_queries, product_links
+
+    photo = io.BytesIO()
+    l = Image.effect_mandelbrot((3000, 2000), (-2.0, -1.2, 1.0, 1.2), 60)
+    Image.merge("RGB", (l, l.transpose(Image.Transpose.FLIP_LEFT_RIGHT), l.transpose(Image.Transpose.FLIP_TOP_BOTTOM))) \
+        .save(photo, format="JPEG", quality=90)
+    photo = photo.getvalue()
+    small = load_image(photo, min_side=1, max_side=256)
+    queries = build_queries("wedding", "Smart Casual", "Female", ["#aa3344", "navy", "cream"], "EU 38")
+    rng = random.Random(0)
+    semantic = SemanticCache(capacity=2000, kind="bench")
+    occasions = ["wedding", "job interview", "first date", "party", "office", "beach trip", "concert", "dinner"]
+    for i in range(2000):
+        semantic.set(f"what to wear to a {rng.choice(occasions)} in {rng.choice(['navy', 'black', 'red'])} "
+                     f"variant {i}", f"answer {i}", "bench")
+    candidates = {cat: [{"price": round(rng.uniform(5, 250), 2), "palette": rng.random(), "style": rng.random()}
+                        for _ in range(300)] for cat in queries}
+
+    # timings are only worth comparing while the answers are right
+    outfits = best_outfits(candidates, 600, k=10, optional=("Accessory",))
+    assert len(outfits) == 10 and all(o["price"] <= 600 for o in outfits)
+    assert [o["score"] for o in outfits] == sorted((o["score"] for o in outfits), reverse=True)
+    semantic.set("outfit for a job interview in navy", "bench answer", "bench")
+    assert semantic.get("what outfit for a job interview in navy?", "bench")[0] == "bench answer"
+
+    out = {
+        # fresh bytes per round: the memo would otherwise hide the decode/resize cost
+        "to_jpeg_bytes_cold_ms": timeit(lambda d: to_jpeg_bytes(d), repeat, setup=lambda i: photo + b"\0" * (i + 1)),
+        "to_jpeg_bytes_hot_ms": timeit(lambda: to_jpeg_bytes(photo), repeat * 20),
+        "extract_palette_ms": timeit(lambda: extract_palette(small, k=4), repeat * 4),
+        "palette_from_bytes_cold_ms": timeit(lambda d: palette_from_bytes(d, k=4), repeat,
+                                             setup=lambda i: photo + b"\1" * (i + 1)),
+        "build_queries_ms": timeit(lambda: build_queries("wedding", "Smart Casual", "Female",
+                                                         ["#aa3344", "navy", "cream"], "EU 38"), repeat * 1000),
+        "product_links_ms": timeit(lambda: [product_links(q) for qs in queries.values() for q in qs], repeat * 1000),
+        "semantic_cache_lookup_2000_ms": timeit(lambda: semantic.get("outfit for a job interview in navy", "bench"),
+                                                repeat * 100),
+        "best_outfits_300x5_ms": timeit(lambda: best_outfits(candidates, 600, k=10, optional=("Accessory",)), repeat),
+    }
+    return out
+
+
+# ---------- end-to-end ----------
+def _run_concurrent(fn, n: int, concurrency: int) -> dict:
+    times, ok = [], 0
+    errors: dict = {}
+
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            good = fn()
+        except Exception as e:
+            good, err = False, type(e).__name__
+        else:
+            err = None if good else "failed"
+        return time.perf_counter() - t0, good, err
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for dt, good, err in pool.map(one, range(n)):
+            times.append(dt)
+            ok += bool(good)
+            if err:
+                errors[err] = errors.get(err, 0) + 1
+    wall = time.perf_counter() - t0
+    return {"latency_s": _stats(times, unit=1), "success_rate": round(ok / n, 3),
+            "throughput_rps": round(n / wall, 2), "errors": errors}
+
+
+def bench_e2e(cfg: MockConfig, n: int, concurrency: int) -> dict:
+    with MockServers(cfg) as mock:
+        os.environ.update(mock.env())  # before the client modules read their base URLs
+        from fashion_buddy.backends import BACKENDS
+        from fashion_buddy.clients import connection_stats, get_openai
+        from fashion_buddy.retail_search import search_retailers
+        from fashion_buddy.shopping import build_queries
+        from fashion_buddy.tryon import segfit_with_fallback
+
+        person, garment = sample_jpeg(), sample_jpeg(color=(30, 90, 160))
+        client = get_openai(os.environ["OPENAI_API_KEY"])
+        messages = [{"role": "system", "content": "You are a stylist."},
+                    {"role": "user", "content": "Outfit for a summer wedding, budget 300€"}]
+
+        def segfit():
+            ok, *_ = segfit_with_fallback(person, garment, model_type="Speed", cn_strength=0.8, cn_end=0.5,
+                                          image_format="jpeg", image_quality=90, seed=42, budget_s=120)
+            return ok
+
+        def idm():
+            return bool(BACKENDS["idm-vton"].run(person, garment, seed=42).url)
+
+        def chat():
+            rsp = client.chat.completions.create(model="gpt-4o-mini", messages=messages)
+            return bool(rsp.choices[0].message.content)
+
+        ttft = []
+
+        def chat_stream():
+            t0 = time.perf_counter()
+            first, parts = None, []
+            for chunk in client.chat.completions.create(model="gpt-4o-mini", messages=messages, stream=True):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first = first or time.perf_counter()
+                    parts.append(chunk.choices[0].delta.content)
+            if first:
+                ttft.append(first - t0)
+            return bool(parts)
+
+        first, full = [], []
+
+        def retail(i):
+            # a new query set per run, so every fan-out is cold (20 requests)
+            queries = {slot: f"{qs[0]} r{i}" for slot, qs in
+                       build_queries("wedding", "Smart Casual", "Female", ["navy"], "M").items()}
+            t0 = time.perf_counter()
+            results = list(search_retailers(queries))
+            full.append(time.perf_counter() - t0)
+            return all(r["status"] == "ok" for r in results)
+
+        def retail_first(i):
+            t0 = time.perf_counter()
+            next(search_retailers({"Top": f"oxford shirt top f{i}"}), None)
+            first.append(time.perf_counter() - t0)
+            return True
+
+        out = {
+            "tryon_segfit": _run_concurrent(segfit, n, concurrency),
+            "tryon_idm_vton": _run_concurrent(idm, n, concurrency),
+            "chat": _run_concurrent(chat, n, concurrency),
+            "chat_stream": _run_concurrent(chat_stream, n, concurrency),
+        }
+        if ttft:
+            out["chat_stream"]["ttft_s"] = _stats(ttft, unit=1)
+        ok = sum(retail(i) for i in range(n))
+        for i in range(n):
+            retail_first(i)
+        out["retail_fan_out"] = {"all_results_s": _stats(full, unit=1), "first_result_s": _stats(first, unit=1),
+                                 "success_rate": round(ok / n, 3)}
+        out["server_requests"] = mock.requests
+        out["connections"] = connection_stats()
+    return out
+
+
+# ---------- compare ----------
+def _timings(tree, prefix=""):
+    for k, v in tree.items():
+        if isinstance(v, dict) and "p50" in v:
+            yield f"{prefix}{k}", v["p50"]
+        elif isinstance(v, dict):
+            yield from _timings(v, f"{prefix}{k}.")
+
+
+def compare(new: dict, old: dict) -> list[dict]:
+    before = dict(_timings(old.get("results", {})))
+    rows = []
+    for name, p50 in _timings(new.get("results", {})):
+        prev = before.get(name)
+        if prev and p50 is not None:
+            rows.append({"metric": name, "old_p50": prev, "new_p50": p50, "change": round(p50 / prev - 1, 3)})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--only", choices=["micro", "e2e"])
+    ap.add_argument("--repeat", type=int, default=10, help="micro-benchmark rounds (scaled up for cheap functions)")
+    ap.add_argument("--requests", type=int, default=20, help="e2e requests per scenario")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--latency", action="append", metavar="API=S", help="mock latency, e.g. segfit=2.0")
+    ap.add_argument("--jitter", action="append", metavar="API=S")
+    ap.add_argument("--error-rate", action="append", metavar="API=P", help="mock failure share, e.g. openai=0.05")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write JSON here (stdout otherwise)")
+    ap.add_argument("--compare", help="previous JSON to diff against")
+    ap.add_argument("--fail-on-regression", type=float, metavar="SHARE",
+                    help="exit 1 if any p50 got slower by more than this share (with --compare)")
+    args = ap.parse_args()
+
+    cfg = MockConfig(parse_per_api(args.latency), parse_per_api(args.jitter), parse_per_api(args.error_rate),
+                     seed=args.seed)
+    results = {}
+    if args.only in (None, "micro"):
+        results["micro"] = bench_micro(args.repeat)
+    if args.only in (None, "e2e"):
+        results["e2e"] = bench_e2e(cfg, args.requests, args.concurrency)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"repeat": args.repeat, "requests": args.requests, "concurrency": args.concurrency,
+                   "latency": cfg.latency, "jitter": cfg.jitter, "error_rate": cfg.error_rate, "seed": args.seed},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(report, json.load(f))
+        for r in rows:
+            print(f"{r['metric']:<45} {r['old_p50']:>10} → {r['new_p50']:>10}  {r['change']:+.1%}", file=sys.stderr)
+        if args.fail_on_regression is not None and any(r["change"] > args.fail_on_regression for r in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Local stand-ins for the paid APIs, for benchmarks and offline runs.
+
+One threaded HTTP server answers with the response shapes the app consumes:
+
+    POST /segmind/v1/segfit-v1.3            {"image": "<base64 jpeg>"}
+    POST /openai/v1/chat/completions        chat.completion JSON, or SSE chunks with "stream": true
+    POST /replicate/v1/files                file object with urls.get
+    POST /replicate/v1/predictions          prediction (honours "Prefer: wait")
+    GET  /replicate/v1/predictions/{id}     prediction; succeeds once its latency has passed
+    POST /replicate/v1/predictions/{id}/cancel
+    GET  /replicate/v1/models/{o}/{n}/versions/{v}
+    GET  /delivery/{name}                   the result image
+    GET  /retail/{retailer}/search?q=...    {"products": [...]} for the retailer search fan-out
+
+Latency and error rate are configurable per API. `MockServers.env()` returns the variables that
+point the app at the server (SEGMIND_BASE_URL, OPENAI_BASE_URL, REPLICATE_BASE_URL,
+RETAILER_SEARCH_URLS, keys).
+
+    python benchmarks/mock_servers.py --port 8099 --latency segfit=2.0 --error-rate segfit=0.1
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import shlex
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+APIS = ("segfit", "openai", "replicate", "retail")
+RETAILERS = ("Zalando", "ASOS", "H&M", "Amazon")
+
+
+def sample_jpeg(size=(768, 1024), color=(120, 60, 80)) -> bytes:
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+class MockConfig:
+    """Per-API latency (s), jitter (s), error rate and error status; `seed` makes failures reproducible."""
+
+    def __init__(self, latency=None, jitter=None, error_rate=None, error_status=None, seed: int = 0,
+                 tokens: int = 60):
+        self.latency = {"segfit": 1.0, "openai": 0.3, "replicate": 1.5, "retail": 0.2, **(latency or {})}
+        self.jitter = {api: 0.0 for api in APIS} | (jitter or {})
+        self.error_rate = {api: 0.0 for api in APIS} | (error_rate or {})
+        self.error_status = {"segfit": 503, "openai": 500, "replicate": 500, "retail": 503, **(error_status or {})}
+        self.tokens = tokens  # completion length for OpenAI answers
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, api: str) -> float:
+        with self._lock:
+            return max(0.0, self.latency[api] + self._rng.uniform(-1, 1) * self.jitter[api])
+
+    def fails(self, api: str) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate[api]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    server: "_Server"
+
+    def log_message(self, *args):
+        pass
+
+    # ---- helpers ----
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _send(self, status: int, payload, content_type: str = "application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, api: str):
+        status = self.server.config.error_status[api]
+        self._send(status, {"error": {"message": f"mock {api} failure", "code": status}})
+
+    def _count(self, api: str):
+        with self.server.lock:
+            self.server.requests[api] = self.server.requests.get(api, 0) + 1
+
+    # ---- routing ----
+    def do_GET(self):
+        path, _, qs = self.path.partition("?")
+        if path.startswith("/retail/") and path.endswith("/search"):
+            return self._retail(urllib.parse.unquote(path.split("/")[2]), urllib.parse.parse_qs(qs).get("q", [""])[0])
+        if path.startswith("/delivery/"):
+            return self._send(200, self.server.image, "image/jpeg")
+        if path.startswith("/replicate/v1/predictions/"):
+            return self._prediction(path.rsplit("/", 1)[-1])
+        if path.startswith("/replicate/v1/models/") and "/versions/" in path:
+            return self._send(200, {"id": path.rsplit("/", 1)[-1], "created_at": "2024-01-01T00:00:00Z",
+                                    "cog_version": "0.9", "openapi_schema": {}})
+        self._send(404, {"detail": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self._body()
+        if path.startswith("/segmind/"):
+            return self._segfit()
+        if path == "/openai/v1/chat/completions":
+            return self._chat(json.loads(body or b"{}"))
+        if path == "/replicate/v1/files":
+            return self._file(len(body))
+        if path == "/replicate/v1/predictions":
+            return self._create_prediction(json.loads(body or b"{}"))
+        if path.startswith("/replicate/v1/predictions/") and path.endswith("/cancel"):
+            pid = path.split("/")[-2]
+            with self.server.lock:
+                p = self.server.predictions.get(pid)
+                if p:
+                    p["canceled"] = True
+            return self._prediction(pid)
+        self._send(404, {"detail": "not found"})
+
+    # ---- SegFit ----
+    def _segfit(self):
+        self._count("segfit")
+        time.sleep(self.server.config.delay("segfit"))
+        if self.server.config.fails("segfit"):
+            return self._error("segfit")
+        self._send(200, {"image": base64.b64encode(self.server.image).decode(), "status": "Success"})
+
+    # ---- retailer search ----
+    def _retail(self, retailer: str, query: str):
+        self._count("retail")
+        time.sleep(self.server.config.delay("retail"))
+        if self.server.config.fails("retail"):
+            return self._error("retail")
+        rng = random.Random(f"{retailer}|{query}")
+        words = query.split() or ["item"]
+        self._send(200, {"products": [
+            {"title": " ".join(rng.sample(words, min(3, len(words)))), "price": round(rng.uniform(10, 200), 2),
+             "currency": "EUR", "url": f"{self.server.base_url}/p/{retailer}/{i}"}
+            for i in range(rng.randint(3, 10))
+        ]})
+
+    # ---- OpenAI ----
+    def _chat(self, req: dict):
+        self._count("openai")
+        cfg = self.server.config
+        delay = cfg.delay("openai")
+        if cfg.fails("openai"):
+            time.sleep(delay)
+            return self._error("openai")
+        words = [f"word{i}" for i in range(cfg.tokens)]
+        cid, created, model = "chatcmpl-" + uuid.uuid4().hex[:12], int(time.time()), req.get("model", "gpt-4o-mini")
+        # ~4 characters per token, like the app's offline estimate
+        prompt = sum(len(m.get("content") or "") // 4 + 4 for m in req.get("messages", [])) + 2
+        usage = {"prompt_tokens": prompt, "completion_tokens": len(words), "total_tokens": prompt + len(words)}
+        if not req.get("stream"):
+            time.sleep(delay)
+            return self._send(200, {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": usage,
+            })
+        # time to first token ≈ half the latency, the rest spread over the tokens
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(delay / 2)
+        per_token = delay / 2 / max(1, len(words))
+        for i, w in enumerate(words):
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"content": (" " if i else "") + w}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            time.sleep(per_token)
+        done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\n".encode())
+        if (req.get("stream_options") or {}).get("include_usage"):
+            last = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(last)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    # ---- Replicate ----
+    def _file(self, size: int):
+        self._count("replicate_files")
+        fid = uuid.uuid4().hex[:12]
+        base = self.server.base_url
+        self._send(201, {
+            "id": fid, "name": "upload.jpg", "content_type": "image/jpeg", "size": size, "etag": fid,
+            "checksums": {}, "metadata": {}, "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2099-01-01T00:00:00Z",
+            "urls": {"get": f"{base}/replicate/v1/files/{fid}"},
+        })
+
+    def _create_prediction(self, req: dict):
+        self._count("replicate")
+        cfg = self.server.config
+        pid = uuid.uuid4().hex[:16]
+        p = {"id": pid, "version": req.get("version"), "input": req.get("input", {}),
+             "ready_at": time.monotonic() + cfg.delay("replicate"), "failed": cfg.fails("replicate"),
+             "canceled": False}
+        with self.server.lock:
+            self.server.predictions[pid] = p
+        wait = self.headers.get("Prefer", "")
+        if wait.startswith("wait"):
+            limit = float(wait.split("=", 1)[1]) if "=" in wait else 60.0
+            time.sleep(max(0.0, min(limit, p["ready_at"] - time.monotonic())))
+        self._prediction(pid, status_code=201)
+
+    def _prediction(self, pid: str, status_code: int = 200):
+        with self.server.lock:
+            p = self.server.predictions.get(pid)
+        if p is None:
+            return self._send(404, {"detail": "prediction not found"})
+        ready = time.monotonic() >= p["ready_at"]
+        if p["canceled"]:
+            status, output, error = "canceled", None, None
+        elif not ready:
+            status, output, error = "processing", None, None
+        elif p["failed"]:
+            status, output, error = "failed", None, "mock replicate failure"
+        else:
+            status, output, error = "succeeded", f"{self.server.base_url}/delivery/{pid}.jpg", None
+        self._send(status_code, {
+            "id": pid, "model": "mock/model", "version": p["version"], "status": status, "input": p["input"],
+            "output": output, "logs": "", "error": error, "metrics": {},
+            "created_at": "2024-01-01T00:00:00Z", "started_at": None, "completed_at": None,
+            "urls": {"get": f"{self.server.base_url}/replicate/v1/predictions/{pid}",
+                     "cancel": f"{self.server.base_url}/replicate/v1/predictions/{pid}/cancel"},
+        })
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, config: MockConfig, image: bytes):
+        super().__init__(addr, _Handler)
+        self.config = config
+        self.image = image
+        self.lock = threading.Lock()
+        self.requests: dict = {}
+        self.predictions: dict = {}
+        self.base_url = f"http://{addr[0]}:{self.server_address[1]}"
+
+
+class MockServers:
+    """Context manager running the stand-in server on a background thread."""
+
+    def __init__(self, config: MockConfig | None = None, host: str = "127.0.0.1", port: int = 0,
+                 image: bytes | None = None):
+        self.server = _Server((host, port), config or MockConfig(), image or sample_jpeg())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        return self.server.base_url
+
+    @property
+    def requests(self) -> dict:
+        with self.server.lock:
+            return dict(self.server.requests)
+
+    def env(self) -> dict:
+        return {
+            "SEGMIND_BASE_URL": f"{self.base_url}/segmind/v1",
+            "SEGMIND_API_KEY": "mock",
+            "OPENAI_BASE_URL": f"{self.base_url}/openai/v1",
+            "OPENAI_API_KEY": "mock",
+            "REPLICATE_BASE_URL": f"{self.base_url}/replicate",
+            "REPLICATE_API_TOKEN": "mock",
+            "REPLICATE_POLL_INTERVAL": "0.1",
+            "RETAILER_SEARCH_URLS": json.dumps(
+                {r: f"{self.base_url}/retail/{urllib.parse.quote(r)}/search?q={{q}}" for r in RETAILERS}),
+        }
+
+    def start(self) -> "MockServers":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-apis", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_per_api(items, cast=float) -> dict:
+    out = {}
+    for item in items or []:
+        api, _, value = item.partition("=")
+        if api not in APIS:
+            raise SystemExit(f"unknown API {api!r}; expected one of {', '.join(APIS)}")
+        out[api] = cast(value)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency", action="append", metavar="API=S")
+    ap.add_argument("--jitter", action="append", metavar="API=S")
+    ap.add_argument("--error-rate", action="append", metavar="API=P")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    cfg = MockConfig(parse_per_api(args.latency), parse_per_api(args.jitter), parse_per_api(args.error_rate),
+                     seed=args.seed)
+    servers = MockServers(cfg, args.host, args.port)
+    for k, v in servers.env().items():
+        print(f"export {k}={shlex.quote(v)}")
+    try:
+        servers.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
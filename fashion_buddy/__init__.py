@@ -0,0 +1 @@
+"""Shared helpers for the AI Fashion Buddy Streamlit pages."""
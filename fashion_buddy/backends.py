@@ -0,0 +1,274 @@
+"""
+Common try-on backend interface.
+
+Every backend takes normalized person/garment JPEG bytes (Replicate backends also accept URLs)
+and returns a `TryOnResult`. Replicate backends run as tracked predictions (fashion_buddy.predictions);
+pass `on_prediction=` to get each handle, heartbeat and cancel it from the page. Backends take a
+`cancel=` threading.Event and stop early once it is set. They record their own latencies, which `run_hedged` uses:
+if the primary hasn't answered by its p-th percentile latency, the secondary is fired too, the
+first successful answer wins and the other call is canceled.
+"""
+import abc
+import io
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from fashion_buddy.clients import get_replicate, get_secret
+from fashion_buddy.metrics import span
+
+IDM_VTON = "cuuupid/idm-vton:005205c5e7a4053b04418089f3a22b2b62705f0339ddad0b3f6db0d0e66aabc2"
+ECOM_VTON = "wolverinn/ecommerce-virtual-try-on:39860afc9f164ce9734d5666d17a771f986dd2bd3ad0935d845054f73bbec447"
+
+HEDGE_DEFAULT_DELAY_S = float(os.getenv("HEDGE_DEFAULT_DELAY_S", "20"))
+HEDGE_MIN_SAMPLES = 5
+
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", "8")), thread_name_prefix="hedge")
+# run_hedged itself waits on _hedge_pool, so page-submitted runs get their own threads
+_page_pool = ThreadPoolExecutor(max_workers=int(os.getenv("HEDGE_WORKERS", "8")), thread_name_prefix="tryon-page")
+
+
+@dataclass
+class TryOnResult:
+    backend: str
+    image: bytes | None = None
+    url: str | None = None
+    raw: object = None
+    latency_s: float = 0.0
+    hedged: bool = False
+    attempts: list = field(default_factory=list)
+
+
+def extract_first_image_url(output):
+    """Достаём первый URL из разных форматов ответа (строка, список, dict, FileOutput)."""
+    urls = []
+    def consider(x):
+        if x is None:
+            return
+        if isinstance(x, str) and x.startswith(("http://", "https://")):
+            urls.append(x); return
+        for attr in ("url", "href"):
+            try:
+                val = getattr(x, attr, None)
+                if isinstance(val, str) and val.startswith(("http://", "https://")):
+                    urls.append(val); return
+            except Exception:
+                pass
+        try:
+            s = str(x)
+            if s.startswith(("http://", "https://")):
+                urls.append(s)
+        except Exception:
+            pass
+    if isinstance(output, dict):
+        for key in ("images", "image", "output", "result", "results", "urls", "url", "data"):
+            if key in output:
+                v = output[key]
+                if isinstance(v, list):
+                    for it in v: consider(it)
+                else:
+                    consider(v)
+    elif isinstance(output, list):
+        for it in output: consider(it)
+    else:
+        consider(output)
+    return urls[0] if urls else None
+
+
+class TryOnBackend(abc.ABC):
+    """Base class: subclasses implement `_run`; `run` adds timing and latency bookkeeping."""
+
+    name = "base"
+    timed_stage = "tryon"  # end-to-end span; None when the implementation records its own
+
+    def __init__(self):
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _run(self, person, garment, **params) -> TryOnResult:
+        """One try-on call; raise on failure."""
+
+    def run(self, person, garment, **params) -> TryOnResult:
+        t0 = time.perf_counter()
+        if self.timed_stage:
+            with span(self.timed_stage, self.name):
+                res = self._run(person, garment, **params)
+        else:
+            res = self._run(person, garment, **params)
+        res.latency_s = time.perf_counter() - t0
+        with self._lock:
+            self._latencies.append(res.latency_s)
+        return res
+
+    def latency_percentile(self, p: float) -> float | None:
+        """p in 0..100 over recent successful calls; None until there are enough samples."""
+        with self._lock:
+            xs = sorted(self._latencies)
+        if len(xs) < HEDGE_MIN_SAMPLES:
+            return None
+        return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+
+class SegFitBackend(TryOnBackend):
+    name = "segfit"
+    timed_stage = None  # segfit_with_fallback records the "tryon" span
+
+    def __init__(self, api_key: str | None = None):
+        super().__init__()
+        self.api_key = api_key
+
+    def _run(self, person, garment, model_type="Balanced", cn_strength=0.8, cn_end=0.5,
+             image_format="jpeg", image_quality=95, seed=-1, timeout_s=240, cancel=None, **_):
+        from fashion_buddy.tryon import segfit_with_fallback
+        ok, data, resp, attempts = segfit_with_fallback(
+            person, garment, model_type=model_type, cn_strength=cn_strength, cn_end=cn_end,
+            image_format=image_format, image_quality=image_quality, seed=seed, budget_s=timeout_s,
+            api_key=self.api_key or get_secret("SEGMIND_API_KEY"), cancel=cancel)
+        if not ok:
+            raise RuntimeError(f"SegFit HTTP {getattr(resp, 'status_code', '?')}: {str(data)[:300]}")
+        return TryOnResult(self.name, image=data, raw={"status": resp.status_code}, attempts=attempts[:-1])
+
+
+class ReplicateBackend(TryOnBackend):
+    """A Replicate model; `key_sets` are the (person, garment) input-key pairs to try in order."""
+
+    def __init__(self, name: str, ref: str, key_sets, seed_key: str | None = None, api_token: str | None = None):
+        super().__init__()
+        self.name = name
+        self.ref = ref
+        self.key_sets = list(key_sets)
+        self.seed_key = seed_key
+        self.api_token = api_token
+
+    def _run(self, person, garment, seed=-1, on_prediction=None, cancel=None, **_):
+        from fashion_buddy.predictions import start_prediction
+        from fashion_buddy.uploads import upload_image, upload_pair
+        token = self.api_token or get_secret("REPLICATE_API_TOKEN")
+        if not token:
+            raise RuntimeError("Missing REPLICATE_API_TOKEN")
+        client = get_replicate(token)
+        if isinstance(person, str) and isinstance(garment, str):
+            person_url, garment_url = person, garment
+        elif isinstance(person, str):
+            person_url, garment_url = person, upload_image(client, garment, "garment.jpg")
+        elif isinstance(garment, str):
+            person_url, garment_url = upload_image(client, person, "person.jpg"), garment
+        else:
+            person_url, garment_url = upload_pair(client, person, garment)
+        errors = []
+        for pk, gk in self.key_sets:
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError(f"{self.name}: canceled")
+            inp = {pk: person_url, gk: garment_url}
+            if self.seed_key and seed >= 0:
+                inp[self.seed_key] = int(seed)
+            try:
+                handle = start_prediction(client, self.ref, inp, backend=self.name)
+            except Exception as e:  # wrong input keys for this build → try the next pair
+                errors.append(f"{pk}/{gk}: {e}")
+                continue
+            if on_prediction is not None:
+                on_prediction(handle)  # the page heartbeats it; otherwise we do, so the reaper leaves it alone
+            handle.wait(heartbeat=on_prediction is None, cancel=cancel)
+            if handle.status == "canceled":
+                raise RuntimeError(f"{self.name}: prediction {handle.id} canceled")
+            if handle.status != "succeeded":
+                errors.append(f"{pk}/{gk}: {handle.error or handle.status}")
+                continue
+            output = handle.output
+            url = extract_first_image_url(output)
+            if not url:
+                raise RuntimeError("No image URL parsed from response.")
+            return TryOnResult(self.name, url=url, raw=output, attempts=errors)
+        raise RuntimeError("; ".join(errors) or "no input key set configured")
+
+
+class MockBackend(TryOnBackend):
+    """Local stand-in: sleeps, optionally fails, returns the person photo with a garment inset."""
+
+    def __init__(self, name: str = "mock", latency_s: float = 1.0, jitter_s: float = 0.0, fail_rate: float = 0.0,
+                 seed: int = 0):
+        super().__init__()
+        self.name = name
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+
+    def _run(self, person, garment, cancel=None, **_):
+        from PIL import Image
+        with self._lock:
+            delay = self.latency_s + self._rng.random() * self.jitter_s
+            fail = self._rng.random() < self.fail_rate
+        if cancel is None:
+            time.sleep(delay)
+        elif cancel.wait(delay):
+            raise RuntimeError(f"{self.name}: canceled")
+        if fail:
+            raise RuntimeError(f"{self.name}: simulated failure")
+        base = Image.open(io.BytesIO(person)).convert("RGB")
+        inset = Image.open(io.BytesIO(garment)).convert("RGB")
+        inset.thumbnail((base.width // 2, base.height // 2))
+        base.paste(inset, ((base.width - inset.width) // 2, (base.height - inset.height) // 2))
+        buf = io.BytesIO()
+        base.save(buf, format="JPEG", quality=90)
+        return TryOnResult(self.name, image=buf.getvalue())
+
+
+BACKENDS = {
+    "idm-vton": ReplicateBackend("idm-vton", IDM_VTON, [("human_img", "garm_img"), ("human_image", "cloth_image")],
+                                 seed_key="seed"),
+    "ecom-vton": ReplicateBackend("ecom-vton", ECOM_VTON,
+                                  [("face_image", "commerce_image"), ("image_person", "image_clothing")]),
+    "segfit": SegFitBackend(),
+    "mock": MockBackend(),
+}
+
+
+def run_hedged(primary: TryOnBackend, secondary: TryOnBackend | None, person, garment, *,
+               percentile: float = 95.0, default_delay_s: float = HEDGE_DEFAULT_DELAY_S,
+               timeout_s: float | None = None, **params) -> TryOnResult:
+    """
+    Run `primary`; if it hasn't answered within its p-th percentile latency, also fire `secondary`
+    and return whichever succeeds first. If one fails, the other still gets its chance. Once there
+    is a winner (or `timeout_s` ran out) the calls still running are canceled: Replicate predictions
+    right away, SegFit before its next attempt.
+    """
+    if secondary is None:
+        return primary.run(person, garment, **params)
+    delay = primary.latency_percentile(percentile) or default_delay_s
+    started = time.monotonic()
+    cancel = threading.Event()
+    futures = {_hedge_pool.submit(primary.run, person, garment, cancel=cancel, **params): primary}
+    try:
+        done, _ = wait(futures, timeout=delay)
+        if not done or next(iter(done)).exception() is not None:
+            futures[_hedge_pool.submit(secondary.run, person, garment, cancel=cancel, **params)] = secondary
+        errors = []
+        pending = set(futures)
+        while pending:
+            remaining = None if timeout_s is None else max(0.0, timeout_s - (time.monotonic() - started))
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                if fut.exception() is None:
+                    res = fut.result()
+                    res.hedged = len(futures) > 1
+                    res.attempts = errors + res.attempts
+                    return res
+                errors.append(f"{futures[fut].name}: {fut.exception()}")
+        raise RuntimeError("; ".join(errors) or f"no backend answered within {timeout_s}s")
+    finally:
+        cancel.set()  # only the loser (if any) is still looking at it
+
+
+
+def submit_hedged(primary: TryOnBackend, secondary: TryOnBackend | None, person, garment, **kwargs):
+    """`run_hedged` off the script thread: returns a Future the page polls from a fragment."""
+    return _page_pool.submit(run_hedged, primary, secondary, person, garment, **kwargs)
@@ -0,0 +1,254 @@
+"""Two-tier result cache: in-process LRU + optional on-disk tier with TTL and a size cap."""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(*parts) -> str:
+    """Stable sha256 hex digest of JSON-serialisable parts."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResultCache:
+    """
+    Thread-safe cache keyed by hex digests.
+    Memory tier: OrderedDict LRU with at most `max_items` entries.
+    Disk tier (if `disk_dir` is set): one pickle file per key; entries older than `ttl_s`
+    are treated as misses, and the oldest-used files are evicted once the tier exceeds `max_disk_bytes`.
+    """
+
+    def __init__(self, max_items: int = 256, disk_dir: str | None = None,
+                 ttl_s: float | None = 7 * 24 * 3600, max_disk_bytes: int = 64 * 1024 * 1024):
+        self.max_items = max(1, int(max_items))
+        self.disk_dir = disk_dir
+        self.ttl_s = ttl_s
+        self.max_disk_bytes = int(max_disk_bytes)
+        self._mem: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    # ---- disk helpers ----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + ".pkl")
+
+    def _disk_entries(self):
+        out = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pkl"):
+                continue
+            p = os.path.join(self.disk_dir, name)
+            try:
+                stt = os.stat(p)
+            except OSError:
+                continue
+            out.append((p, stt.st_size, stt.st_mtime))
+        return out
+
+    def _expired(self, mtime: float) -> bool:
+        return self.ttl_s is not None and time.time() - mtime > self.ttl_s
+
+    def _disk_get(self, key: str):
+        p = self._path(key)
+        try:
+            stt = os.stat(p)
+            if self._expired(stt.st_mtime):
+                self._disk_remove(p, stt.st_size)
+                return None
+            with open(p, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None
+        return value
+
+    def _disk_set(self, key: str, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_disk_bytes:
+            return
+        p = self._path(key)
+        tmp = p + ".tmp"
+        try:
+            old = os.path.getsize(p) if os.path.exists(p) else 0
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, p)
+        except OSError:
+            return
+        self._disk_bytes += len(data) - old
+        if self._disk_bytes > self.max_disk_bytes:
+            self._disk_evict()
+
+    def _disk_remove(self, path: str, size: int):
+        try:
+            os.remove(path)
+            self._disk_bytes -= size
+            self.evictions += 1
+        except OSError:
+            pass
+
+    def _disk_evict(self):
+        entries = sorted(self._disk_entries(), key=lambda e: e[2])  # oldest mtime first
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        # drop expired entries first, then oldest until we fit into 90% of the cap
+        target = int(self.max_disk_bytes * 0.9)
+        for p, size, mtime in entries:
+            if self._disk_bytes <= target and not self._expired(mtime):
+                continue
+            self._disk_remove(p, size)
+
+    # ---- public API ----
+    def get(self, key: str, default=None):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return self._mem[key]
+            if self.disk_dir:
+                value = self._disk_get(key)
+                if value is not None:
+                    try:
+                        os.utime(self._path(key))  # mtime doubles as "last used" for eviction
+                    except OSError:
+                        pass
+                    self._mem_set(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def _mem_set(self, key: str, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value):
+        if value is None:
+            return
+        with self._lock:
+            self._mem_set(key, value)
+            if self.disk_dir:
+                self._disk_set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            if self.disk_dir:
+                for p, size, _ in self._disk_entries():
+                    self._disk_remove(p, size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / total, 3) if total else 0.0,
+                "mem_items": len(self._mem),
+                "disk_bytes": self._disk_bytes if self.disk_dir else 0,
+            }
+
+
+class BlobCache:
+    """
+    Content-addressed on-disk store for raw bytes (e.g. result images).
+    One file per key, sharded by the first two hex chars; file mtime is the LRU clock.
+    Once the store grows past `max_bytes`, least-recently-used files are removed down to 90% of the cap.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _entries(self):
+        out = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                p = os.path.join(dirpath, name)
+                try:
+                    stt = os.stat(p)
+                except OSError:
+                    continue
+                out.append((p, stt.st_size, stt.st_mtime))
+        return out
+
+    def get(self, key: str) -> bytes | None:
+        p = self._path(key)
+        with self._lock:
+            try:
+                with open(p, "rb") as f:
+                    data = f.read()
+                os.utime(p)
+            except OSError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        if not data or len(data) > self.max_bytes:
+            return
+        p = self._path(key)
+        with self._lock:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            old = os.path.getsize(p) if os.path.exists(p) else 0
+            tmp = p + ".tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, p)
+            except OSError:
+                return
+            self._bytes += len(data) - old
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        self._bytes = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for p, size, _ in entries:
+            if self._bytes <= target:
+                break
+            try:
+                os.remove(p)
+                self._bytes -= size
+                self.evictions += 1
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "bytes": self._bytes,
+            }
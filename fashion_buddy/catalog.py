@@ -0,0 +1,397 @@
+"""
+Retailer catalog index: product feeds (local JSON / JSON-lines / CSV) → a memory-mapped inverted index.
+
+Layout (one directory of .npy files, opened with mmap so a worker starts in milliseconds):
+  - documents are renumbered by (category, price), so "category X under €cap" is one contiguous
+    doc-id range found with two binary searches — no per-document filtering for those two;
+  - `terms` is a sorted fixed-width byte array (lookup = binary search, no vocabulary dict to load);
+  - postings are CSR: `post_off` (V+1) into `post_docs` (uint32 doc ids, ascending per term);
+  - per-doc columns: price float32, gender uint8 (0 unisex, 1 female, 2 male), sized uint8;
+  - sizes are CSR postings like terms: `size_off` (S+1) into `size_docs`, names in meta.json;
+  - display fields are JSON per doc in one byte blob, decoded only for returned hits.
+
+A query intersects each term's postings with the (category, price) range, scores candidates by
+summed idf, then filters by gender section and size. Very common terms (postings larger than
+MAX_SCAN inside the range) only add to the score of candidates found through rarer terms.
+
+    python -m fashion_buddy.catalog build feeds/*.json feeds/*.csv --out .cache/catalog
+    python -m fashion_buddy.catalog search "oxford shirt navy" --category Top --max-price 60 --size M
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import re
+import threading
+import time
+from array import array
+
+import numpy as np
+
+CATALOG_DIR = os.getenv("CATALOG_DIR", os.path.join(".cache", "catalog"))
+TERM_BYTES = 32        # longer terms are truncated (and may share a posting list)
+MAX_SCAN = 5_000       # postings per term scanned for candidates; above that a term only boosts scores
+CATEGORIES = ["Top", "Bottom", "Outerwear", "Shoes", "Accessory"]  # same names as shopping.DEFAULT_ITEMS
+CATEGORY_WORDS = {
+    "Top": ["top", "shirt", "t-shirt", "tee", "blouse", "sweater", "jumper", "hoodie", "polo", "cardigan",
+            "tank", "sweatshirt", "knit"],
+    "Bottom": ["pants", "trousers", "jeans", "chinos", "skirt", "shorts", "leggings", "cargo", "bottom"],
+    "Outerwear": ["jacket", "coat", "blazer", "parka", "trench", "vest", "gilet", "outerwear"],
+    "Shoes": ["shoes", "sneakers", "boots", "heels", "loafers", "sandals", "derby", "pumps", "trainers", "flats"],
+    "Accessory": ["accessory", "bag", "belt", "scarf", "hat", "cap", "necklace", "earrings", "watch", "sunglasses"],
+}
+# query words that are filters here, not search terms
+GENDER_WORDS = {"women": 1, "woman": 1, "female": 1, "womens": 1, "ladies": 1,
+                "men": 2, "man": 2, "male": 2, "mens": 2, "unisex": 0}
+_TOKEN = re.compile(r"[0-9a-zà-ÿß]+(?:-[0-9a-zà-ÿß]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    out = []
+    for tok in _TOKEN.findall((text or "").lower()):
+        out.append(tok)
+        if "-" in tok:
+            out.extend(p for p in tok.split("-") if len(p) > 1)
+    return [t for t in out if len(t) > 1 or t.isdigit()]
+
+
+def normalize_size(s: str) -> str:
+    s = str(s).strip().upper().replace("/", "-").replace(" ", "")
+    for region in ("EU", "US", "UK", "IT", "FR"):
+        if s.startswith(region) and len(s) > len(region):
+            s = s[len(region):]
+        elif s.endswith(region) and len(s) > len(region):
+            s = s[:-len(region)]
+    return s
+
+
+def parse_sizes(text) -> list[str]:
+    """"EU 38, M, 42/32, 40 EU" → ["38", "M", "42-32", "40"]."""
+    if not text:
+        return []
+    parts = text if isinstance(text, (list, tuple)) else re.split(r"[,;|]", str(text))
+    return [n for n in (normalize_size(p) for p in parts) if n]
+
+
+def parse_gender(value) -> int:
+    v = str(value or "").strip().lower()
+    if v in ("f", "w"):
+        return 1
+    if v == "m":
+        return 2
+    return GENDER_WORDS.get(v, GENDER_WORDS.get(v.rstrip("s"), 0))
+
+
+def guess_category(*texts) -> int:
+    words = set(tokenize(" ".join(t for t in texts if t)))
+    for i, name in enumerate(CATEGORIES):
+        if name.lower() in words:
+            return i
+    for i, name in enumerate(CATEGORIES):
+        if words & set(CATEGORY_WORDS[name]):
+            return i
+    return CATEGORIES.index("Accessory")
+
+
+# ---------- feeds ----------
+def iter_feed(path: str):
+    """Product dicts from a .json (list or {"products": [...]}), .jsonl/.ndjson or .csv feed."""
+    lower = path.lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if lower.endswith(".csv"):
+            yield from csv.DictReader(f)
+        elif lower.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            yield from (data.get("products", []) if isinstance(data, dict) else data)
+
+
+def _field(rec: dict, *names, default=None):
+    for n in names:
+        v = rec.get(n)
+        if v not in (None, ""):
+            return v
+    return default
+
+
+# ---------- build ----------
+def build_index(records, out_dir: str = CATALOG_DIR, retailer: str | None = None) -> dict:
+    """Index an iterable of product dicts into `out_dir`; returns build stats."""
+    t0 = time.perf_counter()
+    prices, genders, cats, sized, blobs = array("f"), array("B"), array("B"), array("B"), []
+    pair_terms, pair_docs = array("I"), array("I")
+    pair_sizes, pair_sized_docs = array("I"), array("I")
+    vocab: dict = {}
+    size_ids: dict = {}
+    n = 0
+    for rec in records:
+        try:
+            price = float(str(_field(rec, "price", "sale_price", default="nan")).replace(",", "."))
+        except ValueError:
+            continue
+        if not math.isfinite(price) or price < 0:
+            continue
+        title = str(_field(rec, "title", "name", default=""))
+        category = str(_field(rec, "category", "product_type", default=""))
+        cat = CATEGORIES.index(category) if category in CATEGORIES else guess_category(category, title)
+        sizes = parse_sizes(_field(rec, "sizes", "size", default=""))
+        for s in dict.fromkeys(sizes):
+            pair_sizes.append(size_ids.setdefault(s, len(size_ids)))
+            pair_sized_docs.append(n)
+        colors = _field(rec, "colors", "color", default="")
+        colors = " ".join(colors) if isinstance(colors, list) else str(colors)
+        brand = str(_field(rec, "brand", default=""))
+        text = " ".join((title, category, colors, brand))
+        for term in set(tokenize(text)):
+            key = term.encode()[:TERM_BYTES]
+            pair_terms.append(vocab.setdefault(key, len(vocab)))
+            pair_docs.append(n)
+        prices.append(price)
+        genders.append(parse_gender(_field(rec, "gender", "section", default="")))
+        cats.append(cat)
+        sized.append(bool(sizes))
+        blobs.append(json.dumps({
+            "id": str(_field(rec, "id", "sku", default=n)),
+            "title": title,
+            "retailer": _field(rec, "retailer", "shop", default=retailer),
+            "url": _field(rec, "url", "link", default=None),
+            "image": _field(rec, "image", "image_url", "image_link", default=None),
+            "price": round(price, 2),
+            "currency": _field(rec, "currency", default="EUR"),
+            "sizes": sizes,
+            "colors": colors or None,
+        }, ensure_ascii=False).encode())
+        n += 1
+
+    os.makedirs(out_dir, exist_ok=True)
+    price = np.frombuffer(prices, dtype=np.float32)
+    cat = np.frombuffer(cats, dtype=np.uint8)
+    order = np.lexsort((price, cat))            # new doc id → old doc id
+    new_id = np.empty(n, dtype=np.uint32)
+    new_id[order] = np.arange(n, dtype=np.uint32)
+
+    terms_sorted = sorted(vocab)
+    term_rank = np.empty(len(vocab), dtype=np.uint64)
+    term_rank[[vocab[t] for t in terms_sorted]] = np.arange(len(vocab), dtype=np.uint64)
+    keys = (term_rank[np.frombuffer(pair_terms, dtype=np.uint32)] << np.uint64(32)) \
+        | new_id[np.frombuffer(pair_docs, dtype=np.uint32)].astype(np.uint64)
+    keys = np.unique(keys)                      # sorted by term, then doc
+    post_docs = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    post_off = np.searchsorted(keys >> np.uint64(32), np.arange(len(vocab) + 1, dtype=np.uint64)).astype(np.int64)
+    # size ids are already dense, in first-seen order; same layout as the term postings
+    keys = np.unique((np.frombuffer(pair_sizes, dtype=np.uint32).astype(np.uint64) << np.uint64(32))
+                     | new_id[np.frombuffer(pair_sized_docs, dtype=np.uint32)].astype(np.uint64))
+    size_docs = (keys & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    size_off = np.searchsorted(keys >> np.uint64(32), np.arange(len(size_ids) + 1, dtype=np.uint64)).astype(np.int64)
+
+    lengths = np.fromiter((len(b) for b in blobs), dtype=np.int64, count=n)[order]
+    str_off = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lengths, out=str_off[1:])
+    blob = np.frombuffer(b"".join(blobs[i] for i in order), dtype=np.uint8)
+    cat_sorted = cat[order]
+
+    np.save(os.path.join(out_dir, "price.npy"), price[order])
+    np.save(os.path.join(out_dir, "gender.npy"), np.frombuffer(genders, dtype=np.uint8)[order])
+    np.save(os.path.join(out_dir, "sized.npy"), np.frombuffer(sized, dtype=np.uint8)[order])
+    np.save(os.path.join(out_dir, "size_off.npy"), size_off)
+    np.save(os.path.join(out_dir, "size_docs.npy"), size_docs)
+    np.save(os.path.join(out_dir, "terms.npy"), np.array(terms_sorted, dtype=f"S{TERM_BYTES}"))
+    np.save(os.path.join(out_dir, "post_off.npy"), post_off)
+    np.save(os.path.join(out_dir, "post_docs.npy"), post_docs)
+    np.save(os.path.join(out_dir, "str_off.npy"), str_off)
+    np.save(os.path.join(out_dir, "str_blob.npy"), blob)
+    meta = {
+        "docs": int(n), "terms": len(vocab), "postings": int(len(post_docs)),
+        "categories": CATEGORIES,
+        "cat_bounds": np.searchsorted(cat_sorted, np.arange(len(CATEGORIES) + 1)).tolist(),
+        "sizes": list(size_ids),
+        "built_at": time.time(),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return {"docs": n, "terms": len(vocab), "postings": int(len(post_docs)),
+            "seconds": round(time.perf_counter() - t0, 2), "out": out_dir}
+
+
+# ---------- query ----------
+class CatalogIndex:
+    def __init__(self, path: str = CATALOG_DIR):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        # plain ndarray views of the mappings: same pages, without np.memmap's per-slice overhead
+        load = lambda name: np.asarray(np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        self.price, self.gender, self.sized = load("price"), load("gender"), load("sized")
+        self.size_off, self.size_docs = load("size_off"), load("size_docs")
+        self.terms, self.post_off, self.post_docs = load("terms"), load("post_off"), load("post_docs")
+        self.str_off, self.str_blob = load("str_off"), load("str_blob")
+        self.n = self.meta["docs"]
+        self.cat_bounds = self.meta["cat_bounds"]
+        self.size_ids = {s: i for i, s in enumerate(self.meta["sizes"])}
+
+    def __len__(self):
+        return self.n
+
+    def item(self, doc: int) -> dict:
+        a, b = int(self.str_off[doc]), int(self.str_off[doc + 1])
+        return json.loads(bytes(self.str_blob[a:b]))
+
+    def _postings(self, term: str):
+        key = term.encode()[:TERM_BYTES]
+        i = int(np.searchsorted(self.terms, key))
+        if i >= len(self.terms) or self.terms[i] != key:
+            return None
+        return self.post_docs[int(self.post_off[i]):int(self.post_off[i + 1])]
+
+    def _range(self, category: str, min_price, max_price):
+        c = self.meta["categories"].index(category)
+        lo, hi = self.cat_bounds[c], self.cat_bounds[c + 1]
+        prices = self.price[lo:hi]
+        if max_price is not None:
+            hi = lo + int(np.searchsorted(prices, np.float32(max_price), side="right"))
+        if min_price is not None:
+            lo = lo + int(np.searchsorted(prices, np.float32(min_price), side="left"))
+        return lo, hi
+
+    def search(self, query: str, category: str, *, max_price=None, min_price=None, sizes=None, gender=None,
+               k: int = 10) -> list[dict]:
+        """Top-k items of `category` priced within [min_price, max_price], ranked by matched-term idf."""
+        if category not in self.meta["categories"]:
+            return []
+        lo, hi = self._range(category, min_price, max_price)
+        if hi <= lo:
+            return []
+        skip = set(GENDER_WORDS) | {w.lower() for w in CATEGORY_WORDS[category][:1]} | {category.lower()}
+        size_set = {s.lower() for s in parse_sizes(sizes)}
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in skip and t not in size_set]
+
+        narrow, broad = [], []
+        for t in terms:
+            docs = self._postings(t)
+            if docs is None or not len(docs):
+                continue
+            idf = math.log(1 + self.n / len(docs))
+            a, b = np.searchsorted(docs, [lo, hi])
+            if b <= a:
+                continue
+            (narrow if b - a <= MAX_SCAN else broad).append((docs[a:b], idf))
+
+        if narrow:
+            # docs are confined to [lo, hi): a dense accumulator beats sorting the union
+            acc = np.zeros(hi - lo, dtype=np.float32)
+            for d, idf in narrow:
+                acc[d - lo] += idf  # ids are unique within one posting list
+            cand = np.flatnonzero(acc)
+            score = acc[cand]
+            cand = (cand + lo).astype(np.uint32)
+        elif broad:
+            d, _ = min(broad, key=lambda x: len(x[0]))
+            cand, score = d[:MAX_SCAN], np.zeros(min(len(d), MAX_SCAN), dtype=np.float32)
+        else:
+            cand = np.arange(lo, min(hi, lo + MAX_SCAN), dtype=np.uint32)  # cheapest first
+            score = np.zeros(len(cand), dtype=np.float32)
+        for d, idf in broad:
+            pos = np.searchsorted(d, cand)
+            pos[pos >= len(d)] = len(d) - 1
+            score = score + np.float32(idf) * (d[pos] == cand)
+
+        keep = np.ones(len(cand), dtype=bool)
+        g = parse_gender(gender)
+        if g:
+            gv = self.gender[cand]
+            keep &= (gv == 0) | (gv == g)
+        want = parse_sizes(sizes)
+        if want:
+            # unsized (one size) items always fit; a size no item carries leaves only those
+            fits = self.sized[cand] == 0
+            for s in want:
+                i = self.size_ids.get(s)
+                if i is None:
+                    continue
+                d = self.size_docs[int(self.size_off[i]):int(self.size_off[i + 1])]
+                if len(d):
+                    pos = np.minimum(np.searchsorted(d, cand), len(d) - 1)
+                    fits |= d[pos] == cand
+            keep &= fits
+        cand, score = cand[keep], score[keep]
+        if not len(cand):
+            return []
+        if len(cand) > k:
+            top = np.argpartition(-score, k - 1)[:k]
+            cand, score = cand[top], score[top]
+        order = np.lexsort((self.price[cand], -score))
+        return [self.item(int(d)) | {"score": round(float(s), 3)} for d, s in zip(cand[order], score[order])]
+
+
+def shop_outfit(index: CatalogIndex, queries: dict, splits, *, sizes=None, gender=None, k: int = 3) -> dict:
+    """Per outfit slot: items for `build_queries(...)[slot][0]` under that slot's `budget_split` cap."""
+    return {item: index.search(queries[item][0], item, max_price=cap, sizes=sizes, gender=gender, k=k)
+            for item, cap in splits if item in queries}
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_catalog(path: str = CATALOG_DIR) -> CatalogIndex | None:
+    """Process-wide index from CATALOG_DIR (reopened after a rebuild); None until one is built
+    (an index in an older layout counts as not built)."""
+    global _index, _index_mtime
+    meta = os.path.join(path, "meta.json")
+    try:
+        mtime = os.path.getmtime(meta)
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or _index_mtime != mtime or _index.path != path:
+            try:
+                _index, _index_mtime = CatalogIndex(path), mtime
+            except (OSError, KeyError):
+                return None
+        return _index
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build or query the local retailer catalog index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="index JSON / JSON-lines / CSV product feeds")
+    b.add_argument("feeds", nargs="+")
+    b.add_argument("--out", default=CATALOG_DIR)
+    s = sub.add_parser("search")
+    s.add_argument("query")
+    s.add_argument("--category", default="Top", choices=CATEGORIES)
+    s.add_argument("--max-price", type=float)
+    s.add_argument("--size")
+    s.add_argument("--gender")
+    s.add_argument("-k", type=int, default=10)
+    s.add_argument("--index", default=CATALOG_DIR)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        def records():
+            for path in args.feeds:
+                name = os.path.splitext(os.path.basename(path))[0]
+                for rec in iter_feed(path):
+                    rec.setdefault("retailer", name)
+                    yield rec
+        stats = build_index(records(), args.out)
+        print(f"{stats['docs']} products, {stats['terms']} terms, {stats['postings']} postings "
+              f"in {stats['seconds']}s → {stats['out']}")
+        return
+    idx = CatalogIndex(args.index)
+    t0 = time.perf_counter()
+    hits = idx.search(args.query, args.category, max_price=args.max_price, sizes=args.size, gender=args.gender,
+                      k=args.k)
+    dt = (time.perf_counter() - t0) * 1e3
+    for h in hits:
+        print(f"{h['price']:>8.2f} {h.get('currency') or ''}  {h['title'][:60]:<60}  {h.get('retailer') or ''}")
+    print(f"{len(hits)} hits in {dt:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
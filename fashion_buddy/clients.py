@@ -0,0 +1,172 @@
+"""
+Process-wide HTTP client registry (OpenAI / Segmind / Replicate; counters for retailer search too).
+
+Clients are built once per (backend, credential) and reused across sessions and reruns,
+so keep-alive pools skip the TCP + TLS handshake on every call.
+Pool size and per-backend timeouts come from env:
+  HTTP_POOL_SIZE (default 10), OPENAI_TIMEOUT_S (60), SEGMIND_TIMEOUT_S (240), REPLICATE_TIMEOUT_S (300).
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+TIMEOUTS = {
+    "openai":    float(os.getenv("OPENAI_TIMEOUT_S", "60")),
+    "segmind":   float(os.getenv("SEGMIND_TIMEOUT_S", "240")),
+    "replicate": float(os.getenv("REPLICATE_TIMEOUT_S", "300")),
+}
+CONNECT_TIMEOUT_S = 10.0
+
+_lock = threading.Lock()
+_clients: dict = {}
+_stats: dict = {}  # backend -> {"requests", "new_connections", "tls_handshakes"}
+
+
+def _count(backend: str, field: str, n: int = 1):
+    with _lock:
+        st = _stats.setdefault(backend, {"requests": 0, "new_connections": 0, "tls_handshakes": 0})
+        st[field] += n
+
+
+def _get_or_build(key, build):
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+    client = build()
+    with _lock:
+        # another thread may have won the race; keep the first one
+        return _clients.setdefault(key, client)
+
+
+def get_secret(name: str, default=None):
+    """API key / token: env var first, then Streamlit secrets (where the Cloud deployment keeps them)."""
+    val = os.getenv(name)
+    if val:
+        return val
+    try:
+        import streamlit as st
+        return st.secrets.get(name, default)
+    except Exception:  # no streamlit, or no secrets.toml
+        return default
+
+
+# ---------- httpx-based SDKs (OpenAI, Replicate) ----------
+def _httpx_hooks(backend: str) -> dict:
+    """httpx event hooks that count requests and new TCP/TLS connections via the httpcore trace extension."""
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            _count(backend, "new_connections")
+        elif event_name == "connection.start_tls.complete":
+            _count(backend, "tls_handshakes")
+
+    def on_request(request):
+        _count(backend, "requests")
+        request.extensions["trace"] = trace
+
+    return {"request": [on_request]}
+
+
+def _httpx_async_hooks(backend: str) -> dict:
+    """Same counters for an `httpx.AsyncClient` (its hooks and trace callbacks are awaited)."""
+    async def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            _count(backend, "new_connections")
+        elif event_name == "connection.start_tls.complete":
+            _count(backend, "tls_handshakes")
+
+    async def on_request(request):
+        _count(backend, "requests")
+        request.extensions["trace"] = trace
+
+    return {"request": [on_request]}
+
+
+def _httpx_limits(pool_size: int):
+    import httpx
+    return httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=60.0)
+
+
+def get_openai(api_key: str, pool_size: int | None = None, timeout_s: float | None = None):
+    """Shared `openai.OpenAI` client for this key."""
+    def build():
+        import httpx
+        from openai import OpenAI
+        http_client = httpx.Client(
+            limits=_httpx_limits(pool_size or POOL_SIZE),
+            timeout=httpx.Timeout(timeout_s or TIMEOUTS["openai"], connect=CONNECT_TIMEOUT_S),
+            event_hooks=_httpx_hooks("openai"),
+        )
+        return OpenAI(api_key=api_key, http_client=http_client)
+    return _get_or_build(("openai", api_key), build)
+
+
+def get_replicate(api_token: str, pool_size: int | None = None, timeout_s: float | None = None):
+    """Shared `replicate.Client` for this token (use instead of module-level `replicate.run`)."""
+    def build():
+        import httpx
+        import replicate
+        return replicate.Client(
+            api_token=api_token,
+            timeout=httpx.Timeout(timeout_s or TIMEOUTS["replicate"], connect=CONNECT_TIMEOUT_S),
+            transport=httpx.HTTPTransport(limits=_httpx_limits(pool_size or POOL_SIZE)),
+            event_hooks=_httpx_hooks("replicate"),
+        )
+    return _get_or_build(("replicate", api_token), build)
+
+
+# ---------- requests-based (Segmind) ----------
+class _PooledSession(requests.Session):
+    """requests.Session with a default timeout and a request counter."""
+
+    def __init__(self, backend: str, pool_size: int, timeout_s: float):
+        super().__init__()
+        self.backend = backend
+        self.default_timeout = (CONNECT_TIMEOUT_S, timeout_s)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        _count(self.backend, "requests")
+        return super().request(method, url, **kwargs)
+
+
+def get_session(backend: str = "segmind", pool_size: int | None = None, timeout_s: float | None = None) -> requests.Session:
+    """Shared keep-alive `requests.Session` for a plain-HTTP backend."""
+    return _get_or_build(
+        (backend, None),
+        lambda: _PooledSession(backend, pool_size or POOL_SIZE, timeout_s or TIMEOUTS.get(backend, 60.0)),
+    )
+
+
+def _urllib3_connections(session: requests.Session) -> int:
+    # urllib3 pools count every socket they open in `num_connections`
+    total = 0
+    # one adapter is mounted for both schemes: count each once
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+        if pools is None:
+            continue
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            total += getattr(pool, "num_connections", 0) if pool is not None else 0
+    return total
+
+
+def connection_stats() -> dict:
+    """Per-backend request / new-connection counts and the share of requests that reused a pooled connection."""
+    with _lock:
+        out = {k: dict(v) for k, v in _stats.items()}
+        sessions = [c for c in _clients.values() if isinstance(c, _PooledSession)]
+    for s in sessions:
+        st = out.setdefault(s.backend, {"requests": 0, "new_connections": 0, "tls_handshakes": 0})
+        st["new_connections"] += _urllib3_connections(s)
+    for st in out.values():
+        req = st["requests"]
+        st["reuse_ratio"] = round(1 - st["new_connections"] / req, 3) if req else 0.0
+    return out
@@ -0,0 +1,249 @@
+"""
+Color similarity index: catalog items' dominant palettes as float32 CIELAB, memory-mapped.
+
+Layout (one directory, like the catalog index):
+  - `emb.npy` float32 (N, D): each palette as a soft histogram over a fixed Lab codebook
+    (D = 125 colors of a 5×5×5 sRGB grid, Gaussian weights), L2-normalized — 500 bytes per item;
+  - `lab.npy` float32 (N, k, 3) and `weight.npy` float32 (N, k), zero weight = padding;
+  - `ids.npy` fixed-width bytes (N,), plus `id_sorted.npy` / `id_rows.npy` for id → row lookups;
+  - `meta.json` with N and k.
+
+A query is two stages. First a brute-force scan over `emb` in row chunks: one (Q, D) × (D, chunk)
+matmul for the whole batch of queries, keeping a running top-`RERANK` per query, so memory stays flat
+and the pass over the mapping is shared by the batch. Then the exact palette distance on those
+candidates: a weighted two-way chamfer in Lab — every query color pays the squared ΔE to the
+nearest item color (times its share), and every item color to the nearest query color.
+Linear in N with no tree to build. Scans restricted to at most RERANK rows (e.g. the hits of a
+catalog search) are exact. On a million uniformly random palettes, the worst case for the coarse
+stage, recall@10 against the exact scan is ~0.85-0.9 at ~100-150 ms for one query; a batch
+shares the pass over the mapping (~30-60 ms per query). See benchmarks/bench_color_index.py.
+
+    python -m fashion_buddy.color_index build palettes.npz --out .cache/colors   # palette_batch, id = catalog id
+    python -m fashion_buddy.color_index query "#1f2a44,#f2ead8" -n 10
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from fashion_buddy.palette import srgb_to_lab
+
+COLOR_DIR = os.getenv("COLOR_INDEX_DIR", os.path.join(".cache", "colors"))
+CHUNK = 65_536   # rows per scan step
+RERANK = 8192    # coarse candidates per query that get the exact distance
+SIGMA = 15.0     # ΔE width of a codebook bin
+DELTA_E = 20.0   # ΔE at which `similarity` is 0.5
+_grid = np.linspace(0, 255, 5)
+CODEBOOK = srgb_to_lab(np.stack(np.meshgrid(_grid, _grid, _grid, indexing="ij"), -1).reshape(-1, 3)).astype(np.float32)
+
+
+def parse_colors(colors) -> np.ndarray:
+    """'#rrggbb' strings / RGB tuples → uint8 (m, 3)."""
+    out = []
+    for c in colors:
+        if isinstance(c, str):
+            c = c.strip().lstrip("#")
+            out.append((int(c[0:2], 16), int(c[2:4], 16), int(c[4:6], 16)))
+        else:
+            out.append(tuple(int(v) for v in c[:3]))
+    return np.asarray(out, dtype=np.uint8).reshape(-1, 3)
+
+
+def embed(lab: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Lab palettes (N, k, 3) with shares (N, k) → unit soft histograms over CODEBOOK (N, D)."""
+    n, k = weights.shape
+    x = lab.reshape(-1, 3)
+    d = (x * x).sum(axis=1)[:, None] - 2.0 * (x @ CODEBOOK.T) + (CODEBOOK * CODEBOOK).sum(axis=1)[None, :]
+    g = np.exp(-np.maximum(d, 0.0) / np.float32(2 * SIGMA ** 2)).reshape(n, k, -1)
+    h = np.einsum("nkd,nk->nd", g, weights).astype(np.float32)
+    return h / np.maximum(np.linalg.norm(h, axis=1, keepdims=True), 1e-12)
+
+
+def build_color_index(ids, palettes, weights=None, out_dir: str = COLOR_DIR) -> dict:
+    """Unique ids (N,), RGB palettes uint8 (N, k, 3) and shares (N, k) → index files in `out_dir`."""
+    t0 = time.perf_counter()
+    palettes = np.asarray(palettes, dtype=np.uint8)
+    n, k = palettes.shape[:2]
+    if weights is None:
+        weights = np.full((n, k), 1.0 / k, dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+    weights = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-12)
+    ids = np.asarray([str(i).encode() for i in ids], dtype="S")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("duplicate item ids: id lookups would silently pick one of them")
+    os.makedirs(out_dir, exist_ok=True)
+    lab = np.lib.format.open_memmap(os.path.join(out_dir, "lab.npy"), mode="w+", dtype=np.float32, shape=(n, k, 3))
+    emb = np.lib.format.open_memmap(os.path.join(out_dir, "emb.npy"), mode="w+", dtype=np.float32,
+                                    shape=(n, len(CODEBOOK)))
+    for a in range(0, n, CHUNK):
+        b = min(n, a + CHUNK)
+        lab[a:b] = srgb_to_lab(palettes[a:b].reshape(-1, 3)).reshape(b - a, k, 3)
+        emb[a:b] = embed(lab[a:b], weights[a:b])
+    lab.flush()
+    emb.flush()
+    del lab, emb
+    np.save(os.path.join(out_dir, "weight.npy"), weights)
+    np.save(os.path.join(out_dir, "ids.npy"), ids)
+    order = np.argsort(ids, kind="stable")
+    np.save(os.path.join(out_dir, "id_sorted.npy"), ids[order])
+    np.save(os.path.join(out_dir, "id_rows.npy"), order.astype(np.int64))
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump({"items": int(n), "k": int(k)}, f)
+    return {"items": int(n), "k": int(k), "seconds": round(time.perf_counter() - t0, 2), "out": out_dir}
+
+
+def similarity(dist: np.ndarray) -> np.ndarray:
+    """Palette distance (mean squared ΔE) → 0..1, 0.5 at ΔE = DELTA_E."""
+    return 1.0 / (1.0 + np.asarray(dist, dtype=np.float32) / np.float32(DELTA_E ** 2))
+
+
+class ColorIndex:
+    def __init__(self, path: str = COLOR_DIR):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        load = lambda name: np.asarray(np.load(os.path.join(path, name + ".npy"), mmap_mode="r"))
+        self.emb, self.lab, self.weight = load("emb"), load("lab"), load("weight")
+        self.ids, self.id_sorted, self.id_rows = load("ids"), load("id_sorted"), load("id_rows")
+        self.n, self.k = self.meta["items"], self.meta["k"]
+
+    def __len__(self):
+        return self.n
+
+    def rows(self, ids) -> np.ndarray:
+        """Row per id, −1 where the id isn't indexed."""
+        keys = np.asarray([str(i).encode() for i in ids], dtype="S")
+        if not self.n or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.id_sorted, keys), self.n - 1)
+        return np.where(self.id_sorted[pos] == keys, self.id_rows[pos], -1)
+
+    @staticmethod
+    def _queries(palettes, weights=None):
+        """List of palettes → Lab (Q, m, 3) and shares (Q, m), padded with zero weight."""
+        cols = [parse_colors(p) for p in palettes]
+        m = max(1, max(len(c) for c in cols))
+        q = np.zeros((len(cols), m, 3), dtype=np.float32)
+        w = np.zeros((len(cols), m), dtype=np.float32)
+        for i, c in enumerate(cols):
+            if len(c):
+                q[i, :len(c)] = srgb_to_lab(c)
+                w[i, :len(c)] = weights[i][:len(c)] if weights is not None else 1.0
+            w[i] /= max(w[i].sum(), 1e-12)
+        return q, w
+
+    def _dist(self, lab, wt, q, qw):
+        """Chamfer distances (rows, Q) between item palettes (rows, k, 3) and queries (Q, m, 3)."""
+        r, k = wt.shape
+        nq, m = qw.shape
+        x = lab.reshape(-1, 3)
+        c = q.reshape(-1, 3)
+        d = (x * x).sum(axis=1)[:, None] - 2.0 * (x @ c.T) + (c * c).sum(axis=1)[None, :]
+        d = np.maximum(d, 0.0, out=d).reshape(r, k, nq, m)
+        # zero-weight (padding) colors must not be anyone's nearest
+        item_pad = np.where(wt > 0, 0.0, np.inf).astype(np.float32)[:, :, None, None]
+        query_pad = np.where(qw > 0, 0.0, np.inf).astype(np.float32)[None, None]
+        fwd = ((d + item_pad).min(axis=1) * qw[None]).sum(axis=2)             # query colors → item
+        back = np.nan_to_num((d + query_pad).min(axis=3) * wt[:, :, None], nan=0.0).sum(axis=1)  # item → query
+        return (fwd + back) / 2.0
+
+    def search_batch(self, palettes, n: int = 20, weights=None, rows=None) -> list[list[tuple]]:
+        """Per query palette: [(item_id, distance), ...] nearest first; `rows` restricts the scan."""
+        if not len(palettes) or not self.n:
+            return [[] for _ in palettes]
+        q, qw = self._queries(palettes, weights)
+        qe = embed(q, qw)
+        scope = None if rows is None else np.unique(np.asarray(rows, dtype=np.int64))
+        if scope is not None:
+            scope = scope[scope >= 0]
+        total = self.n if scope is None else len(scope)
+        keep = max(n, RERANK)
+        best_s = np.zeros((len(q), 0), dtype=np.float32)
+        best_r = np.zeros((len(q), 0), dtype=np.int64)
+        for a in range(0, total, CHUNK):
+            if scope is None:  # contiguous: slice the mapping instead of gathering
+                r = np.arange(a, min(total, a + CHUNK))
+                e = self.emb[a:a + CHUNK]
+            else:
+                r = scope[a:a + CHUNK]
+                e = self.emb[r]
+            sims = np.concatenate([best_s, qe @ e.T], axis=1)                  # (Q, kept + chunk)
+            rr = np.concatenate([best_r, np.broadcast_to(r, (len(q), len(r)))], axis=1)
+            if sims.shape[1] > keep:
+                top = np.argpartition(-sims, keep - 1, axis=1)[:, :keep]
+                sims, rr = np.take_along_axis(sims, top, axis=1), np.take_along_axis(rr, top, axis=1)
+            best_s, best_r = sims, rr
+        out = []
+        for i in range(len(q)):
+            cand = best_r[i]
+            d = self._dist(self.lab[cand], self.weight[cand], q[i:i + 1], qw[i:i + 1])[:, 0]
+            order = np.argsort(d, kind="stable")[:n]
+            out.append([(self.ids[cand[j]].decode(), float(d[j])) for j in order])
+        return out
+
+    def search(self, palette, n: int = 20, weights=None) -> list[tuple]:
+        """Items whose palette best matches `palette` ('#rrggbb' strings or RGB tuples)."""
+        return self.search_batch([palette], n=n, weights=None if weights is None else [weights])[0]
+
+    def distances(self, ids, palette) -> np.ndarray:
+        """Distance of each item in `ids` to `palette` (NaN for ids not in the index)."""
+        rows = self.rows(ids)
+        out = np.full(len(rows), np.nan, dtype=np.float32)
+        ok = rows >= 0
+        if ok.any() and len(palette):
+            q, qw = self._queries([palette])
+            out[ok] = self._dist(self.lab[rows[ok]], self.weight[rows[ok]], q, qw)[:, 0]
+        return out
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_color_index(path: str = COLOR_DIR) -> ColorIndex | None:
+    """Process-wide index from COLOR_INDEX_DIR (reopened after a rebuild); None until one is built."""
+    global _index, _index_mtime
+    try:
+        mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    except OSError:
+        return None
+    with _index_lock:
+        if _index is None or _index_mtime != mtime or _index.path != path:
+            _index, _index_mtime = ColorIndex(path), mtime
+        return _index
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build or query the catalog color index.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="index a palettes .npz written by `python -m fashion_buddy.palette_batch`")
+    b.add_argument("palettes")
+    b.add_argument("--out", default=COLOR_DIR)
+    s = sub.add_parser("query")
+    s.add_argument("colors", help="comma-separated #rrggbb")
+    s.add_argument("-n", type=int, default=10)
+    s.add_argument("--index", default=COLOR_DIR)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        with np.load(args.palettes) as z:
+            # palette_batch ids are the manifest's ids (give it the catalog's item ids) or image paths
+            ids = [str(i) for i in z["ids"]]
+            stats = build_color_index(ids, z["palettes"], z["weights"], args.out)
+        print(f"{stats['items']} palettes (k={stats['k']}) in {stats['seconds']}s → {stats['out']}")
+        return
+    idx = ColorIndex(args.index)
+    t0 = time.perf_counter()
+    hits = idx.search(args.colors.split(","), n=args.n)
+    dt = (time.perf_counter() - t0) * 1e3
+    for item_id, d in hits:
+        print(f"{d:>10.1f}  {item_id}")
+    print(f"{len(hits)} hits over {len(idx)} items in {dt:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
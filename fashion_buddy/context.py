@@ -0,0 +1,118 @@
+"""
+Token-budgeted chat context: the newest turns verbatim, everything older folded into a rolling summary.
+
+    ctx = ChatContext(st.session_state, budget=CONTEXT_TOKENS)
+    msgs, stats = ctx.build(system, messages, summarize)   # summarize(prev_summary, turns) -> str
+
+Turns are kept newest-first while they fit into `budget` tokens (system prompt and summary included).
+Once a turn falls out of the window, the turns before the cut are folded into the summary. The
+window then drops to `low_water` of the budget so the next few turns fit again without a new
+summary; the summary is only recomputed when the cut moves. The summary lives in the
+session state with the index it covers up to.
+
+Token counts use tiktoken when installed, else a ~4 chars/token estimate. `stats` carries the
+prompt size (and what the last-16-messages context would have cost) for the metrics.
+"""
+import os
+import re
+
+CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))
+SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "250"))
+MESSAGE_OVERHEAD = 4  # role + separators per chat message
+LEGACY_WINDOW = 16    # messages the context used to send verbatim
+
+_encoders: dict = {}
+
+
+def _encoder(model: str | None):
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model or "gpt-4o-mini")
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoders[model] = None
+    return _encoders[model]
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    enc = _encoder(model)
+    if enc is not None:
+        return len(enc.encode(text or ""))
+    # ~4 characters per token for English, a bit less for Cyrillic; never fewer tokens than words
+    text = text or ""
+    return max(len(re.findall(r"\S+", text)), (len(text) + 3) // 4)
+
+
+def message_tokens(messages, model: str | None = None) -> int:
+    return sum(count_tokens(m["content"], model) + MESSAGE_OVERHEAD for m in messages) + 2
+
+
+def extractive_summary(previous: str, turns: list[dict], max_tokens: int = SUMMARY_TOKENS) -> str:
+    """Offline fallback: the first sentence of every folded turn, newest kept when over budget."""
+    lines = [ln for ln in (previous or "").splitlines() if ln.strip()]
+    for m in turns:
+        first = re.split(r"(?<=[.!?])\s", " ".join((m["content"] or "").split()), maxsplit=1)[0]
+        if first:
+            lines.append(f"{m['role']}: {first[:200]}")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ChatContext:
+    def __init__(self, state, key: str = "_chat_context", budget: int = CONTEXT_TOKENS,
+                 low_water: float = 0.6, model: str | None = None):
+        self.state = state
+        self.key = key
+        self.budget = budget
+        self.low_water = low_water
+        self.model = model
+        if key not in state:
+            state[key] = {"upto": 0, "summary": ""}
+
+    @property
+    def _s(self) -> dict:
+        return self.state[self.key]
+
+    def build(self, system: dict, messages: list[dict], summarize=None) -> tuple[list[dict], dict]:
+        turns = [{"role": m["role"], "content": m["content"]} for m in messages]
+        s = self._s
+        if s["upto"] > len(turns):  # chat was reset
+            s["upto"], s["summary"] = 0, ""
+        fixed = message_tokens([system], self.model) + SUMMARY_TOKENS + MESSAGE_OVERHEAD
+        tail = [0] * (len(turns) + 1)  # tail[i]: tokens of turns[i:]
+        for i in range(len(turns) - 1, -1, -1):
+            tail[i] = tail[i + 1] + count_tokens(turns[i]["content"], self.model) + MESSAGE_OVERHEAD
+        summarized = False
+        if tail[s["upto"]] > self.budget - fixed:
+            # fold down to the low-water mark, always keeping the newest turn
+            cut = s["upto"]
+            target = int(self.budget * self.low_water) - fixed
+            while cut < len(turns) - 1 and tail[cut] > target:
+                cut += 1
+            folded = turns[s["upto"]:cut]
+            if folded:
+                text = None
+                if summarize is not None:
+                    try:
+                        text = summarize(s["summary"], folded)
+                    except Exception:
+                        text = None
+                s["summary"] = text or extractive_summary(s["summary"], folded)
+                s["upto"] = cut
+                summarized = True
+        msgs = [system]
+        if s["summary"]:
+            msgs.append({"role": "system", "content": "Earlier in this conversation (summary):\n" + s["summary"]})
+        msgs += turns[s["upto"]:]
+        stats = {
+            "prompt_tokens": message_tokens(msgs, self.model),
+            "legacy_tokens": message_tokens([system] + turns[-LEGACY_WINDOW:], self.model),
+            "turns": len(turns) - s["upto"],
+            "summarized_turns": s["upto"],
+            "summary_updated": summarized,
+        }
+        return msgs, stats
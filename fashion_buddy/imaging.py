@@ -0,0 +1,98 @@
+"""
+Single image-ingestion stage for all pages: upload → oriented, resized RGB JPEG bytes.
+
+Large phone photos are never decoded at full resolution when it can be avoided:
+JPEGs are opened in draft mode (DCT-domain downscale by 1/2, 1/4, 1/8), other formats go
+through `reduce()` via `reducing_gap`, and only then the final LANCZOS resample runs.
+EXIF orientation is applied once, on the already small image.
+"""
+import hashlib
+import io
+import os
+
+from PIL import Image
+
+from fashion_buddy.cache import ResultCache, make_key
+from fashion_buddy.metrics import span
+
+MAX_PIXELS = int(os.getenv("INGEST_MAX_PIXELS", str(100_000_000)))  # ~100 MP, rejects decompression bombs
+REDUCING_GAP = 3.0
+
+# EXIF Orientation → transpose, same table as PIL.ImageOps.exif_transpose
+_ORIENTATION = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+_memo = ResultCache(max_items=int(os.getenv("INGEST_MEMO_ITEMS", "32")), disk_dir=None)
+
+
+def read_upload(file) -> bytes:
+    """Raw bytes of a Streamlit UploadedFile, file-like object or bytes."""
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return bytes(file)
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    file.seek(0)
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+def target_size(w: int, h: int, min_side: int, max_side: int) -> tuple[int, int]:
+    """Upscale so the short side reaches min_side, or downscale so the long side fits max_side."""
+    if w == 0 or h == 0:
+        raise ValueError("Empty image")
+    long_side, short_side = max(w, h), min(w, h)
+    if short_side < min_side:
+        scale = min_side / short_side
+    elif long_side > max_side:
+        scale = max_side / long_side
+    else:
+        scale = 1.0
+    return max(1, int(w * scale)), max(1, int(h * scale))
+
+
+def load_image(data: bytes, min_side: int = 512, max_side: int = 1024, max_pixels: int = MAX_PIXELS) -> Image.Image:
+    """Decode → (draft/reduce) → LANCZOS to target size → RGB → EXIF orientation."""
+    img = Image.open(io.BytesIO(data))
+    w, h = img.size
+    if w * h > max_pixels:
+        raise ValueError(f"Image too large: {w}x{h} exceeds {max_pixels} pixels")
+    orientation = img.getexif().get(0x0112, 1)
+    # rotation doesn't change long/short side, so target size can be computed in file orientation
+    tw, th = target_size(w, h, min_side, max_side)
+    if img.format == "JPEG" and tw < w:
+        img.draft("RGB", (tw, th))  # decoder picks the largest 1/2^n scale still ≥ target
+    if img.mode not in ("RGB", "RGBA", "L"):
+        img = img.convert("RGB")  # palette/CMYK/16-bit: resample only in a continuous mode
+    if img.size != (tw, th):
+        img = img.resize((tw, th), Image.LANCZOS, reducing_gap=REDUCING_GAP)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if orientation in _ORIENTATION:
+        img = img.transpose(_ORIENTATION[orientation])
+    return img
+
+
+def to_jpeg_bytes(file, min_side: int = 512, max_side: int = 1024, quality: int = 90,
+                  max_pixels: int = MAX_PIXELS) -> bytes:
+    """Any upload → RGB JPEG bytes; memoized by (upload digest, target params)."""
+    with span("ingest") as s:
+        data = read_upload(file)
+        key = make_key("jpeg", hashlib.sha256(data).hexdigest(), min_side, max_side, quality, max_pixels)
+        cached = _memo.get(key)
+        if cached is not None:
+            s.outcome = "cache_hit"
+            return cached
+        img = load_image(data, min_side, max_side, max_pixels)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        out = buf.getvalue()
+        _memo.set(key, out)
+        return out
@@ -0,0 +1,237 @@
+"""
+Durable SQLite-backed try-on job queue.
+
+Jobs are stored with their normalized inputs (deduplicated blobs) and run by a bounded pool of
+worker threads, so concurrency is capped across all sessions and results outlive the script run,
+the websocket and the container. Jobs whose lease expired mid-run (crash, redeploy) go back to
+the queue, unless that was their last allowed attempt; then they are marked failed.
+The UI re-attaches to a job by id.
+
+Handlers are registered per job kind: fn(params: dict, person: bytes, garment: bytes) -> bytes.
+Raise `JobError` for permanent failures; any other exception is retried up to `max_attempts`.
+"""
+import hashlib
+import json
+from contextlib import contextmanager
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from fashion_buddy.metrics import inc
+
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(".cache", "jobs.sqlite3"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_RETENTION_S = float(os.getenv("JOBS_RETENTION_S", str(7 * 24 * 3600)))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs(
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,              -- queued | running | done | failed
+    params TEXT NOT NULL,
+    person TEXT, garment TEXT, result TEXT,   -- blob digests
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at);
+CREATE TABLE IF NOT EXISTS blobs(digest TEXT PRIMARY KEY, data BLOB NOT NULL);
+"""
+
+_handlers: dict = {}
+
+
+class JobError(Exception):
+    """Permanent job failure (bad input, 4xx): not retried."""
+
+
+def register_handler(kind: str, fn):
+    _handlers[kind] = fn
+
+
+class JobQueue:
+    def __init__(self, path: str = JOBS_DB, workers: int = JOBS_WORKERS, lease_s: float = 900.0,
+                 max_attempts: int = 3):
+        self.path = path
+        self.workers = max(1, int(workers))
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._threads: list = []
+        self._start_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        # one short-lived connection per operation: safe across threads and processes;
+        # closing with an open transaction rolls it back
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            yield db
+        finally:
+            db.close()
+
+    # ---- producer side ----
+    def _put_blob(self, db, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        db.execute("INSERT OR IGNORE INTO blobs(digest, data) VALUES (?, ?)", (digest, sqlite3.Binary(data)))
+        return digest
+
+    def _get_blob(self, db, digest: str | None) -> bytes | None:
+        if not digest:
+            return None
+        row = db.execute("SELECT data FROM blobs WHERE digest=?", (digest,)).fetchone()
+        return bytes(row["data"]) if row else None
+
+    def enqueue(self, kind: str, params: dict, person: bytes, garment: bytes) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            p, g = self._put_blob(db, person), self._put_blob(db, garment)
+            db.execute(
+                "INSERT INTO jobs(id, kind, status, params, person, garment, created_at) VALUES (?,?,?,?,?,?,?)",
+                (job_id, kind, "queued", json.dumps(params, sort_keys=True), p, g, time.time()),
+            )
+            db.execute("COMMIT")
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._db() as db:
+            row = db.execute(
+                "SELECT id, kind, status, params, error, attempts, created_at, started_at, finished_at "
+                "FROM jobs WHERE id=?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def result(self, job_id: str) -> bytes | None:
+        with self._db() as db:
+            row = db.execute("SELECT result FROM jobs WHERE id=?", (job_id,)).fetchone()
+            return self._get_blob(db, row["result"]) if row else None
+
+    def stats(self) -> dict:
+        with self._db() as db:
+            return {r["status"]: r["n"] for r in db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+    # ---- worker side ----
+    def _claim(self):
+        now = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # a job whose lease ran out on its last attempt crashed or hung the worker every time: give up on it
+            gave_up = db.execute(
+                "UPDATE jobs SET status='failed', finished_at=?, lease_until=NULL, "
+                "error='Lease expired on attempt ' || attempts || ' of ' || ? || ' (worker crashed or hung)' "
+                "WHERE status='running' AND lease_until < ? AND attempts >= ?",
+                (now, self.max_attempts, now, self.max_attempts)).rowcount
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status='queued' OR (status='running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1", (now,)).fetchone()
+            claimed = None
+            if row is not None:
+                db.execute("UPDATE jobs SET status='running', started_at=?, lease_until=?, attempts=attempts+1 "
+                           "WHERE id=?", (now, now + self.lease_s, row["id"]))
+                job = db.execute("SELECT * FROM jobs WHERE id=?", (row["id"],)).fetchone()
+                claimed = dict(job), self._get_blob(db, job["person"]), self._get_blob(db, job["garment"])
+            db.execute("COMMIT")
+        if gave_up:
+            inc("jobs", gave_up, status="failed")
+        return claimed
+
+    def _finish(self, job: dict, result: bytes | None = None, error: str | None = None, retry: bool = False) -> bool:
+        """Record the outcome of a claimed job; False (and nothing written) if its lease ran out meanwhile."""
+        now = time.time()
+        # only the holder of the current lease may finish: same attempt, lease not yet expired
+        lease = " WHERE id=? AND status='running' AND attempts=? AND lease_until >= ?"
+        held = (job["id"], job["attempts"], now)
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            if result is not None:
+                digest = self._put_blob(db, result)
+                n = db.execute("UPDATE jobs SET status='done', result=?, error=NULL, finished_at=?, lease_until=NULL"
+                               + lease, (digest, now, *held)).rowcount
+            elif retry:
+                n = db.execute("UPDATE jobs SET status='queued', error=?, lease_until=NULL" + lease,
+                               (error, *held)).rowcount
+            else:
+                n = db.execute("UPDATE jobs SET status='failed', error=?, finished_at=?, lease_until=NULL" + lease,
+                               (error, now, *held)).rowcount
+            db.execute("COMMIT" if n else "ROLLBACK")
+        inc("jobs", status="lease_lost" if not n else "done" if result is not None else "retried" if retry else "failed")
+        return bool(n)
+
+    def run_one(self) -> bool:
+        """Claim and run a single job; returns False when the queue is empty."""
+        claimed = self._claim()
+        if claimed is None:
+            return False
+        job, person, garment = claimed
+        handler = _handlers.get(job["kind"])
+        if handler is None:
+            self._finish(job, error=f"No handler for job kind {job['kind']!r}")
+            return True
+        try:
+            out = handler(json.loads(job["params"]), person, garment)
+            self._finish(job, result=out)
+        except JobError as e:
+            self._finish(job, error=str(e))
+        except Exception as e:
+            self._finish(job, error=f"{type(e).__name__}: {e}", retry=job["attempts"] < self.max_attempts)
+        return True
+
+    def _worker(self):
+        while True:
+            try:
+                if self.run_one():
+                    continue
+            except sqlite3.Error:
+                time.sleep(1.0)
+            self._wake.wait(timeout=2.0)
+            self._wake.clear()
+
+    def start(self):
+        """Recover interrupted jobs, purge old ones and start the worker threads (idempotent)."""
+        with self._start_lock:
+            if self._threads:
+                return self
+            self.purge()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"tryon-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        return self
+
+    def purge(self, older_than_s: float = JOBS_RETENTION_S):
+        """Drop finished jobs past retention and blobs nothing references any more."""
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM jobs WHERE status IN ('done','failed') AND finished_at < ?",
+                       (time.time() - older_than_s,))
+            db.execute("DELETE FROM blobs WHERE digest NOT IN "
+                       "(SELECT person FROM jobs UNION SELECT garment FROM jobs "
+                       " UNION SELECT result FROM jobs WHERE result IS NOT NULL)")
+            db.execute("COMMIT")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    """Process-wide started queue (JOBS_DB, JOBS_WORKERS)."""
+    global _queue
+    import fashion_buddy.tryon  # noqa: F401  (registers the built-in try-on handlers before workers start)
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue().start()
+        return _queue
@@ -0,0 +1,245 @@
+"""
+Saved looks: a local content-addressed image store plus a SQLite history index.
+
+Result images are fetched once on the server (streamed to disk while hashing), stored by sha256
+with a pre-generated JPEG thumbnail, and recorded in `looks`. Clients get local bytes instead of
+expiring `replicate.delivery` URLs. History pages use keyset pagination on the integer id
+(`WHERE id < cursor ORDER BY id DESC LIMIT n`), so any page is an index range scan regardless
+of how many looks the deployment has saved.
+
+Every look belongs to an owner (`session_owner()`: the signed-in user, else a random id for the
+browser session). Listing, counting, starring and deleting only ever touch the caller's own rows;
+looks recorded without an owner are visible to nobody.
+"""
+import hashlib
+import io
+import json
+from contextlib import contextmanager
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from PIL import Image
+
+from fashion_buddy.clients import get_session
+from fashion_buddy.metrics import span
+
+LOOKS_DIR = os.getenv("LOOKS_DIR", os.path.join(".cache", "looks"))
+LOOKS_THUMB_SIDE = int(os.getenv("LOOKS_THUMB_SIDE", "256"))
+LOOKS_MAX_FETCH_MB = float(os.getenv("LOOKS_MAX_FETCH_MB", "40"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS looks(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL,              -- sha256 of the stored image
+    backend TEXT,
+    source_url TEXT,
+    meta TEXT NOT NULL DEFAULT '{}',
+    saved INTEGER NOT NULL DEFAULT 0,  -- 1 = starred by the user, otherwise plain history
+    created_at REAL NOT NULL,
+    owner TEXT                         -- session_owner() of whoever produced it
+);
+CREATE INDEX IF NOT EXISTS looks_digest ON looks(digest);
+"""
+# after the owner column exists (older stores get it added first)
+INDEXES = """
+DROP INDEX IF EXISTS looks_saved;
+CREATE INDEX IF NOT EXISTS looks_owner ON looks(owner, id);
+CREATE INDEX IF NOT EXISTS looks_owner_saved ON looks(owner, saved, id);
+"""
+
+
+class LookStore:
+    def __init__(self, root: str = LOOKS_DIR, thumb_side: int = LOOKS_THUMB_SIDE):
+        self.root = root
+        self.thumb_side = int(thumb_side)
+        self.path = os.path.join(root, "index.sqlite3")
+        os.makedirs(root, exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+            if "owner" not in {r["name"] for r in db.execute("PRAGMA table_info(looks)")}:
+                db.execute("ALTER TABLE looks ADD COLUMN owner TEXT")
+            db.executescript(INDEXES)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            yield db
+        finally:
+            db.close()
+
+    # ---- content-addressed files ----
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _thumb_path(self, digest: str) -> str:
+        return os.path.join(self.root, "thumbs", digest[:2], digest + ".jpg")
+
+    def _commit_file(self, tmp: str, digest: str):
+        dst = self._object_path(digest)
+        if os.path.exists(dst):
+            os.remove(tmp)
+        else:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(tmp, dst)
+        if not os.path.exists(self._thumb_path(digest)):
+            self._make_thumb(digest)
+
+    def _make_thumb(self, digest: str):
+        try:
+            with Image.open(self._object_path(digest)) as img:
+                img.draft("RGB", (self.thumb_side, self.thumb_side))
+                img = img.convert("RGB")
+                img.thumbnail((self.thumb_side, self.thumb_side), Image.LANCZOS, reducing_gap=3.0)
+                buf = io.BytesIO()
+                img.save(buf, format="JPEG", quality=82, optimize=True)
+        except Exception:
+            return  # not an image we can decode: the original is still served
+        p = self._thumb_path(digest)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        with open(p + ".tmp", "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(p + ".tmp", p)
+
+    def put_bytes(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if not os.path.exists(self._object_path(digest)):
+            os.makedirs(self.root, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            self._commit_file(tmp, digest)
+        return digest
+
+    def fetch(self, url: str, chunk_size: int = 64 * 1024) -> str:
+        """Stream a remote result to disk through the shared session, hashing as it arrives."""
+        limit = int(LOOKS_MAX_FETCH_MB * 1024 * 1024)
+        h, n = hashlib.sha256(), 0
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with span("fetch", "replicate_delivery"), os.fdopen(fd, "wb") as f, \
+                    get_session("replicate_delivery").get(url, stream=True) as r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size):
+                    n += len(chunk)
+                    if n > limit:
+                        raise ValueError(f"Result larger than {LOOKS_MAX_FETCH_MB:g} MB: {url}")
+                    h.update(chunk)
+                    f.write(chunk)
+            digest = h.hexdigest()
+            self._commit_file(tmp, digest)
+            return digest
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def image(self, digest: str) -> bytes | None:
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def thumb(self, digest: str) -> bytes | None:
+        try:
+            with open(self._thumb_path(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return self.image(digest)
+
+    # ---- history index ----
+    def record(self, digest: str, *, owner: str | None, backend: str | None = None, source_url: str | None = None,
+               meta: dict | None = None, saved: bool = False) -> int:
+        with self._db() as db:
+            cur = db.execute(
+                "INSERT INTO looks(digest, backend, source_url, meta, saved, created_at, owner) VALUES (?,?,?,?,?,?,?)",
+                (digest, backend, source_url, json.dumps(meta or {}, sort_keys=True), int(saved), time.time(), owner))
+            return cur.lastrowid
+
+    def set_saved(self, look_id: int, saved: bool = True, *, owner: str):
+        with self._db() as db:
+            if db.execute("UPDATE looks SET saved=? WHERE id=? AND owner=?", (int(saved), look_id, owner)).rowcount == 0:
+                raise PermissionError(f"Look #{look_id} not found for this owner")
+
+    def delete(self, look_id: int, *, owner: str):
+        """Remove one of `owner`'s history entries; the image files go once nothing references the digest."""
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT digest FROM looks WHERE id=? AND owner=?", (look_id, owner)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                raise PermissionError(f"Look #{look_id} not found for this owner")
+            db.execute("DELETE FROM looks WHERE id=?", (look_id,))
+            orphan = db.execute("SELECT 1 FROM looks WHERE digest=? LIMIT 1", (row["digest"],)).fetchone() is None
+            db.execute("COMMIT")
+        if orphan:
+            for p in (self._object_path(row["digest"]), self._thumb_path(row["digest"])):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+    def page(self, owner: str, before_id: int | None = None, limit: int = 24, saved_only: bool = False):
+        """One page of `owner`'s looks, newest first; returns (rows, next cursor or None)."""
+        where, args = ["owner=?"], [owner]
+        if saved_only:
+            where.append("saved=1")
+        if before_id is not None:
+            where.append("id < ?")
+            args.append(int(before_id))
+        sql = "SELECT id, digest, backend, meta, saved, created_at FROM looks WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._db() as db:
+            rows = [dict(r) for r in db.execute(sql, (*args, int(limit) + 1))]
+        nxt = rows[limit - 1]["id"] if len(rows) > limit else None
+        rows = rows[:limit]
+        for r in rows:
+            r["meta"] = json.loads(r["meta"])
+        return rows, nxt
+
+    def count(self, owner: str, saved_only: bool = False) -> int:
+        with self._db() as db:
+            sql = "SELECT COUNT(*) FROM looks WHERE owner=?" + (" AND saved=1" if saved_only else "")
+            return db.execute(sql, (owner,)).fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_look_store() -> LookStore:
+    """Process-wide look store (LOOKS_DIR)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LookStore()
+        return _store
+
+
+def session_owner() -> str:
+    """Owner id for the current Streamlit session: the signed-in user when auth is configured,
+    else a random id kept in session_state (shared by all pages of one browser session)."""
+    import streamlit as st
+    try:
+        if st.user.is_logged_in:
+            return "user:" + (st.user.get("email") or st.user.get("sub"))
+    except Exception:  # no st.user (older Streamlit) or auth not configured
+        pass
+    return st.session_state.setdefault("_looks_owner", "anon:" + uuid.uuid4().hex)
+
+
+def keep_result(*, owner: str | None, image: bytes | None = None, url: str | None = None,
+                backend: str | None = None, meta: dict | None = None) -> tuple[int, bytes]:
+    """Store a try-on result (bytes, or fetched from `url`) in `owner`'s history; returns (look id, bytes)."""
+    store = get_look_store()
+    digest = store.put_bytes(image) if image is not None else store.fetch(url)
+    look_id = store.record(digest, owner=owner, backend=backend, source_url=url, meta=meta)
+    return look_id, image if image is not None else store.image(digest)
@@ -0,0 +1,213 @@
+"""
+Per-stage latency spans, counters and Prometheus text export.
+
+    with span("inference", backend="segfit") as s:
+        ...
+        s.outcome = "http_503"        # default "ok"; an exception sets "error" and re-raises
+
+Each span feeds `fashion_buddy_stage_seconds` (histogram) and `fashion_buddy_stage_total`
+(counter) labeled by stage, backend and outcome. Recent durations per series are also kept
+for live p50/p95/p99 on the ops page. Export: METRICS_PORT serves /metrics over HTTP,
+METRICS_FILE is rewritten every METRICS_FILE_INTERVAL_S (node-exporter textfile collector).
+"""
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))  # recent samples per series for live percentiles
+
+_lock = threading.Lock()
+_series: dict = {}    # (stage, backend, outcome) -> _Series
+_counters: dict = {}  # (name, labels tuple) -> float
+_exporter_started = False
+
+
+class _Series:
+    __slots__ = ("counts", "sum", "n", "recent")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.n = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, v: float):
+        i = 0
+        while i < len(BUCKETS) and v > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.n += 1
+        self.recent.append(v)
+
+
+class Span:
+    __slots__ = ("stage", "backend", "outcome", "t0")
+
+    def __init__(self, stage: str, backend: str):
+        self.stage = stage
+        self.backend = backend
+        self.outcome = "ok"
+        self.t0 = time.perf_counter()
+
+
+def observe(stage: str, seconds: float, backend: str = "-", outcome: str = "ok"):
+    """Record one already-measured duration (e.g. a prediction timed by its handle)."""
+    _ensure_exporter()
+    key = (stage, backend or "-", outcome or "ok")
+    with _lock:
+        s = _series.get(key)
+        if s is None:
+            s = _series[key] = _Series()
+        s.observe(max(0.0, float(seconds)))
+
+
+@contextmanager
+def span(stage: str, backend: str = "-"):
+    s = Span(stage, backend)
+    try:
+        yield s
+    except BaseException:
+        if s.outcome == "ok":
+            s.outcome = "error"
+        raise
+    finally:
+        observe(s.stage, time.perf_counter() - s.t0, s.backend, s.outcome)
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """Plain counter, exported as `fashion_buddy_<name>_total`."""
+    _ensure_exporter()
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def _pct(xs, q: float):
+    return xs[min(len(xs) - 1, int(round(q / 100 * (len(xs) - 1))))] if xs else None
+
+
+def quantiles(stage: str, backend: str | None = None, outcomes=None, qs=(50, 95, 99)) -> dict:
+    """Percentiles over the recent samples of all matching series merged, e.g. successful try-ons of one backend."""
+    with _lock:
+        xs = sorted(v for (st_, be, oc), s in _series.items()
+                    if st_ == stage and backend in (None, be) and (outcomes is None or oc in outcomes)
+                    for v in s.recent)
+    return {f"p{q:g}_s": _pct(xs, q) for q in qs} | {"samples": len(xs)}
+
+
+def summary(stage: str | None = None) -> list[dict]:
+    """One row per series: count, its share of the (stage, backend) total, p50/p95/p99 over recent samples."""
+    with _lock:
+        snap = {k: (s.n, s.sum, sorted(s.recent)) for k, s in _series.items() if stage in (None, k[0])}
+    totals: dict = {}
+    for (st_, be, _), (n, _, _) in snap.items():
+        totals[(st_, be)] = totals.get((st_, be), 0) + n
+    rows = []
+    for (st_, be, oc), (n, total, xs) in sorted(snap.items()):
+        rows.append({
+            "stage": st_, "backend": be, "outcome": oc, "count": n,
+            "share": round(n / totals[(st_, be)], 3),
+            "mean_s": round(total / n, 3) if n else None,
+            "p50_s": _pct(xs, 50), "p95_s": _pct(xs, 95), "p99_s": _pct(xs, 99),
+        })
+    return rows
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}" if body else ""
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition format 0.0.4."""
+    with _lock:
+        series = {k: (list(s.counts), s.sum, s.n) for k, s in _series.items()}
+        counters = dict(_counters)
+    out = [
+        "# HELP fashion_buddy_stage_seconds Duration of a pipeline stage.",
+        "# TYPE fashion_buddy_stage_seconds histogram",
+    ]
+    for (stage, backend, outcome), (counts, total, n) in sorted(series.items()):
+        base = [("stage", stage), ("backend", backend), ("outcome", outcome)]
+        acc = 0
+        for le, c in zip([*(f"{b:g}" for b in BUCKETS), "+Inf"], counts):
+            acc += c
+            out.append(f"fashion_buddy_stage_seconds_bucket{_labels(base + [('le', le)])} {acc}")
+        out.append(f"fashion_buddy_stage_seconds_sum{_labels(base)} {total:.6f}")
+        out.append(f"fashion_buddy_stage_seconds_count{_labels(base)} {n}")
+    out += [
+        "# HELP fashion_buddy_stage_total Completed pipeline stages.",
+        "# TYPE fashion_buddy_stage_total counter",
+    ]
+    for (stage, backend, outcome), (_, _, n) in sorted(series.items()):
+        out.append(f"fashion_buddy_stage_total{_labels([('stage', stage), ('backend', backend), ('outcome', outcome)])} {n}")
+    for name in sorted({k[0] for k in counters}):
+        out.append(f"# TYPE fashion_buddy_{name}_total counter")
+        for (n_, labels), v in sorted(counters.items()):
+            if n_ == name:
+                out.append(f"fashion_buddy_{name}_total{_labels(labels)} {v:g}")
+    return "\n".join(out) + "\n"
+
+
+def write_textfile(path: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _file_loop(path: str, every_s: float):
+    while True:
+        time.sleep(every_s)
+        try:
+            write_textfile(path)
+        except OSError:
+            pass
+
+
+def _ensure_exporter():
+    """Start the configured exporters once per process, on first use."""
+    global _exporter_started
+    if _exporter_started:
+        return
+    with _lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+        port = os.getenv("METRICS_PORT")
+        if port:
+            try:
+                server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            except OSError:
+                pass  # another process (e.g. a second worker) already serves this port
+        path = os.getenv("METRICS_FILE")
+        if path:
+            every = float(os.getenv("METRICS_FILE_INTERVAL_S", "15"))
+            threading.Thread(target=_file_loop, args=(path, every), name="metrics-file", daemon=True).start()
@@ -0,0 +1,154 @@
+"""
+Budget-constrained outfit optimizer: one item per category, maximum total score, total price ≤ budget.
+
+A multiple-choice knapsack solved as a top-K DP over the budget in `step` units:
+`best[b]` holds the K best partial outfits costing at most b, and each category is folded in with
+one vectorized gather + partition over (budget × candidates × K). Before that, every category
+is pruned to the items that could appear in a top-K outfit — walking candidates by price, an item
+scoring below K cheaper ones is never needed — which leaves tens of items out of hundreds.
+
+    cands = {"Top": [{"price": 39.9, "palette": 0.8, "style": 0.6, ...}, ...], "Shoes": [...]}
+    best_outfits(cands, budget=300, k=5)  # → [{"score", "price", "items": {"Top": {...}, ...}}, ...]
+
+Prices are rounded up to the step, so a returned outfit never exceeds the budget.
+"""
+import math
+
+import numpy as np
+
+from fashion_buddy.color_index import get_color_index, similarity
+
+WEIGHTS = {"palette": 1.0, "style": 1.0}
+MAX_UNITS = 1000  # budget resolution cap: DP cost is linear in budget / step
+BASIC_COLORS = {
+    "black": (20, 20, 20), "white": (245, 245, 245), "grey": (128, 128, 128), "navy": (20, 30, 80),
+    "blue": (40, 90, 200), "beige": (225, 205, 170), "cream": (250, 240, 215), "camel": (190, 140, 80),
+    "brown": (110, 70, 40), "olive": (110, 110, 40), "green": (40, 140, 60), "red": (200, 30, 40),
+    "burgundy": (110, 20, 40), "pink": (240, 150, 180), "yellow": (240, 210, 50), "purple": (110, 50, 140),
+    "orange": (240, 130, 30),
+}
+ALIASES = {"gray": "grey", "ivory": "cream", "tan": "camel", "khaki": "olive", "wine": "burgundy"}
+
+
+def color_names(colors) -> set:
+    """Names from a mix of color words and '#rrggbb' values (hex → nearest basic color)."""
+    out = set()
+    for c in colors or []:
+        c = str(c).strip().lower()
+        if c.startswith("#") and len(c) == 7:
+            rgb = tuple(int(c[i:i + 2], 16) for i in (1, 3, 5))
+            out.add(min(BASIC_COLORS, key=lambda n: sum((a - b) ** 2 for a, b in zip(BASIC_COLORS[n], rgb))))
+        else:
+            for w in c.replace(",", " ").split():
+                out.add(ALIASES.get(w, w))
+    return out
+
+
+def palette_score(item_colors, wanted: set) -> float:
+    """Share of the item's named colors that belong to the wanted palette (0.5 when the item has none)."""
+    have = color_names(item_colors.split() if isinstance(item_colors, str) else item_colors) & set(BASIC_COLORS)
+    if not have:
+        return 0.5
+    return len(have & wanted) / len(have) if wanted else 0.5
+
+
+def _prune(prices: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of items that can be in a top-k outfit: by price, those within the top k so far."""
+    keep = []
+    top = []  # k best scores among cheaper items, ascending
+    for i in np.lexsort((-scores, prices)):
+        s = scores[i]
+        if len(top) < k or s > top[0]:
+            keep.append(i)
+            top.append(s)
+            top.sort()
+            if len(top) > k:
+                top.pop(0)
+    return np.array(keep, dtype=np.int64)
+
+
+def best_outfits(candidates: dict, budget: float, *, k: int = 5, weights: dict | None = None,
+                 step: float | None = None, optional=()) -> list[dict]:
+    """
+    Top-k outfits (one item per category with candidates) within `budget`.
+
+    Candidates are dicts with "price" and the score fields in `weights` (palette/style by default);
+    categories in `optional` may also be left out. Empty categories are skipped. `step` is the
+    price resolution (default: 1, coarser for budgets above MAX_UNITS).
+    """
+    weights = weights or WEIGHTS
+    step = step or max(1.0, budget / MAX_UNITS)
+    slots = []
+    for cat, items in candidates.items():
+        if not items:
+            continue
+        prices = np.array([math.ceil(float(it["price"]) / step - 1e-9) for it in items], dtype=np.int64)
+        scores = np.array([sum(w * float(it.get(f) or 0.0) for f, w in weights.items()) for it in items])
+        if cat in optional:
+            prices, scores = np.append(prices, 0), np.append(scores, 0.0)
+        keep = _prune(prices, scores, k)
+        slots.append((cat, items, keep, prices[keep], scores[keep]))
+    B = int(math.floor(budget / step + 1e-9))
+    if not slots or B < 0:
+        return []
+    B = min(B, sum(int(p.max()) for *_, p, _ in slots))  # above that every outfit fits anyway
+
+    # best[b, r]: r-th best score of an outfit so far costing ≤ b units
+    best = np.full((B + 1, k), -np.inf)
+    best[:, 0] = 0.0
+    budget_ix = np.arange(B + 1)
+    trace = []
+    for _, _, _, p, s in slots:
+        prev = budget_ix[:, None] - p[None, :]                       # (B+1, M) budget left before the item
+        ok = prev >= 0
+        total = np.where(ok[:, :, None], best[np.maximum(prev, 0)] + s[None, :, None], -np.inf)  # (B+1, M, k)
+        flat = total.reshape(B + 1, -1)
+        if flat.shape[1] > k:
+            part = np.argpartition(-flat, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(flat.shape[1]), (B + 1, flat.shape[1]))
+        vals = np.take_along_axis(flat, part, axis=1)
+        order = np.argsort(-vals, axis=1, kind="stable")
+        part, vals = np.take_along_axis(part, order, axis=1), np.take_along_axis(vals, order, axis=1)
+        if vals.shape[1] < k:
+            pad = k - vals.shape[1]
+            vals = np.pad(vals, ((0, 0), (0, pad)), constant_values=-np.inf)
+            part = np.pad(part, ((0, 0), (0, pad)))
+        best = vals
+        trace.append(part)                                         # flat index = item * k + parent rank
+
+    out = []
+    for r in range(k):
+        if not np.isfinite(best[B, r]):
+            break
+        b, rank, items = B, r, {}
+        for (cat, cat_items, keep, p, _), part in zip(reversed(slots), reversed(trace)):
+            j, rank = divmod(int(part[b, rank]), k)
+            if keep[j] < len(cat_items):  # past the end: the optional "none" slot
+                items[cat] = cat_items[keep[j]]
+            b -= int(p[j])
+        chosen = {cat: items[cat] for cat, *_ in slots if cat in items}
+        out.append({"score": round(float(best[B, r]), 4),
+                    "price": round(sum(float(it["price"]) for it in chosen.values()), 2),
+                    "items": chosen})
+    return out
+
+
+def catalog_candidates(index, queries: dict, budget: float, colors=(), *, sizes=None, gender=None,
+                       per_slot: int = 200) -> dict:
+    """Per slot: catalog hits for `build_queries(...)[slot][0]` priced up to the whole budget, scored
+    for `best_outfits` — style = search score relative to the slot's best hit, palette = Lab palette
+    similarity from the color index when both it and '#rrggbb' colors are available, else `palette_score`."""
+    wanted = color_names(colors) & set(BASIC_COLORS)
+    photo = [c for c in colors or [] if str(c).startswith("#") and len(str(c)) == 7]
+    colors_idx = get_color_index() if photo else None
+    out = {}
+    for cat, qs in queries.items():
+        hits = index.search(qs[0], cat, max_price=budget, sizes=sizes, gender=gender, k=per_slot)
+        top = max((h["score"] for h in hits), default=0.0) or 1.0
+        sim = similarity(colors_idx.distances([h["id"] for h in hits], photo)) if colors_idx and hits \
+            else np.full(len(hits), np.nan)
+        out[cat] = [h | {"style": h["score"] / top,
+                         "palette": palette_score(h.get("colors") or "", wanted) if math.isnan(s) else float(s)}
+                    for h, s in zip(hits, sim)]
+    return out
@@ -0,0 +1,115 @@
+"""
+Deterministic palette extraction.
+
+The image is quantized into a histogram of unique colors with counts, then clustered with
+weighted k-means++ (fixed seed) using the ||x||² − 2x·c + ||c||² distance form, optionally in CIELAB.
+Work scales with the number of distinct colors, not pixels, so it runs fine on 256 px samples.
+"""
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+from fashion_buddy.cache import ResultCache, make_key
+from fashion_buddy.imaging import load_image
+from fashion_buddy.metrics import span
+
+_memo = ResultCache(max_items=256, disk_dir=None)
+
+
+def color_histogram(pixels: np.ndarray, bits: int = 5):
+    """(N, 3) uint8 pixels → (mean RGB per occupied bin as float32 (M, 3), counts (M,))."""
+    px = pixels.reshape(-1, 3)
+    shift = 8 - bits
+    q = (px >> shift).astype(np.int32)
+    codes = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    # bincount over the fixed 2^(3·bits) code space: O(N), no sort
+    n_bins = 1 << (3 * bits)
+    counts = np.bincount(codes, minlength=n_bins)
+    occupied = np.flatnonzero(counts)
+    sums = np.stack([np.bincount(codes, weights=px[:, j], minlength=n_bins)[occupied] for j in range(3)], axis=1)
+    counts = counts[occupied]
+    return (sums / counts[:, None]).astype(np.float32), counts.astype(np.float32)
+
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """(M, 3) sRGB in 0..255 → CIELAB (D65)."""
+    c = rgb.astype(np.float32) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    m = np.array([[0.4124564, 0.3575761, 0.1804375],
+                  [0.2126729, 0.7151522, 0.0721750],
+                  [0.0193339, 0.1191920, 0.9503041]], dtype=np.float32)
+    xyz = c @ m.T / np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def sq_dists(x: np.ndarray, c: np.ndarray, x_sq: np.ndarray | None = None) -> np.ndarray:
+    """(M, k) squared distances via ||x||² − 2x·c + ||c||² (no (M, k, 3) temporary)."""
+    if x_sq is None:
+        x_sq = (x * x).sum(axis=1)
+    d = x_sq[:, None] - 2.0 * (x @ c.T) + (c * c).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def weighted_kmeans(x: np.ndarray, w: np.ndarray, k: int, seed: int = 0, iters: int = 20, tol: float = 1e-3):
+    """Weighted k-means with k-means++ seeding; returns (labels (M,), centers (k, D))."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    x_sq = (x * x).sum(axis=1)
+    centers = [x[rng.choice(len(x), p=w / w.sum())]]
+    d2 = sq_dists(x, np.asarray(centers), x_sq)[:, 0]
+    for _ in range(1, k):
+        p = w * d2
+        if p.sum() <= 0:
+            break
+        centers.append(x[rng.choice(len(x), p=p / p.sum())])
+        d2 = np.minimum(d2, sq_dists(x, centers[-1][None, :], x_sq)[:, 0])
+    centers = np.asarray(centers, dtype=np.float32)
+    labels = np.zeros(len(x), dtype=np.int64)
+    for _ in range(iters):
+        labels = sq_dists(x, centers, x_sq).argmin(axis=1)
+        wsum = np.bincount(labels, weights=w, minlength=len(centers))
+        new = np.stack([np.bincount(labels, weights=w * x[:, j], minlength=len(centers))
+                        for j in range(x.shape[1])], axis=1)
+        filled = wsum > 0
+        new[filled] /= wsum[filled, None]
+        new[~filled] = centers[~filled]  # empty cluster keeps its previous center
+        shift = np.abs(new - centers).max()
+        centers = new.astype(np.float32)
+        if shift < tol:
+            break
+    return labels, centers
+
+
+def extract_palette(img: Image.Image, k: int = 4, space: str = "lab", seed: int = 0, bits: int = 5):
+    """Dominant colors of `img` as RGB int tuples, most frequent first."""
+    pixels = np.asarray(img.convert("RGB"), dtype=np.uint8)
+    rgb, counts = color_histogram(pixels, bits)
+    feats = srgb_to_lab(rgb) if space == "lab" else rgb
+    labels, _ = weighted_kmeans(feats, counts, k, seed=seed)
+    # report centers in RGB as weighted means of member colors, whatever space we clustered in
+    n = labels.max() + 1
+    wsum = np.bincount(labels, weights=counts, minlength=n)
+    order = [i for i in np.argsort(-wsum, kind="stable") if wsum[i] > 0]
+    out = []
+    for i in order:
+        m = labels == i
+        c = (rgb[m] * counts[m, None]).sum(axis=0) / wsum[i]
+        out.append(tuple(int(v) for v in np.clip(np.rint(c), 0, 255)))
+    return out
+
+
+def palette_from_bytes(data: bytes, k: int = 4, sample_side: int = 256, space: str = "lab",
+                       seed: int = 0, bits: int = 5):
+    """Palette of an encoded image, memoized per (image digest, params)."""
+    with span("palette") as s:
+        key = make_key("palette", hashlib.sha256(data).hexdigest(), k, sample_side, space, seed, bits)
+        cached = _memo.get(key)
+        if cached is not None:
+            s.outcome = "cache_hit"
+            return cached
+        img = load_image(data, min_side=1, max_side=sample_side)
+        out = extract_palette(img, k=k, space=space, seed=seed, bits=bits)
+        _memo.set(key, out)
+        return out
@@ -0,0 +1,208 @@
+"""
+Batch palette extraction for product catalogs.
+
+Sources are read lazily, a window at a time: decode + resize + histogram run in a process pool
+and are streamed back in input order while the next window decodes; k-means then runs vectorized
+over a stack of images (histograms zero-weight padded to one length).
+Results go to a compact .npz: `ids` (N,), `palettes` uint8 (N, k, 3), `weights` float32 (N, k).
+An image with fewer than k distinct colors gets padding entries with weight 0; `load_palettes` drops them.
+Ids are the manifest's own ids, else the image path relative to the source.
+
+    python -m fashion_buddy.palette_batch images/ --out palettes.npz
+    python -m fashion_buddy.palette_batch manifest.csv --out palettes.npz --workers 8 --k 4
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from fashion_buddy.palette import color_histogram, srgb_to_lab
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def iter_sources(src: str):
+    """(image_id, path) pairs from a directory, a .csv manifest (id,path) or a text file of paths.
+    Without an id column the id is the path as listed (relative to the directory / manifest)."""
+    if os.path.isdir(src):
+        for dirpath, _, names in os.walk(src):
+            for name in sorted(names):
+                if name.lower().endswith(IMAGE_EXTS):
+                    path = os.path.join(dirpath, name)
+                    yield os.path.relpath(path, src), path
+        return
+    base = os.path.dirname(os.path.abspath(src))
+    with open(src, newline="", encoding="utf-8") as f:
+        if src.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                path = row["path"]
+                yield row.get("id") or path, os.path.join(base, path)
+        else:
+            for line in f:
+                path = line.strip()
+                if path and not path.startswith("#"):
+                    yield path, os.path.join(base, path)
+
+
+def _load_hist(job):
+    """Worker: path → (rgb (M, 3) float32, counts (M,) float32) or None if the image can't be read."""
+    path, sample_side, bits = job
+    from fashion_buddy.imaging import load_image
+    try:
+        with open(path, "rb") as f:
+            img = load_image(f.read(), min_side=1, max_side=sample_side)
+        return color_histogram(np.asarray(img, dtype=np.uint8), bits)
+    except Exception:
+        return None
+
+
+def _stack(hists):
+    """Pad per-image histograms to (B, M, 3) / (B, M) with zero weights."""
+    m = max(len(c) for c, _ in hists)
+    rgb = np.zeros((len(hists), m, 3), dtype=np.float32)
+    w = np.zeros((len(hists), m), dtype=np.float32)
+    for i, (c, n) in enumerate(hists):
+        rgb[i, :len(c)] = c
+        w[i, :len(n)] = n
+    return rgb, w
+
+
+def _sq_dists(x, x_sq, c):
+    # batched ||x||² − 2x·c + ||c||²: (B, M, D), (B, M), (B, K, D) → (B, M, K)
+    d = x_sq[:, :, None] - 2.0 * np.einsum("bmd,bkd->bmk", x, c) + (c * c).sum(axis=2)[:, None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def _pick(rng, p):
+    """One index per row, sampled proportionally to row weights `p` (B, M); rows of zeros pick 0."""
+    cdf = np.cumsum(p, axis=1)
+    u = rng.random(len(p)) * cdf[:, -1]
+    return np.minimum((cdf <= u[:, None]).sum(axis=1), p.shape[1] - 1)
+
+
+def batch_kmeans(x, w, k: int, seed: int = 0, iters: int = 20, tol: float = 1e-3):
+    """Weighted k-means++ over a stack of histograms; returns labels (B, M)."""
+    rng = np.random.default_rng(seed)
+    b = np.arange(len(x))
+    x_sq = (x * x).sum(axis=2)
+    centers = np.empty((len(x), k, x.shape[2]), dtype=np.float32)
+    centers[:, 0] = x[b, _pick(rng, w)]
+    d2 = _sq_dists(x, x_sq, centers[:, :1])[:, :, 0]
+    for j in range(1, k):
+        centers[:, j] = x[b, _pick(rng, w * d2)]
+        d2 = np.minimum(d2, _sq_dists(x, x_sq, centers[:, j:j + 1])[:, :, 0])
+    labels = np.zeros(w.shape, dtype=np.int64)
+    for _ in range(iters):
+        labels = _sq_dists(x, x_sq, centers).argmin(axis=2)
+        onehot = (labels[:, :, None] == np.arange(k)) * w[:, :, None]  # (B, M, K)
+        wsum = onehot.sum(axis=1)
+        sums = np.einsum("bmk,bmd->bkd", onehot, x)
+        filled = wsum > 0
+        new = np.where(filled[:, :, None], sums / np.maximum(wsum, 1e-12)[:, :, None], centers)
+        shift = np.abs(new - centers).max()
+        centers = new.astype(np.float32)
+        if shift < tol:
+            break
+    return labels
+
+
+def palettes_for_stack(hists, k: int = 4, space: str = "lab", seed: int = 0):
+    """Histograms → (palettes uint8 (B, k, 3), weights float32 (B, k)), most frequent color first.
+    Clusters left empty (fewer than k distinct colors) come last with weight 0."""
+    rgb, w = _stack(hists)
+    feats = srgb_to_lab(rgb.reshape(-1, 3)).reshape(rgb.shape).astype(np.float32) if space == "lab" else rgb
+    labels = batch_kmeans(feats, w, k, seed=seed)
+    onehot = (labels[:, :, None] == np.arange(k)) * w[:, :, None]
+    wsum = onehot.sum(axis=1)
+    cols = np.einsum("bmk,bmd->bkd", onehot, rgb) / np.maximum(wsum, 1e-12)[:, :, None]
+    order = np.argsort(-wsum, axis=1, kind="stable")
+    cols = np.take_along_axis(cols, order[:, :, None], axis=1)
+    wsum = np.take_along_axis(wsum, order, axis=1)
+    share = wsum / np.maximum(wsum.sum(axis=1, keepdims=True), 1e-12)
+    return np.clip(np.rint(cols), 0, 255).astype(np.uint8), share.astype(np.float32)
+
+
+def run_batch(sources, out_path: str, k: int = 4, sample_side: int = 256, bits: int = 5, space: str = "lab",
+              seed: int = 0, workers: int | None = None, batch_size: int = 64, window: int | None = None,
+              log=sys.stderr) -> dict:
+    """Extract palettes for (id, path) pairs and write them to `out_path` (.npz). Returns run stats.
+    `sources` may be any iterable; at most two windows of `window` images are held at a time."""
+    ids, pals, shares, failed = [], [], [], []
+    t0 = time.perf_counter()
+    done = 0
+    window = window or batch_size * 16
+
+    def flush(batch):
+        p, s = palettes_for_stack([h for _, h in batch], k=k, space=space, seed=seed)
+        ids.extend(i for i, _ in batch)
+        pals.append(p)
+        shares.append(s)
+
+    def windows(pool):
+        # Executor.map submits everything it is given up front: feed it one window at a time,
+        # with the next window already decoding while this one is clustered
+        it = iter(sources)
+        ahead = None
+        while chunk := list(islice(it, window)):
+            running = chunk, pool.map(_load_hist, [(path, sample_side, bits) for _, path in chunk], chunksize=16)
+            if ahead is not None:
+                yield ahead
+            ahead = running
+        if ahead is not None:
+            yield ahead
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        batch = []
+        for chunk, hists in windows(pool):
+            for (image_id, _), hist in zip(chunk, hists):
+                done += 1
+                if hist is None:
+                    failed.append(image_id)
+                else:
+                    batch.append((image_id, hist))
+                if len(batch) >= batch_size:
+                    flush(batch); batch = []
+                if log and done % 500 == 0:
+                    dt = time.perf_counter() - t0
+                    print(f"{done} images, {done / dt:.1f} img/s", file=log)
+        if batch:
+            flush(batch)
+
+    palettes = np.concatenate(pals) if pals else np.zeros((0, k, 3), np.uint8)
+    weights = np.concatenate(shares) if shares else np.zeros((0, k), np.float32)
+    np.savez_compressed(out_path, ids=np.asarray(ids, dtype=str), palettes=palettes, weights=weights)
+    dt = time.perf_counter() - t0
+    return {"images": len(ids), "failed": len(failed), "seconds": round(dt, 3),
+            "images_per_s": round(done / dt, 1) if dt else 0.0, "out": out_path}
+
+
+def load_palettes(path: str) -> dict:
+    """{image_id: [(r, g, b), ...]} from a file written by `run_batch`, without the zero-weight padding."""
+    with np.load(path) as z:
+        return {str(i): [tuple(int(v) for v in c) for c, share in zip(p, w) if share > 0]
+                for i, p, w in zip(z["ids"], z["palettes"], z["weights"])}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precompute palettes for a directory or manifest of images.")
+    ap.add_argument("src", help="image directory, .csv manifest (id,path) or .txt list of paths")
+    ap.add_argument("--out", default="palettes.npz")
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--sample-side", type=int, default=256)
+    ap.add_argument("--space", choices=["lab", "rgb"], default="lab")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--batch", type=int, default=64)
+    args = ap.parse_args(argv)
+    stats = run_batch(iter_sources(args.src), args.out, k=args.k, sample_side=args.sample_side,
+                      space=args.space, workers=args.workers, batch_size=args.batch)
+    print(f"{stats['images']} images ({stats['failed']} failed) in {stats['seconds']}s — "
+          f"{stats['images_per_s']} img/s → {stats['out']}")
+
+
+if __name__ == "__main__":
+    main()
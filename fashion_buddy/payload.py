@@ -0,0 +1,102 @@
+"""
+Byte-budget-aware SegFit payload encoding.
+
+`fit_to_budget` picks quality (binary search) and, if that's not enough, resolution so an image
+fits a byte target while its short side stays ≥ the model's minimum. `segfit_body` builds the JSON
+request body with a single join over base64 bytes instead of json.dumps over multi-MB strings.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+
+from PIL import Image
+
+from fashion_buddy.cache import ResultCache, make_key
+
+log = logging.getLogger(__name__)
+
+SEGFIT_MIN_SHORT_SIDE = int(os.getenv("SEGFIT_MIN_SHORT_SIDE", "768"))
+Q_MAX, Q_MIN = 92, 60
+SCALE_STEP = 0.85
+
+_memo = ResultCache(max_items=64, disk_dir=None)
+
+
+def b64_len(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=quality, optimize=fmt == "JPEG")
+    return buf.getvalue()
+
+
+def fit_to_budget(data: bytes, target_bytes: int, min_short_side: int = SEGFIT_MIN_SHORT_SIDE,
+                  fmt: str = "JPEG") -> tuple[bytes, dict]:
+    """Re-encode `data` to at most `target_bytes` if possible; returns (bytes, info)."""
+    if target_bytes <= 0 or len(data) <= target_bytes:
+        return data, {"bytes": len(data), "reencoded": False}
+    key = make_key("fit", hashlib.sha256(data).hexdigest(), target_bytes, min_short_side, fmt)
+    cached = _memo.get(key)
+    if cached is not None:
+        return cached
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    best = None
+    while True:
+        lo, hi, found = Q_MIN, Q_MAX, None
+        while lo <= hi:  # largest quality that fits
+            q = (lo + hi) // 2
+            out = _encode(img, fmt, q)
+            if len(out) <= target_bytes:
+                found, lo = (out, q), q + 1
+            else:
+                hi = q - 1
+                if best is None or len(out) < len(best[0]):
+                    best = (out, q, img.size)
+        if found:
+            out, q = found
+            res = (out, {"bytes": len(out), "reencoded": True, "quality": q, "size": img.size, "format": fmt})
+            break
+        w, h = img.size
+        nw, nh = int(w * SCALE_STEP), int(h * SCALE_STEP)
+        if min(nw, nh) < min_short_side:
+            # can't shrink further without starving the model: send the smallest attempt
+            out, q, size = best
+            res = (out, {"bytes": len(out), "reencoded": True, "quality": q, "size": size, "format": fmt,
+                         "over_budget": True})
+            break
+        img = img.resize((nw, nh), Image.LANCZOS)
+    _memo.set(key, res)
+    return res
+
+
+def segfit_body(model_image: bytes, outfit_image: bytes, params: dict) -> bytes:
+    """JSON body with base64 images spliced in as bytes (one copy each, no str round trip)."""
+    rest = json.dumps(params, separators=(",", ":")).encode("utf-8")
+    parts = [b'{"model_image":"', base64.b64encode(model_image), b'","outfit_image":"',
+             base64.b64encode(outfit_image), b'"']
+    if params:
+        parts += [b",", rest[1:]]  # rest[1:] drops the opening brace of the params object
+    else:
+        parts.append(b"}")
+    return b"".join(parts)
+
+
+def encode_segfit_inputs(person: bytes, garment: bytes, budget_bytes: int,
+                         min_short_side: int = SEGFIT_MIN_SHORT_SIDE) -> tuple[bytes, bytes]:
+    """Fit both images into a whole-request byte budget (base64 overhead included) and log the savings."""
+    if budget_bytes <= 0:
+        return person, garment
+    per_image = int((budget_bytes - 512) * 3 / 4 / 2)
+    p, pi = fit_to_budget(person, per_image, min_short_side)
+    g, gi = fit_to_budget(garment, per_image, min_short_side)
+    before = b64_len(len(person)) + b64_len(len(garment))
+    after = b64_len(len(p)) + b64_len(len(g))
+    if after < before:
+        log.info("segfit payload %.0f KB → %.0f KB (saved %.0f KB); person %s, garment %s",
+                 before / 1024, after / 1024, (before - after) / 1024, pi, gi)
+    return p, g
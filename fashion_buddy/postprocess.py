@@ -0,0 +1,121 @@
+"""
+Pluggable post-processing for try-on results, run on a process pool.
+
+A pipeline is a tuple of (step name, kwargs) pairs applied in order to one decoded image, which is
+then encoded exactly once; the bytes go straight to `st.image`. Outputs are memoized per
+(result digest, pipeline, output params), so re-rendering or toggling the option doesn't recompute.
+`postprocess_async` returns a Future, so a page can start every variant's post-processing as it
+arrives and keep rendering. Workers are spawned, not forked: forking the multi-threaded Streamlit
+server can copy a held lock into the child and deadlock it. Streamlit installs the running page as
+`__main__`, which a spawned worker would re-execute on start, so workers are started with a bare
+`__main__` in its place.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageFilter
+
+from fashion_buddy.cache import ResultCache, make_key
+from fashion_buddy.metrics import observe, span
+
+POSTPROC_WORKERS = int(os.getenv("POSTPROC_WORKERS", "2"))
+
+# "Post-upscale ×1.25 + sharpen"
+UPSCALE_SHARPEN = (
+    ("upscale", {"factor": 1.25}),
+    ("unsharp", {"radius": 1.1, "percent": 130, "threshold": 2}),
+)
+
+
+def _upscale(img, factor=1.25):
+    w, h = img.size
+    return img.resize((int(w * factor), int(h * factor)), Image.LANCZOS)
+
+
+def _unsharp(img, radius=1.1, percent=130, threshold=2):
+    return img.filter(ImageFilter.UnsharpMask(radius=radius, percent=percent, threshold=threshold))
+
+
+STEPS = {"upscale": _upscale, "unsharp": _unsharp}
+
+_memo = ResultCache(max_items=int(os.getenv("POSTPROC_MEMO_ITEMS", "64")), disk_dir=None)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def register_step(name: str, fn):
+    """fn(img: PIL.Image, **kwargs) -> PIL.Image; must be importable by worker processes."""
+    STEPS[name] = fn
+
+
+def run_pipeline(data: bytes, pipeline, fmt: str = "JPEG", quality: int = 95) -> bytes:
+    """Decode once, apply steps, encode once."""
+    img = Image.open(io.BytesIO(data))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    for name, kwargs in pipeline:
+        img = STEPS[name](img, **kwargs)
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, quality=quality)
+    return buf.getvalue()
+
+
+def _submit(*args):
+    """Submit to the spawn pool (rebuilt if a worker died). Workers start inside submit, so that is
+    where the page module is hidden from them."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(max_workers=POSTPROC_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        main = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            return _pool.submit(*args)
+        finally:
+            sys.modules["__main__"] = main
+
+
+def postprocess_async(data: bytes, pipeline=UPSCALE_SHARPEN, fmt: str = "JPEG", quality: int = 95) -> Future:
+    """Memoized pipeline run on the process pool; the Future is already done on a memo hit."""
+    done = Future()
+    if not pipeline:
+        done.set_result(data)
+        return done
+    key = make_key("post", hashlib.sha256(data).hexdigest(), [list(s) for s in pipeline], fmt, quality)
+    cached = _memo.get(key)
+    if cached is not None:
+        observe("postprocess", 0.0, outcome="cache_hit")
+        done.set_result(cached)
+        return done
+    t0 = time.perf_counter()
+
+    def finished(fut):
+        if fut.exception() is None:
+            _memo.set(key, fut.result())
+        observe("postprocess", time.perf_counter() - t0, outcome="ok" if fut.exception() is None else "error")
+
+    try:
+        fut = _submit(run_pipeline, data, pipeline, fmt, quality)
+    except Exception:  # pool broken or unavailable: inline
+        with span("postprocess"):
+            out = run_pipeline(data, pipeline, fmt, quality)
+        _memo.set(key, out)
+        done.set_result(out)
+        return done
+    fut.add_done_callback(finished)
+    return fut
+
+
+def postprocess(data: bytes, pipeline=UPSCALE_SHARPEN, fmt: str = "JPEG", quality: int = 95) -> bytes:
+    """Blocking `postprocess_async` (inline if the worker fails)."""
+    try:
+        return postprocess_async(data, pipeline, fmt, quality).result()
+    except Exception:
+        return run_pipeline(data, pipeline, fmt, quality)
@@ -0,0 +1,253 @@
+"""
+Non-blocking Replicate predictions.
+
+`start_prediction` creates a prediction and returns a handle right away; the page then calls
+`handle.refresh()` from a short periodic fragment instead of blocking in `replicate.run`.
+Polling backs off (0.5 s → 5 s). Status can also arrive by webhook: set REPLICATE_WEBHOOK_URL
+to a public URL that forwards to the local receiver on REPLICATE_WEBHOOK_HOST:REPLICATE_WEBHOOK_PORT
+(127.0.0.1:8765). Deliveries must carry a valid Replicate signature (webhook-id / webhook-timestamp /
+webhook-signature, HMAC-SHA256 with REPLICATE_WEBHOOK_SECRET or the account's default secret) no
+older than WEBHOOK_TOLERANCE_S; anything else is rejected. If the receiver can't start, polling
+alone is used.
+
+Every live handle is tracked process-wide; a reaper thread cancels predictions whose page
+stopped refreshing them for ORPHAN_AFTER_S (tab closed, user navigated away).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fashion_buddy.metrics import observe
+
+POLL_MIN_S = 0.5
+POLL_MAX_S = 5.0
+ORPHAN_AFTER_S = float(os.getenv("PREDICTION_ORPHAN_S", "30"))
+TERMINAL = ("succeeded", "failed", "canceled")
+WEBHOOK_TOLERANCE_S = 300
+
+_lock = threading.Lock()
+_active: dict = {}  # prediction id -> PredictionHandle
+_reaper = None
+_webhook_server = None
+_webhook_secret = None
+_webhook_failed = False
+
+
+class PredictionHandle:
+    """Local view of one remote prediction: status, logs, output, error."""
+
+    def __init__(self, client, prediction, backend: str = "replicate"):
+        self.client = client
+        self.backend = backend
+        self.prediction = prediction
+        self.id = prediction.id
+        self.status = prediction.status
+        self.logs = prediction.logs or ""
+        self.output = prediction.output
+        self.error = prediction.error
+        self.started = time.time()
+        self.last_seen = time.time()
+        self._interval = POLL_MIN_S
+        self._next_poll = time.monotonic() + POLL_MIN_S
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL
+
+    def _apply(self, status, logs, output, error):
+        self.status = status
+        self.logs = logs or self.logs
+        self.output = output
+        self.error = error
+        if self.done:
+            with _lock:
+                known = _active.pop(self.id, None) is not None
+            if known:  # first transition to a terminal status
+                observe("inference", self.elapsed_s, self.backend, self.status)
+
+    def refresh(self, heartbeat: bool = True) -> "PredictionHandle":
+        """Heartbeat + poll the API if the backoff interval has elapsed. Cheap to call often.
+        Worker threads waiting on a page's behalf pass heartbeat=False, so a closed tab still gets reaped."""
+        if heartbeat:
+            self.last_seen = time.time()
+        with self._lock:
+            if self.done or time.monotonic() < self._next_poll:
+                return self
+            try:
+                self.prediction.reload()
+                p = self.prediction
+                self._apply(p.status, p.logs, p.output, p.error)
+                self._interval = min(self._interval * 1.6, POLL_MAX_S)
+            except Exception:
+                self._interval = POLL_MAX_S  # transient API trouble: slow down, don't give up
+            self._next_poll = time.monotonic() + self._interval
+        return self
+
+    def wait(self, heartbeat: bool = True, cancel: threading.Event | None = None) -> "PredictionHandle":
+        """Block (in a worker thread, never the script thread) until the prediction is terminal.
+        Setting `cancel` cancels the prediction and ends the wait."""
+        while not self.refresh(heartbeat).done:
+            pause = max(0.05, min(self._next_poll - time.monotonic(), POLL_MAX_S))
+            if cancel is None:
+                time.sleep(pause)
+            elif cancel.wait(pause):
+                self.cancel()
+        return self
+
+    def cancel(self):
+        with self._lock:
+            if self.done:
+                return
+            try:
+                self.prediction.cancel()
+            finally:
+                self._apply("canceled", self.logs, None, self.error or "canceled")
+
+    def update_from_webhook(self, payload: dict):
+        with self._lock:
+            if not self.done:
+                self._apply(payload.get("status", self.status), payload.get("logs"),
+                            payload.get("output"), payload.get("error"))
+
+    @property
+    def elapsed_s(self) -> float:
+        return time.time() - self.started
+
+
+def _version_id(ref: str) -> str:
+    # "owner/name:version" → "version"
+    return ref.split(":", 1)[1] if ":" in ref else ref
+
+
+def start_prediction(client, ref: str, input: dict, backend: str | None = None) -> PredictionHandle:
+    """Create the prediction without waiting for it; returns a tracked handle (metrics label: `backend`)."""
+    params = {}
+    hook = webhook_url(client)
+    if hook:
+        params = {"webhook": hook, "webhook_events_filter": ["start", "logs", "completed"]}
+    prediction = client.predictions.create(version=_version_id(ref), input=input, **params)
+    handle = PredictionHandle(client, prediction, backend or ref.split(":")[0].rsplit("/", 1)[-1])
+    with _lock:
+        _active[handle.id] = handle
+    _ensure_reaper()
+    return handle
+
+
+def get_handle(prediction_id: str) -> PredictionHandle | None:
+    with _lock:
+        return _active.get(prediction_id)
+
+
+def active_predictions() -> list:
+    with _lock:
+        return list(_active.values())
+
+
+# ---------- orphan reaper ----------
+def reap_orphans(now: float | None = None) -> int:
+    """Cancel predictions nobody refreshed for ORPHAN_AFTER_S; returns how many."""
+    now = time.time() if now is None else now
+    n = 0
+    for h in active_predictions():
+        if now - h.last_seen > ORPHAN_AFTER_S:
+            try:
+                h.cancel()
+                n += 1
+            except Exception:
+                pass
+    return n
+
+
+def _reap_loop():
+    while True:
+        time.sleep(5)
+        reap_orphans()
+
+
+def _ensure_reaper():
+    global _reaper
+    with _lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap_loop, name="prediction-reaper", daemon=True)
+            _reaper.start()
+
+
+# ---------- optional webhook receiver ----------
+def verify_webhook(secret: str, headers, body: bytes, now: float | None = None) -> bool:
+    """Replicate (Standard Webhooks) signature check: HMAC-SHA256 over "id.timestamp.body", fresh timestamp."""
+    msg_id, ts, sigs = (headers.get(h) for h in ("webhook-id", "webhook-timestamp", "webhook-signature"))
+    if not (secret and msg_id and ts and sigs):
+        return False
+    try:
+        if abs((time.time() if now is None else now) - int(ts)) > WEBHOOK_TOLERANCE_S:
+            return False
+        key = base64.b64decode(secret.removeprefix("whsec_"))
+    except ValueError:
+        return False
+    expected = base64.b64encode(hmac.new(key, f"{msg_id}.{ts}.".encode() + body, hashlib.sha256).digest()).decode()
+    return any(hmac.compare_digest(expected, s.partition(",")[2]) for s in sigs.split())
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        if not verify_webhook(_webhook_secret, self.headers, body):
+            self.send_response(401)
+            self.end_headers()
+            return
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            payload = {}
+        handle = get_handle(payload.get("id", "")) if isinstance(payload, dict) else None
+        if handle is not None:
+            handle.update_from_webhook(payload)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _signing_secret(client) -> str | None:
+    secret = os.getenv("REPLICATE_WEBHOOK_SECRET")
+    if secret or client is None:
+        return secret
+    try:
+        return client.webhooks.default.secret().key
+    except Exception:
+        return None
+
+
+def webhook_url(client=None) -> str | None:
+    """
+    Public webhook URL if configured and the local receiver is up (started on first use);
+    None means poll only: no URL, no signing secret, or the port is taken.
+    """
+    global _webhook_server, _webhook_secret, _webhook_failed
+    url = os.getenv("REPLICATE_WEBHOOK_URL")
+    if not url or _webhook_failed:
+        return None
+    if _webhook_server is not None:
+        return url
+    secret = _signing_secret(client)
+    if not secret:
+        return None  # unsigned deliveries can't be trusted; try again with the next client
+    with _lock:
+        if _webhook_server is None and not _webhook_failed:
+            host = os.getenv("REPLICATE_WEBHOOK_HOST", "127.0.0.1")
+            port = int(os.getenv("REPLICATE_WEBHOOK_PORT", "8765"))
+            try:
+                _webhook_server = ThreadingHTTPServer((host, port), _WebhookHandler)
+            except OSError:
+                _webhook_failed = True  # e.g. a second worker already holds the port
+                return None
+            _webhook_secret = secret
+            threading.Thread(target=_webhook_server.serve_forever, name="replicate-webhook", daemon=True).start()
+    return None if _webhook_failed else url
@@ -0,0 +1,69 @@
+"""
+Rerun profiler: which page blocks ran on each Streamlit rerun and how long each took.
+
+    prof = RerunProfiler(st.session_state)
+    prof.begin()                       # top of the script: a full-app run
+    with prof.block("palette"): ...    # recomputed
+    prof.skip("links")                 # inputs unchanged, rendered from the previous result
+    prof.end()
+
+A block entered while no run is open (a fragment rerunning on its own) records a separate
+"fragment" run. Durations also go to the metrics registry as stage "rerun_block".
+"""
+import time
+from contextlib import contextmanager
+
+from fashion_buddy.metrics import observe
+
+
+class RerunProfiler:
+    def __init__(self, state, key: str = "_rerun_profile", keep: int = 20):
+        self.state = state
+        self.key = key
+        self.keep = keep
+        if key not in state:
+            state[key] = {"runs": [], "open": None, "n": 0}
+
+    @property
+    def _p(self) -> dict:
+        return self.state[self.key]
+
+    def begin(self, scope: str = "app"):
+        p = self._p
+        if p["open"] is not None:
+            self.end()  # previous run stopped early (st.stop / st.rerun)
+        p["n"] += 1
+        p["open"] = {"run": p["n"], "scope": scope, "t0": time.perf_counter(), "blocks": []}
+
+    def end(self):
+        p = self._p
+        run = p["open"]
+        if run is None:
+            return
+        run["total_ms"] = round((time.perf_counter() - run.pop("t0")) * 1e3, 2)
+        p["runs"] = (p["runs"] + [run])[-self.keep:]
+        p["open"] = None
+
+    @contextmanager
+    def block(self, name: str):
+        own = self._p["open"] is None
+        if own:
+            self.begin(scope=f"fragment:{name}")
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            self._p["open"]["blocks"].append({"block": name, "status": "ran", "ms": round(dt * 1e3, 2)})
+            observe("rerun_block", dt, name)
+            if own:
+                self.end()
+
+    def skip(self, name: str):
+        run = self._p["open"]
+        if run is not None:
+            run["blocks"].append({"block": name, "status": "cached", "ms": 0.0})
+
+    def runs(self) -> list:
+        """Most recent first."""
+        return list(reversed(self._p["runs"]))
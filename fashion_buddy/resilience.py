@@ -0,0 +1,61 @@
+"""Retry with jittered exponential backoff and a simple process-wide circuit breaker."""
+import random
+import threading
+import time
+
+
+class CircuitOpen(RuntimeError):
+    """Raised instead of calling a backend the breaker considers unhealthy."""
+
+
+class CircuitBreaker:
+    """
+    closed → (fail_threshold consecutive failures) → open → (reset_after_s) → half-open.
+    In half-open one trial call is let through; success closes the breaker, failure re-opens it.
+    Callers must `record` every call `before_call` admitted; a trial that never reports back
+    (caller died) is given up after another reset_after_s and the next call becomes the trial.
+    """
+
+    def __init__(self, name: str, fail_threshold: int = 5, reset_after_s: float = 60.0):
+        self.name = name
+        self.fail_threshold = fail_threshold
+        self.reset_after_s = reset_after_s
+        self._failures = 0
+        self._opened_at = None
+        self._trial_at = None  # monotonic start of the outstanding half-open trial
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_after_s else "open"
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            wait_s = self.reset_after_s - (time.monotonic() - self._opened_at)
+            now = time.monotonic()
+            if self._trial_at is not None and now - self._trial_at >= self.reset_after_s:
+                self._trial_at = None  # lost trial
+            if wait_s > 0 or self._trial_at is not None:
+                raise CircuitOpen(f"{self.name} unhealthy, failing fast (retry in {max(wait_s, 1):.0f}s)")
+            self._trial_at = now
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._trial_at = None
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.fail_threshold:
+                self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, base_s: float = 1.0, max_s: float = 20.0) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(max_s, base_s * (2 ** attempt)))
@@ -0,0 +1,170 @@
+"""
+Retailer search fan-out: every (outfit slot, retailer) search in parallel, results as they arrive.
+
+Endpoints come from RETAILER_SEARCH_URLS, a JSON object of retailer name → URL template with a
+`{q}` placeholder (a partner/affiliate search API, or benchmarks/mock_servers.py locally):
+
+    RETAILER_SEARCH_URLS='{"Zalando": "https://partner.example/zalando/search?q={q}"}'
+
+Answers may be a JSON list of products or an object holding one under "products" / "items" /
+"results" / "data"; each product needs a title and price, url / image are optional.
+
+Requests run on one background event loop with one pooled `httpx.AsyncClient`, so connections are
+kept alive across plans and reruns. Each host gets at most RETAIL_PER_HOST requests in flight and
+RETAIL_TIMEOUT_S per request. Answers are cached for RETAIL_CACHE_TTL_S, keyed on (retailer,
+normalized query): lower-cased, de-duplicated, sorted words.
+
+    for res in search_retailers({"Top": "navy oxford shirt top", ...}):
+        ...  # {"item", "retailer", "query", "status", "products", "ms", "cached"}, fastest first
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+
+from fashion_buddy.cache import ResultCache, make_key
+from fashion_buddy.clients import CONNECT_TIMEOUT_S, POOL_SIZE, _httpx_async_hooks, _httpx_limits
+from fashion_buddy.metrics import span
+
+RETAILER_SEARCH_URLS = json.loads(os.getenv("RETAILER_SEARCH_URLS") or "{}")
+TIMEOUT_S = float(os.getenv("RETAIL_TIMEOUT_S", "4"))
+PER_HOST = int(os.getenv("RETAIL_PER_HOST", "4"))
+TTL_S = float(os.getenv("RETAIL_CACHE_TTL_S", "900"))
+MAX_PRODUCTS = 8
+
+# memory tier only has no TTL of its own: entries carry their fetch time
+_cache = ResultCache(max_items=int(os.getenv("RETAIL_CACHE_ITEMS", "1024")), disk_dir=None)
+_loop = None
+_client = None
+_host_limits: dict = {}
+_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(sorted(set(query.lower().split())))
+
+
+def _num(v):
+    try:
+        return round(float(str(v).replace(",", ".").strip().lstrip("€$£").strip()), 2)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_products(payload, limit: int = MAX_PRODUCTS) -> list[dict]:
+    """Retailer answer → [{"title", "price", "currency", "url", "image"}, ...] (unusable entries dropped)."""
+    if isinstance(payload, dict):
+        payload = next((payload[k] for k in ("products", "items", "results", "data") if isinstance(payload.get(k), list)),
+                       [])
+    out = []
+    for p in payload if isinstance(payload, list) else []:
+        if not isinstance(p, dict):
+            continue
+        price = p.get("price")
+        if isinstance(price, dict):  # {"value": 39.9, "currency": "EUR"}
+            currency, price = price.get("currency"), price.get("value", price.get("amount"))
+        else:
+            currency = p.get("currency")
+        title, price = p.get("title") or p.get("name"), _num(price)
+        if not title or price is None:
+            continue
+        out.append({"title": str(title), "price": price, "currency": currency or "EUR",
+                    "url": p.get("url") or p.get("link"), "image": p.get("image") or p.get("image_url")})
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _ensure_loop() -> asyncio.AbstractEventLoop:
+    """Background event loop shared by every session; the pooled client lives on it."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="retail-search", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def _get_client():
+    # only touched from the loop thread, so no lock
+    global _client
+    if _client is None:
+        import httpx
+        _client = httpx.AsyncClient(
+            limits=_httpx_limits(POOL_SIZE),
+            timeout=httpx.Timeout(TIMEOUT_S, connect=min(CONNECT_TIMEOUT_S, TIMEOUT_S)),
+            event_hooks=_httpx_async_hooks("retail"),
+            follow_redirects=True,
+        )
+    return _client
+
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urllib.parse.urlsplit(url).netloc
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(PER_HOST)
+    return sem
+
+
+async def _search_one(retailer: str, template: str, item: str, query: str, limit: int) -> dict:
+    import httpx
+    res = {"item": item, "retailer": retailer, "query": query, "status": "ok", "products": [], "ms": 0.0,
+           "cached": False}
+    key = make_key("retail", retailer, template, normalize_query(query), limit)
+    cached = _cache.get(key)
+    if cached is not None and time.time() - cached["at"] <= TTL_S:
+        return res | {"products": cached["products"], "cached": True}
+    url = template.format(q=urllib.parse.quote_plus(query))
+    t0 = time.perf_counter()
+    with span("retail_search", retailer) as s:
+        try:
+            async with _host_limit(url):
+                rsp = await _get_client().get(url, headers={"Accept": "application/json"})
+            if rsp.status_code != 200:
+                res["status"] = s.outcome = f"http_{rsp.status_code}"
+            else:
+                res["products"] = parse_products(rsp.json(), limit)
+        except Exception as e:
+            res["status"] = s.outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+    res["ms"] = round((time.perf_counter() - t0) * 1e3, 1)
+    if res["status"] == "ok":
+        _cache.set(key, {"at": time.time(), "products": res["products"]})
+    return res
+
+
+async def _fan_out(jobs, limit: int, deliver):
+    tasks = [asyncio.ensure_future(_search_one(r, t, item, q, limit)) for r, t, item, q in jobs]
+    for fut in asyncio.as_completed(tasks):
+        deliver(await fut)
+
+
+def search_retailers(queries: dict, retailers: dict | None = None, limit: int = MAX_PRODUCTS):
+    """
+    Search every retailer for every slot's query at once and yield the results in completion order.
+
+    `queries` maps outfit slot → query string (e.g. first entries of `build_queries`); `retailers`
+    defaults to RETAILER_SEARCH_URLS. Failures come back with status "timeout" / "http_N" / "error".
+    """
+    retailers = RETAILER_SEARCH_URLS if retailers is None else retailers
+    jobs = [(r, t, item, q) for item, q in queries.items() for r, t in retailers.items()]
+    if not jobs:
+        return
+    out: queue.Queue = queue.Queue()
+    fut = asyncio.run_coroutine_threadsafe(_fan_out(jobs, limit, out.put), _ensure_loop())
+    for _ in jobs:
+        try:
+            # per-host queuing can stretch the tail beyond one timeout; the future catches the rest
+            yield out.get(timeout=TIMEOUT_S * (1 + len(jobs) // max(1, PER_HOST)) + 1)
+        except queue.Empty:
+            fut.cancel()
+            return
+    fut.result()
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
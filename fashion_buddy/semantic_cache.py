@@ -0,0 +1,183 @@
+"""
+Semantic response cache: reuse a stylist answer for a question that means the same thing.
+
+Requests are normalized (lower-case, punctuation stripped) and embedded locally with a signed
+hashing vectorizer — word unigrams + bigrams (stop words dropped) and character trigrams into DIM
+buckets, L2-normalized float32 — so there is no model download and no network call. Vectors live in one preallocated
+(capacity, DIM) array; a lookup is one matmul over the rows of the same bucket, and an answer is
+served when the best cosine similarity reaches `threshold`.
+
+Buckets keep near-duplicates from crossing meaning-changing lines: the occasion recognized the same
+way `offline_reply` does (date / interview / party / everyday), the style vibe (longest keyword
+first, so "smart casual" is not "casual"), a budget band, and whether the request negates anything
+("no dresses", "I hate heels"). Callers add their own parts (model, system prompt, gender, ...).
+Embed only free text: a templated prompt's shared wording would outweigh the part that differs.
+
+Capacity is bounded; when full, the least recently used row is overwritten. Hits and misses are
+counted here and exported as `fashion_buddy_semantic_cache_total{kind, outcome}`.
+Env: SEMANTIC_CACHE_ITEMS (default 2000), SEMANTIC_CACHE_THRESHOLD (0.85, 0 disables the cache).
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from fashion_buddy.metrics import inc
+from fashion_buddy.shopping import STYLE_KEYWORDS
+
+DIM = 2048
+CAPACITY = int(os.getenv("SEMANTIC_CACHE_ITEMS", "2000"))
+THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+OCCASIONS = {  # same keywords as offline_reply, checked in this order
+    "date": ["свидан", "dating", "date", "роман"],
+    "interview": ["интервью", "собесед", "job", "офис"],
+    "party": ["вечерин", "club", "party", "ноч"],
+}
+BUDGET_BANDS = (150, 400, 1000)  # € upper bounds; above the last is its own band
+# filler that says nothing about the outfit ("what should I wear to ...")
+STOPWORDS = set("""a an the to for of in on at with and or my me i im is it be should would could can
+what which how do does wear outfit look ideas idea please help need want some any good best
+что как мне на в во для и или с со надеть одеться образ лук посоветуй подскажи хочу нужно""".split())
+NEGATIONS = set("""no not dont don t never without avoid hate hates dislike except nothing none
+нет не без ненавижу кроме никаких""".split())
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MONEY = re.compile(r"(\d{2,5})\s*(?:€|eur|euro|евро|\$|usd)|(?:€|\$|budget|бюджет)\s*:?\s*(\d{2,5})")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def occasion_of(text: str) -> str:
+    t = (text or "").lower()
+    for name, keys in OCCASIONS.items():
+        if any(k in t for k in keys):
+            return name
+    return "everyday"
+
+
+def vibe_of(text: str) -> str:
+    t = (text or "").lower()
+    return next((v for v in sorted(STYLE_KEYWORDS, key=len, reverse=True) if v in t), "-")
+
+
+def negates(text: str) -> bool:
+    return any(w in NEGATIONS for w in normalize(text).split())
+
+
+def budget_band(text: str) -> str:
+    m = _MONEY.search((text or "").lower())
+    if not m:
+        return "-"
+    amount = int(m.group(1) or m.group(2))
+    for hi in BUDGET_BANDS:
+        if amount <= hi:
+            return f"≤{hi}"
+    return f">{BUDGET_BANDS[-1]}"
+
+
+def bucket(text: str, *extra) -> str:
+    return "|".join(map(str, (occasion_of(text), vibe_of(text), budget_band(text), negates(text)) + extra))
+
+
+def embed(text: str, dim: int = DIM) -> np.ndarray:
+    """Signed hashing-vectorizer embedding of normalized `text` (unit float32 vector)."""
+    words = [w for w in normalize(text).split() if w not in STOPWORDS]
+    feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        w = f"<{w}>"
+        feats += [w[i:i + 3] for i in range(len(w) - 2)]
+    v = np.zeros(dim, dtype=np.float32)
+    for f in feats:
+        h = zlib.crc32(f.encode())
+        v[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+class SemanticCache:
+    def __init__(self, capacity: int = CAPACITY, threshold: float = THRESHOLD, dim: int = DIM, kind: str = "llm"):
+        self.capacity = max(1, int(capacity))
+        self.threshold = threshold
+        self.dim = dim
+        self.kind = kind
+        self._vecs = np.zeros((self.capacity, dim), dtype=np.float32)
+        self._bucket = np.full(self.capacity, -1, dtype=np.int64)   # bucket id per row, −1 = free
+        self._used = np.zeros(self.capacity, dtype=np.float64)      # last hit / insert time (LRU)
+        self._answers: list = [None] * self.capacity
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _bid(key: str) -> int:
+        # a 63-bit hash, not a registry: nothing outlives the rows of an evicted bucket
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") >> 1
+
+    def get(self, text: str, *bucket_parts):
+        """(answer, similarity) of the closest cached request in the same bucket, or (None, best similarity)."""
+        q = embed(text, self.dim)
+        with self._lock:
+            rows = np.flatnonzero(self._bucket == self._bid(bucket(text, *bucket_parts)))
+            best, sim = None, 0.0
+            if len(rows):
+                sims = self._vecs[rows] @ q
+                i = int(np.argmax(sims))
+                sim = float(sims[i])
+                if sim >= self.threshold:
+                    best = int(rows[i])
+            if best is None:
+                self.misses += 1
+                outcome, answer = "miss", None
+            else:
+                self.hits += 1
+                self._used[best] = time.monotonic()
+                outcome, answer = "hit", self._answers[best]
+        inc("semantic_cache", kind=self.kind, outcome=outcome)
+        return answer, sim
+
+    def set(self, text: str, answer, *bucket_parts):
+        if not answer:
+            return
+        q = embed(text, self.dim)
+        with self._lock:
+            bid = self._bid(bucket(text, *bucket_parts))
+            same = np.flatnonzero(self._bucket == bid)
+            if len(same) and float(np.max(self._vecs[same] @ q)) >= 0.999:
+                row = int(same[np.argmax(self._vecs[same] @ q)])  # same request again: refresh the answer
+            else:
+                free = np.flatnonzero(self._bucket < 0)
+                row = int(free[0]) if len(free) else int(np.argmin(self._used))
+                if not len(free):
+                    self.evictions += 1
+            self._vecs[row] = q
+            self._bucket[row] = bid
+            self._answers[row] = answer
+            self._used[row] = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                    "items": int((self._bucket >= 0).sum()), "capacity": self.capacity}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache | None:
+    """Process-wide cache shared by all sessions; None when SEMANTIC_CACHE_THRESHOLD is 0."""
+    global _cache
+    if THRESHOLD <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache()
+        return _cache
@@ -0,0 +1,40 @@
+"""Retailer search links and outfit heuristics (no Streamlit, importable by benchmarks and pages)."""
+
+RETAILERS = {
+    "Zalando": "https://www.zalando.de/catalog/?q={q}",
+    "ASOS": "https://www.asos.com/search/?q={q}",
+    "H&M": "https://www2.hm.com/en_eur/search-results.html?q={q}",
+    "Amazon": "https://www.amazon.de/s?k={q}",
+}
+DEFAULT_ITEMS = [("Top", 0.22), ("Bottom", 0.22), ("Outerwear", 0.18), ("Shoes", 0.24), ("Accessory", 0.14)]
+STYLE_KEYWORDS = {
+    "casual": ["t-shirt", "jeans", "sneakers"],
+    "smart casual": ["oxford shirt", "chinos", "loafers"],
+    "business": ["blazer", "trousers", "derby shoes"],
+    "evening": ["silk blouse", "dress pants", "heels"],
+    "streetwear": ["oversized hoodie", "cargo pants", "chunky sneakers"],
+}
+GENDER_KEYWORDS = {"male": ["men"], "female": ["women"], "unisex": ["unisex"]}
+
+
+def rgb_to_hex(rgb): return "#%02x%02x%02x" % rgb
+def budget_split(total: int): return [(n, max(10, int(total * pct))) for n, pct in DEFAULT_ITEMS]
+
+def build_queries(event, vibe, gender, colors, sizes):
+    base = []
+    if (v := (vibe or "").strip().lower()):   base += STYLE_KEYWORDS.get(v, [v])
+    if (g := (gender or "").strip().lower()): base += GENDER_KEYWORDS.get(g, [g])
+    if colors: base += colors
+    if sizes:  base += [sizes]
+    if event:  base += [event]
+    base = list(dict.fromkeys([t for t in base if t]))
+    return {
+        "Top":       [" ".join(base + ["top"])],
+        "Bottom":    [" ".join(base + ["pants"])],
+        "Outerwear": [" ".join(base + ["jacket"])],
+        "Shoes":     [" ".join(base + ["shoes"])],
+        "Accessory": [" ".join(base + ["accessory"])],
+    }
+
+def product_links(query: str):
+    return " | ".join(f"[{name}]({tmpl.format(q=query.replace(' ', '+'))})" for name, tmpl in RETAILERS.items())
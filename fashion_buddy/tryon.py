@@ -0,0 +1,230 @@
+"""Try-on helpers shared by the pages: SegFit call, content-addressed result cache, queue handlers."""
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+
+from PIL import Image
+
+from fashion_buddy.cache import BlobCache, make_key
+from fashion_buddy.clients import get_secret, get_session
+from fashion_buddy.jobs import JobError, register_handler
+from fashion_buddy.looks import keep_result
+from fashion_buddy.metrics import span
+from fashion_buddy.payload import encode_segfit_inputs, segfit_body
+from fashion_buddy.resilience import CircuitBreaker, CircuitOpen, backoff_delay
+
+log = logging.getLogger(__name__)
+
+SEGFIT_VERSION = "segfit-v1.3"
+SEGMIND_BASE_URL = os.getenv("SEGMIND_BASE_URL", "https://api.segmind.com/v1")  # benchmarks point it at a stand-in
+
+# README degradation ladder: as requested → Balanced → smaller inputs → no seed.
+# Each rung only ever makes the request cheaper than what the user asked for.
+SEGFIT_LADDER = [
+    {},
+    {"model_type": "Balanced"},
+    {"model_type": "Balanced", "max_side": 1024},
+    {"model_type": "Balanced", "max_side": 1024, "seed": -1},
+]
+MODEL_TYPE_COST = {"Speed": 0, "Balanced": 1, "Quality": 2}
+SEGFIT_BREAKER = CircuitBreaker("Segmind SegFit",
+                                fail_threshold=int(os.getenv("SEGFIT_BREAKER_FAILS", "5")),
+                                reset_after_s=float(os.getenv("SEGFIT_BREAKER_RESET_S", "60")))
+_latency_ewma: dict = {}  # model_type -> smoothed seconds of successful calls
+
+TRYON_CACHE_DIR = os.getenv("TRYON_CACHE_DIR", os.path.join(".cache", "tryon"))
+TRYON_CACHE_MAX_MB = float(os.getenv("TRYON_CACHE_MAX_MB", "512"))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_tryon_cache() -> BlobCache:
+    """Process-wide result store (TRYON_CACHE_DIR, capped at TRYON_CACHE_MAX_MB)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = BlobCache(TRYON_CACHE_DIR, int(TRYON_CACHE_MAX_MB * 1024 * 1024))
+        return _cache
+
+
+def tryon_key(person: bytes, garment: bytes, *, backend: str, model_version: str, **params) -> str:
+    """
+    Digest of (normalized person bytes, normalized garment bytes, backend, model version, params).
+    Only meaningful for deterministic runs — callers must skip the cache when the seed is random.
+    """
+    return make_key(
+        hashlib.sha256(person).hexdigest(),
+        hashlib.sha256(garment).hexdigest(),
+        backend,
+        model_version,
+        params,
+    )
+
+
+def call_segfit(model_image: bytes, outfit_image: bytes, *, model_type, cn_strength, cn_end, image_format,
+                image_quality, seed, timeout_s=240, api_key=None):
+    """POST raw JPEG bytes to Segmind SegFit; returns (ok, image bytes | error text, response)."""
+    url = f"{SEGMIND_BASE_URL.rstrip('/')}/{SEGFIT_VERSION}"
+    payload = {
+        "model_type":   model_type,
+        "cn_strength":  float(cn_strength),
+        "cn_end":       float(cn_end),
+        "image_format": image_format,
+        "image_quality": int(image_quality),
+        "base64": True,
+    }
+    if seed >= 0: payload["seed"] = int(seed)
+    api_key = api_key or get_secret("SEGMIND_API_KEY")  # resolved per call: queued jobs never carry the key
+    headers = {"x-api-key": api_key or "", "Content-Type": "application/json", "Accept": "application/json"}
+    body = segfit_body(model_image, outfit_image, payload)
+    with span("inference", "segfit") as s:
+        r = get_session("segmind").post(url, data=body, headers=headers, timeout=timeout_s)
+        if r.status_code == 200:
+            js = r.json(); img_b64 = js.get("image") if isinstance(js, dict) else js
+            return True, base64.b64decode(img_b64), r
+        s.outcome = f"http_{r.status_code}"
+        return False, r.text, r
+
+
+def _shrink(jpeg: bytes, max_side: int) -> bytes:
+    """Downscale normalized JPEG bytes so the long side fits max_side (never upscales)."""
+    from fashion_buddy.imaging import to_jpeg_bytes
+    w, h = Image.open(io.BytesIO(jpeg)).size
+    return jpeg if max(w, h) <= max_side else to_jpeg_bytes(jpeg, min_side=1, max_side=max_side, quality=90)
+
+
+def segfit_with_fallback(person: bytes, garment: bytes, *, model_type, cn_strength, cn_end, image_format,
+                         image_quality, seed, budget_s: float = 240, ladder=None, max_retries: int = 2,
+                         payload_budget_kb: int = 0, api_key=None, cancel=None):
+    """
+    SegFit with retries (jittered exponential backoff on 429/5xx/timeouts), the degradation ladder and
+    the circuit breaker, all inside `budget_s`. Rungs whose expected latency no longer fits the remaining
+    budget are skipped. With `payload_budget_kb`, inputs are re-encoded to fit that upload size. Once the
+    `cancel` event is set, no further attempt starts (the one in flight runs to its timeout).
+    Returns (ok, image bytes | error text, response | None, attempts).
+    """
+    with span("tryon", "segfit") as s:
+        ok, data, resp, attempts = _segfit_ladder(
+            person, garment, model_type=model_type, cn_strength=cn_strength, cn_end=cn_end,
+            image_format=image_format, image_quality=image_quality, seed=seed, budget_s=budget_s,
+            ladder=ladder, max_retries=max_retries, payload_budget_kb=payload_budget_kb, api_key=api_key,
+            cancel=cancel)
+        if ok:
+            s.outcome = "ok" if attempts[-1]["rung"] == 0 else "degraded"
+        else:
+            last = attempts[-1]["status"] if attempts else "error"
+            s.outcome = f"http_{last}" if isinstance(last, int) and last else str(last or "error")
+        return ok, data, resp, attempts
+
+
+def _segfit_ladder(person, garment, *, model_type, cn_strength, cn_end, image_format, image_quality, seed,
+                   budget_s, ladder, max_retries, payload_budget_kb, api_key, cancel=None):
+    import requests
+
+    start = time.monotonic()
+    attempts, last_err, last_resp, seen = [], "no attempt made", None, set()
+    for rung_no, rung in enumerate(ladder if ladder is not None else SEGFIT_LADDER):
+        mt = rung.get("model_type", model_type)
+        if MODEL_TYPE_COST.get(mt, 0) > MODEL_TYPE_COST.get(model_type, 0):
+            mt = model_type
+        sd = rung.get("seed", seed)
+        p, g = person, garment
+        if rung.get("max_side"):
+            p, g = _shrink(person, rung["max_side"]), _shrink(garment, rung["max_side"])
+        p, g = encode_segfit_inputs(p, g, int(payload_budget_kb) * 1024)
+        sig = (mt, sd, len(p), len(g))
+        if sig in seen:
+            continue  # rung changes nothing for this request
+        seen.add(sig)
+        side = max(Image.open(io.BytesIO(p)).size)
+        est = _latency_ewma.get(mt)
+        remaining = budget_s - (time.monotonic() - start)
+        if est is not None and est > remaining:
+            attempts.append(dict(rung=rung_no, model_type=mt, max_side=side, seed=sd, status="skipped",
+                                 latency_s=0.0, error=f"expected {est:.0f}s > remaining {remaining:.0f}s"))
+            continue
+        for retry in range(max_retries + 1):
+            if cancel is not None and cancel.is_set():
+                attempts.append(dict(rung=rung_no, model_type=mt, max_side=side, seed=sd, status="canceled",
+                                     latency_s=0.0, error="canceled"))
+                return False, "canceled", last_resp, attempts
+            remaining = budget_s - (time.monotonic() - start)
+            if remaining <= 1:
+                attempts.append(dict(rung=rung_no, model_type=mt, max_side=side, seed=sd, status="budget",
+                                     latency_s=0.0, error="latency budget exhausted"))
+                return False, f"Latency budget of {budget_s:.0f}s exhausted. Last error: {last_err}", last_resp, attempts
+            rec = dict(rung=rung_no, model_type=mt, max_side=side, seed=sd, retry=retry)
+            t0 = time.monotonic()
+            try:
+                SEGFIT_BREAKER.before_call()
+            except CircuitOpen as e:
+                attempts.append({**rec, "status": "circuit-open", "latency_s": 0.0, "error": str(e)})
+                return False, str(e), None, attempts
+            try:
+                ok, data, resp = call_segfit(p, g, model_type=mt, cn_strength=cn_strength,
+                                             cn_end=cn_end, image_format=image_format, image_quality=image_quality,
+                                             seed=sd, timeout_s=remaining, api_key=api_key)
+                status = resp.status_code
+            except (requests.RequestException, ValueError) as e:
+                # transport trouble, or a 200 whose body isn't the expected JSON / base64 (e.g. a proxy's HTML page)
+                ok, data, resp, status = False, f"{type(e).__name__}: {e}", None, 0
+            except BaseException:
+                SEGFIT_BREAKER.record(False)  # every exit records, or a half-open trial would never end
+                raise
+            dt = time.monotonic() - t0
+            transient = status == 0 or status == 429 or status >= 500
+            SEGFIT_BREAKER.record(not transient)
+            attempts.append({**rec, "status": status, "latency_s": round(dt, 2),
+                             "error": None if ok else str(data)[:300]})
+            if ok:
+                prev = _latency_ewma.get(mt)
+                _latency_ewma[mt] = dt if prev is None else 0.7 * prev + 0.3 * dt
+                return True, data, resp, attempts
+            last_err, last_resp = str(data)[:300], resp
+            if status in (401, 403):
+                return False, data, resp, attempts  # auth problem: no rung will help
+            if not transient:
+                break  # 4xx: try the next (cheaper) rung instead of repeating the same request
+            if retry < max_retries:
+                delay = backoff_delay(retry)
+                if delay >= budget_s - (time.monotonic() - start):
+                    break
+                if cancel is not None:
+                    cancel.wait(delay)
+                else:
+                    time.sleep(delay)
+    return False, last_err, last_resp, attempts
+
+
+def segfit_job(params: dict, person: bytes, garment: bytes) -> bytes:
+    """Queue handler: one SegFit variant; result goes to the try-on cache when the seed is fixed
+    and to the history of `params["owner"]`."""
+    owner = params.pop("owner", None)
+    key = None
+    if params.get("seed", -1) >= 0:
+        key = tryon_key(person, garment, backend="segmind", model_version=SEGFIT_VERSION, **params)
+        hit = get_tryon_cache().get(key)
+        if hit is not None:
+            return hit
+    ok, data, resp, attempts = segfit_with_fallback(person, garment, **params)
+    if not ok:
+        status = getattr(resp, "status_code", 0)
+        msg = f"SegFit HTTP {status}: {str(data)[:500]}"
+        if status in (0, 429) or status >= 500:
+            raise RuntimeError(msg)  # transient → retried by the queue
+        raise JobError(msg)
+    if key and attempts[-1]["rung"] == 0:  # a degraded answer is not what this key describes
+        get_tryon_cache().put(key, data)
+    try:
+        keep_result(owner=owner, image=data, backend="segfit", meta={"seed": params.get("seed"), "model_type": params.get("model_type")})
+    except Exception:
+        log.exception("segfit job: result not saved to look history")
+    return data
+
+
+register_handler("segfit", segfit_job)
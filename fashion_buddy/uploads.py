@@ -0,0 +1,71 @@
+"""
+Uploads to Replicate Files straight from memory (no temp files).
+
+Person and garment go up concurrently, and every URL is remembered by content digest until
+shortly before the file expires, so one person photo is uploaded once for many garments.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from fashion_buddy.metrics import observe, span
+
+URL_TTL_S = float(os.getenv("UPLOAD_URL_TTL_S", "3600"))  # used when the API doesn't report expires_at
+EXPIRY_MARGIN_S = 300.0
+MAX_URLS = 1024
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("UPLOAD_WORKERS", "4")), thread_name_prefix="upload")
+_lock = threading.Lock()
+_urls: OrderedDict = OrderedDict()  # (client id, sha256) -> (url, valid_until epoch)
+stats = {"uploads": 0, "hits": 0, "bytes_uploaded": 0}
+
+
+def _valid_until(file) -> float:
+    exp = getattr(file, "expires_at", None)
+    if exp:
+        try:
+            ts = datetime.fromisoformat(exp.replace("Z", "+00:00"))
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            return ts.timestamp() - EXPIRY_MARGIN_S
+        except ValueError:
+            pass
+    return time.time() + URL_TTL_S
+
+
+def upload_image(client, data: bytes, name: str = "image.jpg", content_type: str = "image/jpeg") -> str:
+    """Upload bytes via `client.files.create` and return the file URL; reuses a still-valid URL for the same bytes."""
+    key = (id(client), hashlib.sha256(data).hexdigest())
+    now = time.time()
+    with _lock:
+        hit = _urls.get(key)
+        if hit and hit[1] > now:
+            _urls.move_to_end(key)
+            stats["hits"] += 1
+            observe("upload", 0.0, "replicate", "cache_hit")
+            return hit[0]
+    buf = io.BytesIO(data)
+    buf.name = name
+    with span("upload", "replicate"):
+        f = client.files.create(buf, filename=name, content_type=content_type)
+    url = f.urls["get"]
+    with _lock:
+        _urls[key] = (url, _valid_until(f))
+        _urls.move_to_end(key)
+        stats["uploads"] += 1
+        stats["bytes_uploaded"] += len(data)
+        while len(_urls) > MAX_URLS:
+            _urls.popitem(last=False)
+    return url
+
+
+def upload_pair(client, person: bytes, garment: bytes) -> tuple[str, str]:
+    """Upload person and garment concurrently; returns (person_url, garment_url)."""
+    fp = _pool.submit(upload_image, client, person, "person.jpg")
+    fg = _pool.submit(upload_image, client, garment, "garment.jpg")
+    return fp.result(), fg.result()
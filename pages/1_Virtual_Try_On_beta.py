@@ -1,7 +1,9 @@
-import os
-import io
 import streamlit as st
-from PIL import Image
+
+from fashion_buddy.backends import BACKENDS, submit_hedged
+from fashion_buddy.clients import get_secret
+from fashion_buddy.imaging import to_jpeg_bytes
+from fashion_buddy.looks import keep_result, session_owner
 
 # ===== Replicate SDK =====
 try:
@@ -33,43 +35,21 @@ with c2:
 person_url_input = st.text_input("...or paste YOUR photo URL (optional)")
 cloth_url = st.text_input("...or paste clothing image URL (optional)")
 
-model_choice = st.selectbox(
-    "Model endpoint",
-    ["idm-vton (Replicate)", "ecommerce-virtual-try-on (Replicate)"],
-    index=0
-)
-
-# ================== Helpers ==================
-def _filelike_from_uploaded(uploaded_file, out_name: str, min_side: int = 512, max_side: int = 1024):
-    """
-    Открываем любой формат, конвертим в RGB JPEG.
-    Если очень маленькое изображение — мягко подтягиваем до ~min_side по короткой стороне.
-    Если очень большое — уменьшаем до ~max_side по длинной стороне.
-    Возвращаем BytesIO с .name, готовый для передачи в replicate.run().
-    """
-    img = Image.open(uploaded_file).convert("RGB")
-    w, h = img.size
-    long_side, short_side = max(w, h), min(w, h)
-
-    if short_side < min_side:
-        scale = min_side / short_side
-    elif long_side > max_side:
-        scale = max_side / long_side
-    else:
-        scale = 1.0
-
-    if scale != 1.0 and w > 0 and h > 0:
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    buf.seek(0)
-    # важно: задать имя — некоторым SDK это помогает определить тип
-    buf.name = out_name
-    return buf
-
-# ================== Build inputs for Replicate ==================
-# Каждый инпут может быть либо file-like объектом (BytesIO), либо строкой-URL.
+MODEL_LABELS = {
+    "idm-vton (Replicate)": "idm-vton",
+    "ecommerce-virtual-try-on (Replicate)": "ecom-vton",
+    "SegFit v1.3 (Segmind)": "segfit",
+    "Local mock (offline)": "mock",
+}
+model_choice = st.selectbox("Model endpoint", list(MODEL_LABELS), index=0)
+
+with st.expander("Hedging (tail latency)"):
+    hedge_choice = st.selectbox("Secondary backend", ["(none)"] + list(MODEL_LABELS), index=0,
+                                help="Если основной не ответил за p-й перцентиль своей латентности — параллельно запускаем второй.")
+    hedge_p = st.slider("Hedge after primary's latency percentile", 50, 99, 95)
+
+# ================== Build inputs ==================
+# Каждый инпут — либо нормализованные JPEG-байты, либо строка-URL.
 person_input = None
 cloth_input  = None
 
@@ -78,7 +58,7 @@ if person_url_input.strip():
     person_input = person_url_input.strip()
 elif person_file is not None:
     try:
-        person_input = _filelike_from_uploaded(person_file, "person.jpg")
+        person_input = to_jpeg_bytes(person_file, 512, 1024, quality=90)
     except Exception as e:
         st.error(f"Cannot process your photo: {e}")
 
@@ -86,92 +66,125 @@ if cloth_url.strip():
     cloth_input = cloth_url.strip()
 elif cloth_file is not None:
     try:
-        cloth_input = _filelike_from_uploaded(cloth_file, "cloth.jpg")
+        cloth_input = to_jpeg_bytes(cloth_file, 512, 1024, quality=90)
     except Exception as e:
         st.error(f"Cannot process clothing image: {e}")
 
 with st.expander("Input debug"):
     st.write({
-        "person_input": "file" if hasattr(person_input, "read") else (person_input or None),
-        "cloth_input":  "file" if hasattr(cloth_input, "read")  else (cloth_input  or None),
-        "model": model_choice
+        "person_input": "file" if isinstance(person_input, bytes) else (person_input or None),
+        "cloth_input":  "file" if isinstance(cloth_input, bytes)  else (cloth_input  or None),
+        "model": model_choice,
+        "hedge": hedge_choice,
     })
 
 run = st.button("Try on")
 
+def cancel_predictions(job):
+    """Отменяем живые Replicate predictions задачи (SegFit/mock отменить нельзя — просто забываем)."""
+    for h in job["handles"]:
+        if not h.done:
+            try:
+                h.cancel()
+            except Exception:
+                pass
+
+def tracker(job):
+    """on_prediction для бэкендов: запоминаем handle; если Cancel нажали раньше, чем он появился — сразу отменяем."""
+    def on_prediction(handle):
+        job["handles"].append(handle)
+        if job.get("canceled"):
+            cancel_predictions(job)
+    return on_prediction
+
 # ================== Guards ==================
 if run:
+    primary = BACKENDS[MODEL_LABELS[model_choice]]
+    secondary = BACKENDS.get(MODEL_LABELS.get(hedge_choice, ""))
+    if secondary is primary:
+        secondary = None
+    used = [b.name for b in (primary, secondary) if b is not None]
+
     errors = []
     if person_input is None:
         errors.append("Upload your photo or paste its direct URL.")
     if cloth_input is None:
         errors.append("Provide clothing image (file upload or direct URL).")
+    if {"segfit", "mock"} & set(used) and (isinstance(person_input, str) or isinstance(cloth_input, str)):
+        errors.append("SegFit / mock need uploaded files, not URLs.")
 
-    rep_token = os.getenv("REPLICATE_API_TOKEN")
-    if not rep_token:
-        try:
-            rep_token = st.secrets["REPLICATE_API_TOKEN"]
-        except Exception:
-            rep_token = None
-    if not rep_token:
-        errors.append("Missing REPLICATE_API_TOKEN in Streamlit Secrets.")
+    if "segfit" in used and not get_secret("SEGMIND_API_KEY"):
+        errors.append("Missing SEGMIND_API_KEY in Streamlit Secrets.")
+
+    if {"idm-vton", "ecom-vton"} & set(used):
+        rep_token = get_secret("REPLICATE_API_TOKEN")
+        if not rep_token:
+            errors.append("Missing REPLICATE_API_TOKEN in Streamlit Secrets.")
+        elif not REPLICATE_AVAILABLE:
+            errors.append("`replicate` package not found. Ensure `replicate` is in requirements.txt.")
 
     if errors:
         st.error(" | ".join(errors))
         st.stop()
 
-    if not REPLICATE_AVAILABLE:
-        st.error("`replicate` package not found. Ensure `replicate` is in requirements.txt.")
-        st.stop()
-
-    os.environ["REPLICATE_API_TOKEN"] = rep_token
-
-    # Пинованные версии (при желании обнови на актуальные с Replicate)
-    IDM_VTON = "cuuupid/idm-vton:005205c5e7a4053b04418089f3a22b2b62705f0339ddad0b3f6db0d0e66aabc2"
-    ECOM_VTON = "wolverinn/ecommerce-virtual-try-on:39860afc9f164ce9734d5666d17a771f986dd2bd3ad0935d845054f73bbec447"
-
-    def run_idm_vton(person, cloth):
-        # Многие билды принимают и URL, и файл-объект
-        try:
-            return replicate.run(IDM_VTON, input={"human_img": person, "garm_img": cloth})
-        except Exception:
-            return replicate.run(IDM_VTON, input={"human_image": person, "cloth_image": cloth})
-
-    def run_ecom_vton(person, cloth):
-        try:
-            return replicate.run(ECOM_VTON, input={"face_image": person, "commerce_image": cloth})
-        except Exception:
-            return replicate.run(ECOM_VTON, input={"image_person": person, "image_clothing": cloth})
-
     # ================== Run ==================
+    # не блокируем скрипт: гонка бэкендов идёт в пуле, статус опрашивает фрагмент ниже
+    old = st.session_state.get("beta_job")
+    if old and not old["future"].done():
+        old["canceled"] = True
+        cancel_predictions(old)
+    job = {"handles": [], "backends": used}
+    job["future"] = submit_hedged(primary, secondary, person_input, cloth_input, percentile=hedge_p,
+                                  on_prediction=tracker(job))
+    st.session_state["beta_job"] = job
+
+# ================== Status / result ==================
+@st.fragment(run_every=1.0)
+def job_panel(job):
+    """Тикает раз в секунду: heartbeat + опрос predictions, статус, Cancel."""
+    for h in job["handles"]:
+        h.refresh()
+    if job["future"].done():
+        st.rerun()  # полный перезапуск → результат рисуется ниже, опрос прекращается
+    states = ", ".join(f"{h.backend}: **{h.status}**" for h in job["handles"]) or "starting…"
+    st.info(f"Generating try-on ({' + '.join(job['backends'])}) — {states}")
+    if st.button("Cancel", key="beta_cancel"):
+        job["canceled"] = True
+        cancel_predictions(job)
+        st.rerun()
+
+def show_finished(job):
+    if job.get("canceled"):
+        st.warning("Canceled.")
+        return
     try:
-        with st.spinner("Generating try-on…"):
-            if model_choice.startswith("idm-vton"):
-                output = run_idm_vton(person_input, cloth_input)
-            else:
-                output = run_ecom_vton(person_input, cloth_input)
-
-        # Replicate обычно отдаёт список URL или одну URL-строку
-        if isinstance(output, list) and output:
-            result_url = output[0]
-        elif isinstance(output, str):
-            result_url = output
-        else:
-            result_url = None
-
-        if result_url:
-            st.subheader("Result")
-            st.image(result_url, use_container_width=True)
-            with st.expander("Debug info"):
-                st.write({
-                    "person": "file" if hasattr(person_input, "read") else person_input,
-                    "cloth":  "file" if hasattr(cloth_input, "read")  else cloth_input,
-                    "raw_output": output if not isinstance(output, (str, bytes)) else "(string)"
-                })
-            st.success("Done! Try other photos for comparison.")
-        else:
-            st.error("No image in response. Try another model or different images.")
-
+        res = job["future"].result()
     except Exception as e:
         st.error(f"Try-on failed: {e}")
         st.info("Tips: use a clear front-facing photo (≥512px) and a product image with the garment fully visible.")
+        return
+    if "image" not in job:
+        cancel_predictions(job)  # проигравший в гонке prediction больше не нужен
+        job["image"] = res.image
+        try:
+            _, job["image"] = keep_result(owner=session_owner(), image=res.image, url=None if res.image else res.url, backend=res.backend)
+        except Exception as e:
+            st.warning(f"The result wasn't saved to your look history: {e}")
+    st.subheader("Result")
+    st.image(job["image"] or res.url, use_container_width=True)
+    with st.expander("Debug info"):
+        st.write({
+            "backend": res.backend,
+            "hedged": res.hedged,
+            "latency_s": round(res.latency_s, 2),
+            "failed_attempts": res.attempts,
+            "raw_output": res.raw if not isinstance(res.raw, (str, bytes)) else "(string)"
+        })
+    st.success("Done! Try other photos for comparison.")
+
+job = st.session_state.get("beta_job")
+if job:
+    if job["future"].done() or job.get("canceled"):
+        show_finished(job)
+    else:
+        job_panel(job)
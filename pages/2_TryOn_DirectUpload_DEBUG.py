@@ -1,17 +1,18 @@
-import os
-import io
-import tempfile
 import streamlit as st
-from PIL import Image
+
+from fashion_buddy.backends import ECOM_VTON, IDM_VTON, extract_first_image_url
+from fashion_buddy.clients import get_replicate, get_secret
+from fashion_buddy.imaging import to_jpeg_bytes
+from fashion_buddy.looks import keep_result, session_owner
+from fashion_buddy.predictions import start_prediction
+from fashion_buddy.uploads import upload_pair
 
 # ===== Replicate SDK =====
 try:
     import replicate
-    from replicate import files as replicate_files  # для files.upload
     REPLICATE_AVAILABLE = True
 except Exception:
     REPLICATE_AVAILABLE = False
-    replicate_files = None  # type: ignore
 
 st.set_page_config(page_title="Try-On (Direct Upload DEBUG)", page_icon="🧪", layout="centered")
 st.title("🧪 Try-On — Direct Upload DEBUG")
@@ -40,129 +41,90 @@ model_choice = st.selectbox(
 
 run = st.button("Try on")
 
-# ========== Helpers ==========
-def _to_jpeg_bytes(uploaded_file, min_side: int = 512, max_side: int = 1024) -> bytes:
-    """Любой формат → RGB JPEG. Подтягиваем мелкое до min_side, большое уменьшаем до max_side."""
-    img = Image.open(uploaded_file).convert("RGB")
-    w, h = img.size
-    if w == 0 or h == 0:
-        raise ValueError("Empty image")
-    long_side, short_side = max(w, h), min(w, h)
-    if short_side < min_side:
-        scale = min_side / short_side
-    elif long_side > max_side:
-        scale = max_side / long_side
-    else:
-        scale = 1.0
-    if scale != 1.0:
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return buf.getvalue()
-
-def _upload_to_replicate_files(jpeg_bytes: bytes, name: str = "image.jpg") -> str:
-    """Пишем во временный файл → replicate.files.upload(path) → получаем https URL."""
-    if not REPLICATE_AVAILABLE or not replicate_files:
-        raise RuntimeError("Replicate SDK/files unavailable")
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tf:
-        tf.write(jpeg_bytes)
-        tf.flush()
-        path = tf.name
-    url = replicate_files.upload(path)  # -> 'https://replicate.delivery/...' (прямая ссылка)
-    return url
-
-def _extract_first_image_url(output):
-    """Достаём первый URL из разных форматов ответа (строка, список, dict, FileOutput)."""
-    urls = []
-    def consider(x):
-        if x is None:
-            return
-        if isinstance(x, str) and x.startswith(("http://", "https://")):
-            urls.append(x); return
-        for attr in ("url", "href"):
-            try:
-                val = getattr(x, attr, None)
-                if isinstance(val, str) and val.startswith(("http://", "https://")):
-                    urls.append(val); return
-            except Exception:
-                pass
-        try:
-            s = str(x)
-            if s.startswith(("http://", "https://")):
-                urls.append(s)
-        except Exception:
-            pass
-    if isinstance(output, dict):
-        for key in ("images", "image", "output", "result", "results", "urls", "url", "data"):
-            if key in output:
-                v = output[key]
-                if isinstance(v, list):
-                    for it in v: consider(it)
-                else:
-                    consider(v)
-    elif isinstance(output, list):
-        for it in output: consider(it)
-    else:
-        consider(output)
-    return urls[0] if urls else None
-
 # ====== Run ======
 if run:
     # базовые проверки
     errors = []
     if person_file is None: errors.append("Upload YOUR photo.")
     if cloth_file  is None: errors.append("Upload CLOTHING photo.")
-    rep_token = os.getenv("REPLICATE_API_TOKEN") or (st.secrets.get("REPLICATE_API_TOKEN") if hasattr(st, "secrets") else None)
+    rep_token = get_secret("REPLICATE_API_TOKEN")
     if not rep_token: errors.append("Missing REPLICATE_API_TOKEN in Streamlit Secrets.")
     if not REPLICATE_AVAILABLE: errors.append("`replicate` package not installed (add to requirements.txt).")
     if errors:
         st.error(" | ".join(errors))
     else:
-        os.environ["REPLICATE_API_TOKEN"] = rep_token
+        rep = get_replicate(rep_token)
 
         try:
             # 1) нормализуем → 2) грузим в Replicate Files → 3) получаем URL
-            pj = _to_jpeg_bytes(person_file)
-            cj = _to_jpeg_bytes(cloth_file)
-            person_url = _upload_to_replicate_files(pj, "person.jpg")
-            cloth_url  = _upload_to_replicate_files(cj, "cloth.jpg")
+            pj = to_jpeg_bytes(person_file)
+            cj = to_jpeg_bytes(cloth_file)
+            # из памяти, параллельно; повторный тот же человек не грузится заново
+            person_url, cloth_url = upload_pair(rep, pj, cj)
         except Exception as e:
             st.exception(e)
             st.error("Preprocess/upload failed.")
             st.stop()
 
-        st.subheader("Debug (prepared URLs)")
-        st.write({"person_url": person_url, "cloth_url": cloth_url, "model": model_choice})
-
-        # зафиксированные версии (при необходимости обнови)
-        IDM_VTON = "cuuupid/idm-vton:005205c5e7a4053b04418089f3a22b2b62705f0339ddad0b3f6db0d0e66aabc2"
-        ECOM_VTON = "wolverinn/ecommerce-virtual-try-on:39860afc9f164ce9734d5666d17a771f986dd2bd3ad0935d845054f73bbec447"
-
+        # создаём prediction и НЕ ждём его: статус, логи и Cancel — во фрагменте ниже
+        if model_choice.startswith("idm-vton"):
+            # ВАЖНО: ровно те ключи, которые просит модель
+            ref, inp = IDM_VTON, {"human_img": person_url, "garm_img": cloth_url}
+        else:
+            ref, inp = ECOM_VTON, {"face_image": person_url, "commerce_image": cloth_url}
+        old = st.session_state.get("du_job")
+        if old and not old["handle"].done:
+            old["handle"].cancel()
         try:
-            with st.spinner("Generating try-on…"):
-                if model_choice.startswith("idm-vton"):
-                    # ВАЖНО: ровно те ключи, которые просит модель
-                    output = replicate.run(
-                        IDM_VTON,
-                        input={"human_img": person_url, "garm_img": cloth_url}
-                    )
-                else:
-                    output = replicate.run(
-                        ECOM_VTON,
-                        input={"face_image": person_url, "commerce_image": cloth_url}
-                    )
-
-            st.subheader("Debug (raw output)")
-            st.write(output)
-
-            result_url = _extract_first_image_url(output)
-            if result_url:
-                st.subheader("Result")
-                st.image(result_url, use_container_width=True)
-                st.success("Done!")
-            else:
-                st.error("No image URL parsed from response. Try the other model or different images.")
-
+            handle = start_prediction(rep, ref, inp, backend=model_choice.split()[0])
         except Exception as e:
             st.exception(e)
             st.error("Try-on failed.")
+            st.stop()
+        st.session_state["du_job"] = {"handle": handle, "model": model_choice,
+                                      "urls": {"person_url": person_url, "cloth_url": cloth_url, "model": model_choice}}
+
+# ====== Prediction status / result ======
+@st.fragment(run_every=1.0)
+def prediction_panel(job):
+    """Тикает раз в секунду, пока prediction жив: статус, логи, Cancel. Заодно heartbeat для reaper'а."""
+    h = job["handle"].refresh()
+    if h.done:
+        st.rerun()
+    st.info(f"Prediction `{h.id}` — **{h.status}** · {h.elapsed_s:.0f}s")
+    if h.logs:
+        st.code(h.logs[-2000:])
+    if st.button("Cancel", key="du_cancel"):
+        h.cancel()
+        st.rerun()
+
+def show_finished(job):
+    h = job["handle"]
+    st.subheader("Debug (raw output)")
+    st.write(h.output)
+    if h.status != "succeeded":
+        st.exception(RuntimeError(h.error or h.status))
+        st.error("Try-on failed.")
+        return
+    result_url = extract_first_image_url(h.output)
+    if not result_url:
+        st.error("No image URL parsed from response. Try the other model or different images.")
+        return
+    st.subheader("Result")
+    if "image" not in job:
+        try:
+            _, job["image"] = keep_result(owner=session_owner(), url=result_url, backend=job["model"].split()[0])
+        except Exception as e:
+            job["image"] = None
+            st.warning(f"The result wasn't saved to your look history: {e}")
+    st.image(job["image"] or result_url, use_container_width=True)
+    st.success("Done!")
+
+job = st.session_state.get("du_job")
+if job:
+    st.subheader("Debug (prepared URLs)")
+    st.write(job["urls"])
+    if job["handle"].done:
+        show_finished(job)
+    else:
+        prediction_panel(job)
@@ -1,17 +1,19 @@
-import os
-import io
-import tempfile
 import streamlit as st
-from PIL import Image
+
+from fashion_buddy.backends import IDM_VTON, extract_first_image_url
+from fashion_buddy.looks import keep_result, session_owner
+from fashion_buddy.clients import get_replicate, get_secret
+from fashion_buddy.imaging import to_jpeg_bytes
+from fashion_buddy.predictions import start_prediction
+from fashion_buddy.tryon import get_tryon_cache, tryon_key
+from fashion_buddy.uploads import upload_pair
 
 # ==== Replicate SDK ====
 try:
     import replicate
-    from replicate import files as replicate_files
     REPLICATE_AVAILABLE = True
 except Exception:
     REPLICATE_AVAILABLE = False
-    replicate_files = None  # type: ignore
 
 st.set_page_config(page_title="Try-On — IDM-VTON ONLY", page_icon="🧪", layout="centered")
 st.title("🧪 Try-On — IDM-VTON ONLY")
@@ -31,84 +33,23 @@ with c2:
         type=["jpg", "jpeg", "png", "webp"],
         help="Карточка товара на ровном фоне."
     )
+seed = st.number_input("Seed (−1 = random, fixed seed enables result cache)", value=42, min_value=-1, max_value=2_147_483_647)
 run = st.button("Try on")
 
-# ==== Helpers ====
-def to_jpeg_bytes(uploaded_file, min_side: int = 512, max_side: int = 1024) -> bytes:
-    img = Image.open(uploaded_file).convert("RGB")
-    w, h = img.size
-    if w == 0 or h == 0:
-        raise ValueError("Empty image")
-    long_side, short_side = max(w, h), min(w, h)
-    if short_side < min_side:
-        scale = min_side / short_side
-    elif long_side > max_side:
-        scale = max_side / long_side
-    else:
-        scale = 1.0
-    if scale != 1.0:
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return buf.getvalue()
-
-def upload_to_replicate(jpeg_bytes: bytes, suffix=".jpg") -> str:
-    if not REPLICATE_AVAILABLE or not replicate_files:
-        raise RuntimeError("Replicate SDK/files unavailable")
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tf:
-        tf.write(jpeg_bytes)
-        tf.flush()
-        path = tf.name
-    # Вернёт прямую ссылку вида https://replicate.delivery/...
-    return replicate_files.upload(path)
-
-def extract_first_image_url(output):
-    urls = []
-    def consider(x):
-        if x is None: return
-        if isinstance(x, str) and x.startswith(("http://", "https://")):
-            urls.append(x); return
-        for attr in ("url", "href"):
-            try:
-                v = getattr(x, attr, None)
-                if isinstance(v, str) and v.startswith(("http://", "https://")):
-                    urls.append(v); return
-            except Exception:
-                pass
-        try:
-            s = str(x)
-            if s.startswith(("http://", "https://")):
-                urls.append(s)
-        except Exception:
-            pass
-    if isinstance(output, dict):
-        for k in ("images","image","output","result","results","urls","url","data"):
-            if k in output:
-                v = output[k]
-                if isinstance(v, list):
-                    for it in v: consider(it)
-                else:
-                    consider(v)
-    elif isinstance(output, list):
-        for it in output: consider(it)
-    else:
-        consider(output)
-    return urls[0] if urls else None
-
 # ==== Run ====
 if run:
     # Гварды
     errors = []
     if person_file is None: errors.append("Upload YOUR photo.")
     if cloth_file  is None: errors.append("Upload CLOTHING photo.")
-    token = os.getenv("REPLICATE_API_TOKEN") or (st.secrets.get("REPLICATE_API_TOKEN") if hasattr(st, "secrets") else None)
+    token = get_secret("REPLICATE_API_TOKEN")
     if not token: errors.append("Missing REPLICATE_API_TOKEN in Streamlit Secrets.")
     if not REPLICATE_AVAILABLE: errors.append("`replicate` package not installed (add to requirements.txt).")
     if errors:
         st.error(" | ".join(errors))
         st.stop()
 
-    os.environ["REPLICATE_API_TOKEN"] = token
+    rep = get_replicate(token)
 
     # 1) нормализуем обе картинки
     try:
@@ -119,39 +60,89 @@ if run:
         st.error("Preprocess failed.")
         st.stop()
 
-    # 2) грузим в Replicate Files → получаем HTTPS URL
+    # 1.5) тот же человек + та же вещь + тот же seed → отдаём из кэша, без сети
+    cache = get_tryon_cache()
+    cache_key = tryon_key(pj, cj, backend="replicate", model_version=IDM_VTON,
+                          seed=int(seed), output_format="url") if seed >= 0 else None
+    cached = cache.get(cache_key) if cache_key else None
+    old = st.session_state.get("idm_job")
+    if old and old["handle"] is not None and not old["handle"].done:
+        old["handle"].cancel()
+    if cached is not None:
+        # как и свежий результат — через session_state, иначе следующий rerun его потеряет
+        st.session_state["idm_job"] = {"handle": None, "cache_key": cache_key, "payload": None, "image": cached}
+        st.rerun()
+
+    # 2) грузим в Replicate Files из памяти (параллельно, с кэшем URL по digest) → получаем HTTPS URL
     try:
-        human_url = upload_to_replicate(pj, ".jpg")
-        garm_url  = upload_to_replicate(cj, ".jpg")
+        human_url, garm_url = upload_pair(rep, pj, cj)
     except Exception as e:
         st.exception(e)
         st.error("Upload to Replicate Files failed.")
         st.stop()
 
-    # Печатаем, ЧТО ИМЕННО отправим в модель
-    st.subheader("Debug (request to model)")
     input_payload = {"human_img": human_url, "garm_img": garm_url}
-    st.json(input_payload)
-
-    # 3) вызываем КОНКРЕТНУЮ версию IDM-VTON с ЭТИМИ ключами
-    IDM_VTON = "cuuupid/idm-vton:005205c5e7a4053b04418089f3a22b2b62705f0339ddad0b3f6db0d0e66aabc2"
+    if seed >= 0:
+        input_payload["seed"] = int(seed)
 
+    # 3) создаём prediction КОНКРЕТНОЙ версии IDM-VTON и НЕ ждём его: статус опрашивает фрагмент ниже
     try:
-        with st.spinner("Generating try-on (IDM-VTON)…"):
-            output = replicate.run(IDM_VTON, input=input_payload)
-
-        st.subheader("Debug (raw output)")
-        st.write(output)
-
-        result_url = extract_first_image_url(output)
-        if result_url:
-            st.subheader("Result")
-            st.image(result_url, use_container_width=True)
-            st.success("Done!")
-        else:
-            st.error("No image URL parsed from response.")
-
+        handle = start_prediction(rep, IDM_VTON, input_payload)
     except Exception as e:
         # Показываем ПОЛНУЮ ошибку модели (без скрытия)
         st.exception(e)
         st.error("Model call failed.")
+        st.stop()
+    st.session_state["idm_job"] = {"handle": handle, "cache_key": cache_key, "payload": input_payload}
+
+# ==== Prediction status / result ====
+@st.fragment(run_every=1.0)
+def prediction_panel(job):
+    """Тикает раз в секунду, пока prediction жив: статус, логи, Cancel. Заодно heartbeat для reaper'а."""
+    h = job["handle"].refresh()
+    if h.done:
+        st.rerun()  # полный перезапуск страницы → результат рисуется ниже, опрос прекращается
+    st.info(f"Prediction `{h.id}` — **{h.status}** · {h.elapsed_s:.0f}s")
+    if h.logs:
+        st.code(h.logs[-2000:])
+    if st.button("Cancel", key="idm_cancel"):
+        h.cancel()
+        st.rerun()
+
+def show_finished(job):
+    h = job["handle"]
+    st.subheader("Debug (raw output)")
+    st.write(h.output)
+    if h.status != "succeeded":
+        st.error(f"Model call {h.status}: {h.error or 'no details'}")
+        return
+    result_url = extract_first_image_url(h.output)
+    if not result_url:
+        st.error("No image URL parsed from response.")
+        return
+    st.subheader("Result")
+    if "image" not in job:
+        job["image"] = None
+        try:
+            # один раз скачиваем на сервер (стримом) → локальное хранилище + история; ссылка delivery протухает
+            _, job["image"] = keep_result(owner=session_owner(), url=result_url, backend="idm-vton", meta={"seed": job["payload"].get("seed")})
+            if job["cache_key"]:
+                get_tryon_cache().put(job["cache_key"], job["image"])
+        except Exception as e:
+            st.warning(f"The result wasn't saved to your look history: {e}")
+    st.image(job["image"] or result_url, use_container_width=True)
+    st.success("Done!")
+
+job = st.session_state.get("idm_job")
+if job and job["handle"] is None:  # из кэша: к модели не ходили
+    st.subheader("Result")
+    st.image(job["image"], use_container_width=True)
+    st.success("Done! (cached)")
+elif job:
+    # Печатаем, ЧТО ИМЕННО отправили в модель
+    st.subheader("Debug (request to model)")
+    st.json(job["payload"])
+    if job["handle"].done:
+        show_finished(job)
+    else:
+        prediction_panel(job)
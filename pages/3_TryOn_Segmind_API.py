@@ -1,5 +1,13 @@
-import os, io, json, base64, requests, streamlit as st
-from PIL import Image, ImageFilter
+import streamlit as st
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fashion_buddy.clients import get_secret
+from fashion_buddy.imaging import to_jpeg_bytes
+from fashion_buddy.jobs import get_queue
+from fashion_buddy.looks import keep_result, session_owner
+from fashion_buddy.postprocess import UPSCALE_SHARPEN, postprocess_async
+from fashion_buddy.tryon import SEGFIT_VERSION, SEGFIT_BREAKER, get_tryon_cache, segfit_with_fallback, tryon_key
 
 st.set_page_config(page_title="Try-On (SegFit v1.3)", layout="centered")
 st.title("Try-On — SegFit v1.3")
@@ -22,82 +30,217 @@ with st.expander("Input pre-process"):
     min_side = st.slider("Min short side (upscale if smaller)", 640, 1400, 1024, 64)
     max_side = st.slider("Max long side (downscale if larger)", 1000, 2200, 1600, 50)
     jpeg_q_in = st.slider("JPEG quality for inputs", 80, 100, 95)
+    payload_kb = st.slider("Upload budget per request, KB (0 = off)", 0, 4000, 1200, 100,
+                           help="Inputs are re-encoded (quality, then size) to fit; short side stays ≥ model minimum.")
     post_up   = st.checkbox("Post-upscale ×1.25 + sharpen", True)
 
 with st.expander("Variants"):
     n_variants = st.slider("Render variants (different seeds)", 1, 3, 1)
     seed_base  = st.number_input("Seed base (−1 = random)", value=-1, min_value=-1, max_value=999_999_999)
+    deadline_s = st.slider("Overall deadline, s (stragglers are dropped)", 30, 600, 300, 10)
+    auto_fallback = st.checkbox("Auto-fallback: Balanced → smaller size → no seed", True,
+                                help="Retries 429/5xx with backoff, then steps down within the deadline.")
+    use_queue  = st.checkbox("Durable queue (survives reloads and restarts)", False,
+                             help="Variants run on the shared job queue; this page re-attaches via ?jobs=… in the URL.")
 
 run = st.button("Try on (SegFit v1.3)")
 
-def to_jpeg_bytes(file, min_side_px=1024, max_side_px=1600, quality=95) -> bytes:
-    img = Image.open(file).convert("RGB")
-    w, h = img.size
-    long_side, short_side = max(w,h), min(w,h)
-    if short_side < min_side_px: scale = min_side_px/short_side
-    elif long_side > max_side_px: scale = max_side_px/long_side
-    else: scale = 1.0
-    if scale != 1.0: img = img.resize((int(w*scale), int(h*scale)), Image.LANCZOS)
-    buf = io.BytesIO(); img.save(buf, format="JPEG", quality=quality); return buf.getvalue()
-
-def b64(jpeg_bytes: bytes) -> str:
-    return base64.b64encode(jpeg_bytes).decode("utf-8")
-
-def call_segfit(model_b64, outfit_b64, *, model_type, cn_strength, cn_end, image_format, image_quality, seed, timeout_s=240):
-    url = "https://api.segmind.com/v1/segfit-v1.3"
-    payload = {
-        "model_image":  model_b64,
-        "outfit_image": outfit_b64,
-        "model_type":   model_type,
-        "cn_strength":  float(cn_strength),
-        "cn_end":       float(cn_end),
-        "image_format": image_format,
-        "image_quality": int(image_quality),
-        "base64": True,
-    }
-    if seed >= 0: payload["seed"] = int(seed)
-    api_key = os.getenv("SEGMIND_API_KEY") or (st.secrets.get("SEGMIND_API_KEY") if hasattr(st, "secrets") else None)
-    headers = {"x-api-key": api_key or "", "Content-Type":"application/json", "Accept":"application/json"}
-    r = requests.post(url, data=json.dumps(payload).encode("utf-8"), headers=headers, timeout=timeout_s)
-    if r.status_code == 200:
-        js = r.json(); img_b64 = js.get("image") if isinstance(js, dict) else js
-        return True, base64.b64decode(img_b64), r
-    return False, r.text, r
+def segmind_key():
+    return get_secret("SEGMIND_API_KEY")
+
+def post_future(data):
+    """Постобработка в отдельном процессе (один decode + один encode, результат мемоизирован); None, если выключена."""
+    return postprocess_async(data, UPSCALE_SHARPEN, quality=min(98, image_quality+1)) if post_up else None
+
+def render_result(ok, data, headers=None, attempts=None, post=None, pending=False):
+    """post — фьючерс постобработки (готовый); pending — показываем сырой результат, пока она идёт."""
+    if ok:
+        img_bytes, note = data, "Enhancing…"
+        if post is not None and not pending:
+            try: img_bytes, note = post.result(), "Upscaled ×1.25 + sharpened"
+            except Exception: note = "Post-processing failed, showing the original"
+        st.image(img_bytes, use_container_width=True)
+        if post is not None:
+            # подпись есть в обоих состояниях: контейнер перерисовывается с тем же набором элементов
+            st.caption(note)
+    else:
+        st.error(f"API error: {data}")
+        if headers:
+            st.caption(str(headers))
+    if attempts and len(attempts) > 1:
+        with st.expander(f"Attempts ({len(attempts)})"):
+            st.table(attempts)
+
+def variant_boxes(seeds):
+    cols = st.columns(min(len(seeds), 3))
+    boxes = []
+    for i, seed_i in enumerate(seeds):
+        with cols[i % len(cols)]:
+            st.markdown(f"**Variant {i+1}** — seed={seed_i}")
+            boxes.append(st.empty())
+    return boxes
 
 if run:
     if not person_file or not cloth_file:
         st.error("Upload both photos."); st.stop()
+    if not segmind_key():
+        st.error("Missing SEGMIND_API_KEY in Streamlit Secrets."); st.stop()
     try:
-        person_b64 = b64(to_jpeg_bytes(person_file, min_side, max_side, jpeg_q_in))
-        cloth_b64  = b64(to_jpeg_bytes(cloth_file,  min_side, max_side, jpeg_q_in))
+        person_jpeg = to_jpeg_bytes(person_file, min_side, max_side, jpeg_q_in)
+        cloth_jpeg  = to_jpeg_bytes(cloth_file,  min_side, max_side, jpeg_q_in)
     except Exception as e:
         st.error(f"Preprocess failed: {e}"); st.stop()
 
-    cols = st.columns(min(n_variants,3))
+    seeds = [-1 if seed_base < 0 else int(seed_base)+i for i in range(n_variants)]
+    boxes = variant_boxes(seeds)
+    for box in boxes:
+        box.info("Rendering…")
+    # результаты живут в session_state: rerun (например, переключили enhance) рисует их заново из мемо
+    variants = [None] * len(seeds)
+    st.session_state["segfit_results"] = {"seeds": seeds, "variants": variants}
+    waiting = {}  # future -> ("variant" | "post", i)
+
+    def finish_variant(i, ok, data, headers=None, attempts=None):
+        variants[i] = (ok, data, headers, attempts or [])
+        post = post_future(data) if ok else None
+        with boxes[i].container():
+            render_result(ok, data, headers, attempts, post, pending=post is not None and not post.done())
+        if post is not None and not post.done():
+            waiting[post] = ("post", i)  # колонку обновим, когда процесс-пул отдаст картинку
+
+    # кэш только для фиксированного seed: при seed=-1 результат каждый раз новый
+    cache = get_tryon_cache()
+    keys = [
+        tryon_key(person_jpeg, cloth_jpeg, backend="segmind", model_version=SEGFIT_VERSION,
+                  model_type=model_type, cn_strength=float(cn_strength), cn_end=float(cn_end),
+                  image_format=image_format, image_quality=int(image_quality), seed=seed_i,
+                  payload_budget_kb=int(payload_kb))
+        if seed_i >= 0 else None
+        for seed_i in seeds
+    ]
     any_ok = False
-    for i in range(n_variants):
-        seed_i = -1 if seed_base < 0 else int(seed_base)+i
-        ok, data, resp = call_segfit(person_b64, cloth_b64,
-                                     model_type=model_type, cn_strength=cn_strength, cn_end=cn_end,
-                                     image_format=image_format, image_quality=image_quality, seed=seed_i)
-        with cols[i % len(cols)]:
-            st.markdown(f"**Variant {i+1}** — seed={seed_i}")
-            if ok:
-                img_bytes = data
-                if post_up:
+    pending = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key) if key else None
+        if hit is not None:
+            finish_variant(i, True, hit); any_ok = True
+        else:
+            pending.append(i)
+
+    if use_queue:
+        # в очередь: переживёт обрыв websocket и рестарт контейнера; страница подцепится по id из URL
+        queue = get_queue()
+        jobs = [(i, seeds[i], queue.enqueue("segfit", dict(
+                    model_type=model_type, cn_strength=float(cn_strength), cn_end=float(cn_end),
+                    image_format=image_format, image_quality=int(image_quality), seed=seeds[i],
+                    payload_budget_kb=int(payload_kb), owner=session_owner()),
+                    person_jpeg, cloth_jpeg))
+                for i in pending]
+        st.query_params["jobs"] = st.session_state["attach_jobs"] = ",".join(job_id for _, _, job_id in jobs)
+        for i, _, job_id in jobs:
+            boxes[i].info(f"Queued as job `{job_id}` — results below.")
+        pending = []
+
+    # все варианты летят параллельно; колонка заполняется, как только пришёл её результат
+    pool = ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="segfit")
+    waiting.update({
+        pool.submit(segfit_with_fallback, person_jpeg, cloth_jpeg,
+                    model_type=model_type, cn_strength=cn_strength, cn_end=cn_end,
+                    image_format=image_format, image_quality=image_quality, seed=seeds[i],
+                    budget_s=deadline_s, ladder=None if auto_fallback else [{}],
+                    payload_budget_kb=int(payload_kb), api_key=segmind_key()): ("variant", i)
+        for i in pending
+    })
+    deadline = time.monotonic() + deadline_s
+    try:
+        # варианты и их постобработка — в одном цикле: колонка обновляется, что бы ни пришло первым
+        while waiting:
+            done, _ = wait(waiting, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                kind, i = waiting.pop(fut)
+                if kind == "post":
+                    with boxes[i].container():
+                        render_result(*variants[i][:2], None, variants[i][3], fut)
+                    continue
+                try:
+                    ok, data, resp, attempts = fut.result()
+                except Exception as e:
+                    ok, data, resp, attempts = False, str(e), None, []
+                if ok and keys[i] and attempts[-1]["rung"] == 0:
+                    cache.put(keys[i], data)
+                if ok:
                     try:
-                        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                        w,h = img.size
-                        img = img.resize((int(w*1.25), int(h*1.25)), Image.LANCZOS)
-                        img = img.filter(ImageFilter.UnsharpMask(radius=1.1, percent=130, threshold=2))
-                        out = io.BytesIO(); img.save(out, format="JPEG", quality=min(98, image_quality+1))
-                        img_bytes = out.getvalue()
-                    except: pass
-                st.image(img_bytes, use_container_width=True)
-                any_ok = True
-            else:
-                st.error(f"API error: {data}")
-                if resp is not None:
-                    st.caption(str(dict(resp.headers)))
-    if not any_ok:
+                        keep_result(owner=session_owner(), image=data, backend="segfit", meta={"seed": seeds[i], "model_type": model_type})
+                    except Exception as e:  # история — не повод не показать результат
+                        st.warning(f"Variant {i + 1} wasn't saved to your look history: {e}")
+                finish_variant(i, ok, data if ok else str(data),
+                               dict(resp.headers) if resp is not None and not ok else None, attempts)
+                any_ok = any_ok or ok
+        for fut, (kind, i) in waiting.items():
+            if kind == "variant":
+                fut.cancel()
+                boxes[i].warning(f"Cancelled: no result within {deadline_s}s deadline.")
+    finally:
+        # не ждём отставших: их результат уже никому не нужен
+        pool.shutdown(wait=False, cancel_futures=True)
+    if not any_ok and not use_queue:
         st.warning("No variant succeeded. Try Balanced, less cn_strength/quality, try another seed or photo.")
+        if SEGFIT_BREAKER.state != "closed":
+            st.caption(f"Segmind circuit breaker: {SEGFIT_BREAKER.state}")
+
+# ==== Последний запуск: при rerun рисуем из session_state, API не трогаем ====
+last = st.session_state.get("segfit_results")
+if last and not run:
+    boxes = variant_boxes(last["seeds"])
+    posts = [post_future(v[1]) if v and v[0] else None for v in last["variants"]]  # все сразу → параллельно
+    for box, v, post in zip(boxes, last["variants"], posts):
+        if v is None:
+            box.info("No result (queued or past the deadline).")
+        else:
+            with box.container():
+                render_result(*v, post)
+
+# ==== Durable queue: re-attach to jobs by id ====
+if "attach_jobs" not in st.session_state:
+    st.session_state["attach_jobs"] = st.query_params.get("jobs", "")
+attach = st.text_input("Re-attach to job id(s)", key="attach_jobs",
+                       help="Comma-separated ids from a previous run (kept in the page URL).")
+job_ids = [j.strip() for j in attach.split(",") if j.strip()]
+if ",".join(job_ids) != st.query_params.get("jobs", ""):
+    st.query_params["jobs"] = ",".join(job_ids)
+
+def render_jobs(job_ids) -> bool:
+    """Рисуем задачи очереди; True, когда все завершены."""
+    queue = get_queue()
+    cols = st.columns(min(len(job_ids), 3))
+    finished = True
+    for n, job_id in enumerate(job_ids):
+        job = queue.get(job_id)
+        with cols[n % len(cols)]:
+            if job is None:
+                st.warning(f"Job `{job_id}` not found."); continue
+            st.markdown(f"**Job `{job_id}`** — seed={job['params'].get('seed')} · {job['status']}")
+            if job["status"] == "done":
+                result = queue.result(job_id)
+                render_result(True, result, post=post_future(result))
+            elif job["status"] == "failed":
+                render_result(False, job["error"])
+            else:
+                finished = False
+                st.info(f"{job['status'].capitalize()}… (attempt {max(1, job['attempts'])})")
+    return finished
+
+@st.fragment(run_every=2.0)
+def jobs_panel(job_ids):
+    if render_jobs(job_ids):
+        st.rerun()  # всё готово → полный rerun, дальше рисуем без опроса БД
+
+if job_ids:
+    st.divider()
+    queue = get_queue()
+    if all((queue.get(j) or {}).get("status", "failed") in ("done", "failed") for j in job_ids):
+        render_jobs(job_ids)
+    else:
+        jobs_panel(job_ids)
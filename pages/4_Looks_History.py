@@ -0,0 +1,59 @@
+import datetime as dt
+import streamlit as st
+
+from fashion_buddy.looks import get_look_store, session_owner
+
+st.set_page_config(page_title="Saved looks & history", page_icon="🗂️", layout="wide")
+st.title("🗂️ Saved looks & history")
+st.caption("Все результаты примерки хранятся локально (оригинал + превью); страницы листаются по курсору, без OFFSET.")
+
+store = get_look_store()
+owner = session_owner()  # только свои примерки: чужие фото не листаются, не качаются и не удаляются
+PAGE_SIZE = 24
+
+c1, c2 = st.columns([1, 3])
+with c1:
+    saved_only = st.toggle("Saved only", False)
+with c2:
+    st.caption(f"{store.count(owner, saved_only):,} look(s)")
+
+# стек курсоров: назад = pop, вперёд = push; сбрасываем при смене фильтра
+if st.session_state.get("looks_filter") != saved_only:
+    st.session_state["looks_filter"] = saved_only
+    st.session_state["looks_cursors"] = [None]
+cursors = st.session_state.setdefault("looks_cursors", [None])
+
+rows, next_cursor = store.page(owner, cursors[-1], PAGE_SIZE, saved_only=saved_only)
+if not rows:
+    st.info("Nothing here yet — run a try-on and it will show up in history.")
+
+cols = st.columns(4)
+for n, row in enumerate(rows):
+    with cols[n % 4]:
+        thumb = store.thumb(row["digest"])
+        if thumb:
+            st.image(thumb, use_container_width=True)
+        when = dt.datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M")
+        st.caption(f"#{row['id']} · {row['backend'] or '?'} · {when}")
+        b1, b2, b3 = st.columns(3)
+        if b1.button("★" if row["saved"] else "☆", key=f"star_{row['id']}", help="Save / unsave"):
+            store.set_saved(row["id"], not row["saved"], owner=owner)
+            st.rerun()
+        full = store.image(row["digest"]) if st.session_state.get("looks_open") == row["id"] else None
+        if b2.button("🔍", key=f"open_{row['id']}", help="Full size"):
+            st.session_state["looks_open"] = None if full else row["id"]
+            st.rerun()
+        if b3.button("🗑", key=f"del_{row['id']}", help="Delete"):
+            store.delete(row["id"], owner=owner)
+            st.rerun()
+        if full:
+            st.image(full, use_container_width=True)
+            st.download_button("Download", full, file_name=f"look_{row['id']}.jpg", key=f"dl_{row['id']}")
+
+p1, _, p2 = st.columns([1, 4, 1])
+if p1.button("← Newer", disabled=len(cursors) == 1):
+    cursors.pop()
+    st.rerun()
+if p2.button("Older →", disabled=next_cursor is None):
+    cursors.append(next_cursor)
+    st.rerun()
@@ -0,0 +1,50 @@
+import os
+import streamlit as st
+
+from fashion_buddy.clients import connection_stats
+from fashion_buddy.metrics import quantiles, render_prometheus, summary
+from fashion_buddy.semantic_cache import get_semantic_cache
+
+st.set_page_config(page_title="Ops — latency & success", page_icon="📈", layout="wide")
+st.title("📈 Ops — latency & success")
+st.caption("Спаны по стадиям этого процесса: ingest, upload, inference, tryon (до результата), postprocess, fetch, llm, palette. "
+           "Перцентили — по последним замерам каждой серии.")
+
+STAGES = ["(all)", "tryon", "inference", "ingest", "upload", "postprocess", "fetch", "llm", "palette"]
+stage = st.selectbox("Stage", STAGES)
+hide_hits = st.checkbox("Hide cache hits", True)
+OK_OUTCOMES = ("ok", "degraded")
+
+@st.fragment(run_every=5.0)
+def live_panel():
+    rows = summary(None if stage == "(all)" else stage)
+    if hide_hits:
+        rows = [r for r in rows if r["outcome"] != "cache_hit"]
+    if not rows:
+        st.info("No spans recorded yet — run a try-on or a chat message in this deployment.")
+    else:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    tryon = summary("tryon")
+    if tryon:
+        # README: «P95 to result, success rate» — по бэкендам, только успешные прогоны в перцентилях
+        st.subheader("Time to result / success rate")
+        out = []
+        for backend in sorted({r["backend"] for r in tryon}):
+            runs = sum(r["count"] for r in tryon if r["backend"] == backend)
+            ok = sum(r["count"] for r in tryon if r["backend"] == backend and r["outcome"] in OK_OUTCOMES)
+            out.append({"backend": backend, "runs": runs, "success_rate": round(ok / runs, 3),
+                        **quantiles("tryon", backend, OK_OUTCOMES)})
+        st.dataframe(out, use_container_width=True, hide_index=True)
+    with st.expander("HTTP connection reuse"):
+        st.write(connection_stats())
+    semantic = get_semantic_cache()
+    if semantic is not None:
+        with st.expander("Semantic response cache"):
+            st.write(semantic.stats())
+
+live_panel()
+
+with st.expander("Prometheus exposition"):
+    port, path = os.getenv("METRICS_PORT"), os.getenv("METRICS_FILE")
+    st.caption(f"METRICS_PORT={port or '—'} · METRICS_FILE={path or '—'}")
+    st.code(render_prometheus(), language="text")
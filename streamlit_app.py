@@ -1,8 +1,18 @@
 import os
-import io
-import numpy as np
+import time
 import streamlit as st
-from PIL import Image
+
+from fashion_buddy.cache import ResultCache, make_key
+from fashion_buddy.catalog import get_catalog, shop_outfit
+from fashion_buddy.clients import get_openai
+from fashion_buddy.context import SUMMARY_TOKENS, ChatContext
+from fashion_buddy.metrics import inc, observe, span
+from fashion_buddy.outfit import best_outfits, catalog_candidates
+from fashion_buddy.palette import palette_from_bytes
+from fashion_buddy.profiler import RerunProfiler
+from fashion_buddy.retail_search import RETAILER_SEARCH_URLS, search_retailers
+from fashion_buddy.semantic_cache import get_semantic_cache, occasion_of
+from fashion_buddy.shopping import budget_split, build_queries, product_links, rgb_to_hex
 
 # ---------- OpenAI (optional) ----------
 try:
@@ -20,79 +30,82 @@ def get_env(name: str, default=None):
     except Exception:
         return default
 
+# ---------- LLM result cache ----------
+@st.cache_resource
+def get_llm_cache() -> ResultCache:
+    # process-wide: shared by all sessions; disk tier only if LLM_CACHE_DIR is set
+    return ResultCache(
+        max_items=int(get_env("LLM_CACHE_MAX_ITEMS", 256)),
+        disk_dir=get_env("LLM_CACHE_DIR"),
+        ttl_s=float(get_env("LLM_CACHE_TTL_S", 7 * 24 * 3600)),
+        max_disk_bytes=int(float(get_env("LLM_CACHE_MAX_MB", 64)) * 1024 * 1024),
+    )
+
 # ---------- App setup ----------
 st.set_page_config(page_title="AI Fashion Buddy", page_icon="👗", layout="centered")
 st.title("👗 AI Fashion Buddy — your stylist friend")
 
-# ---------- Retailers & heuristics ----------
-RETAILERS = {
-    "Zalando": "https://www.zalando.de/catalog/?q={q}",
-    "ASOS": "https://www.asos.com/search/?q={q}",
-    "H&M": "https://www2.hm.com/en_eur/search-results.html?q={q}",
-    "Amazon": "https://www.amazon.de/s?k={q}",
-}
-DEFAULT_ITEMS = [("Top", 0.22), ("Bottom", 0.22), ("Outerwear", 0.18), ("Shoes", 0.24), ("Accessory", 0.14)]
-STYLE_KEYWORDS = {
-    "casual": ["t-shirt", "jeans", "sneakers"],
-    "smart casual": ["oxford shirt", "chinos", "loafers"],
-    "business": ["blazer", "trousers", "derby shoes"],
-    "evening": ["silk blouse", "dress pants", "heels"],
-    "streetwear": ["oversized hoodie", "cargo pants", "chunky sneakers"],
-}
-GENDER_KEYWORDS = {"male": ["men"], "female": ["women"], "unisex": ["unisex"]}
-
-# ---------- Utils ----------
-def extract_palette(img: Image.Image, k: int = 4):
-    img_small = img.convert("RGB").resize((64, 64))
-    data = np.asarray(img_small).reshape(-1, 3).astype(np.float32)
-    centers = data[np.random.choice(len(data), k, replace=False)]
-    for _ in range(6):
-        dists = ((data[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
-        labels = dists.argmin(axis=1)
-        new_centers = np.array(
-            [data[labels == i].mean(axis=0) if np.any(labels == i) else centers[i] for i in range(k)]
-        )
-        if np.allclose(new_centers, centers):
-            break
-        centers = new_centers
-    return [tuple(map(int, c)) for c in centers.astype(int).tolist()]
-
-def rgb_to_hex(rgb): return "#%02x%02x%02x" % rgb
-def budget_split(total: int): return [(n, max(10, int(total * pct))) for n, pct in DEFAULT_ITEMS]
-
-def build_queries(event, vibe, gender, colors, sizes):
-    base = []
-    if (v := (vibe or "").strip().lower()):   base += STYLE_KEYWORDS.get(v, [v])
-    if (g := (gender or "").strip().lower()): base += GENDER_KEYWORDS.get(g, [g])
-    if colors: base += colors
-    if sizes:  base += [sizes]
-    if event:  base += [event]
-    base = list(dict.fromkeys([t for t in base if t]))
-    return {
-        "Top":       [" ".join(base + ["top"])],
-        "Bottom":    [" ".join(base + ["pants"])],
-        "Outerwear": [" ".join(base + ["jacket"])],
-        "Shoes":     [" ".join(base + ["shoes"])],
-        "Accessory": [" ".join(base + ["accessory"])],
-    }
-
-def product_links(query: str):
-    return " | ".join(f"[{name}]({tmpl.format(q=query.replace(' ', '+'))})" for name, tmpl in RETAILERS.items())
-
-def describe_outfit_with_ai(system_prompt: str, user_prompt: str, model: str):
+def stream_completion(client, placeholder, usage: dict | None = None, **kwargs) -> str:
+    """Stream a chat completion into `placeholder` token by token; returns the full text (raises on failure).
+    With `usage`, the API's token counts (sent in a last, choice-less chunk) are copied into it."""
+    parts, last_draw = [], 0.0
+    if usage is not None:
+        kwargs["stream_options"] = {"include_usage": True}
+    for chunk in client.chat.completions.create(stream=True, **kwargs):
+        if usage is not None and getattr(chunk, "usage", None):
+            usage.update(prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content or ""
+        if not delta:
+            continue
+        parts.append(delta)
+        now = time.monotonic()
+        if now - last_draw > 0.05:  # throttle redraws, the websocket doesn't need every token
+            placeholder.markdown("".join(parts) + "▌")
+            last_draw = now
+    return "".join(parts).strip()
+
+def describe_outfit_with_ai(system_prompt: str, user_prompt: str, model: str, placeholder=None,
+                            semantic_text: str = "", exact_parts=()):
+    """Semantic tier: a cached plan whose `semantic_text` (the user's own words, not the templated prompt)
+    is close enough and whose `exact_parts` (every structured preference) are equal is reused."""
     if not OPENAI_AVAILABLE:
         return "(Fallback) Outfit suggestion without AI description."
     api_key = get_env("OPENAI_API_KEY")
     if not api_key:
         return "(No OpenAI key set) Showing basic suggestions."
+    cache = get_llm_cache()
+    key = make_key("outfit", model, system_prompt, user_prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        observe("llm", 0.0, model, "cache_hit")
+        return cached
+    semantic = get_semantic_cache() if semantic_text.strip() else None
+    parts = ("plan", model, make_key(system_prompt)[:16], *exact_parts)
+    if semantic is not None:
+        similar, _ = semantic.get(semantic_text, *parts)
+        if similar is not None:
+            observe("llm", 0.0, model, "semantic_hit")
+            return similar
     try:
-        client = OpenAI(api_key=api_key)
-        rsp = client.chat.completions.create(
+        client = get_openai(api_key)
+        kwargs = dict(
             model=model,
             messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
             temperature=0.8,
         )
-        return (rsp.choices[0].message.content or "").strip()
+        with span("llm", model):
+            if placeholder is not None:
+                text = stream_completion(client, placeholder, **kwargs)
+            else:
+                rsp = client.chat.completions.create(**kwargs)
+                text = (rsp.choices[0].message.content or "").strip()
+        if text:  # fallbacks/errors are never cached
+            cache.set(key, text)
+            if semantic is not None:
+                semantic.set(semantic_text, text, *parts)
+        return text
     except Exception as e:
         msg = str(e)
         if "insufficient_quota" in msg or "exceeded your current quota" in msg:
@@ -109,45 +122,60 @@ with st.sidebar:
     colors_pref = st.text_input("Preferred colors (comma-separated)")
     budget = st.number_input("Total budget (€)", min_value=50, max_value=5000, value=300, step=10)
     model_name = st.text_input("OpenAI model (optional)", value=get_env("OPENAI_MODEL", "gpt-4o-mini"))
+    stream_ai = st.checkbox("Stream AI replies", value=True, help="Show tokens as they arrive.")
     photo = st.file_uploader("Optional: upload a photo (JPG/PNG/WEBP)", type=["jpg", "jpeg", "png", "webp"])
+    profile_reruns = st.checkbox("Show rerun profiler", value=bool(get_env("RERUN_PROFILER")),
+                                 help="Which blocks ran on each rerun and how long they took.")
 
-# ---------- Palette from photo (optional) ----------
-palette_hex = []
-if photo is not None:
-    try:
-        img = Image.open(photo)
-        cols = extract_palette(img, k=4)
-        palette_hex = [rgb_to_hex(c) for c in cols]
-        st.caption("Detected palette from photo:")
-        st.write(" ".join(f"`{c}`" for c in palette_hex))
-        st.image(img, caption="Your photo (not uploaded anywhere)", use_container_width=True)
-    except Exception as e:
-        st.warning(f"Couldn't process the image: {e}")
+# ---------- Blocks ----------
+# Каждый блок — fragment: чат отвечает сам по себе, затем новое сообщение перезапускает страницу (оно вход плана);
+# блоки пересчитываются только при смене своих входов (сигнатура в session_state), иначе рисуем прошлый результат.
+prof = RerunProfiler(st.session_state)
+prof.begin()
 
-# =============== CHAT (single block!) ===============
-st.divider()
-st.subheader("Ask me anything about your outfit…")
+def unchanged(name: str, sig) -> bool:
+    """True when block `name` already has a result for exactly these inputs."""
+    key = f"_sig_{name}"
+    return key in st.session_state and st.session_state[key] == sig
 
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": "Hey! I’m your stylist friend. Tell me the occasion ✨"}
-    ]
+def remember(name: str, sig):
+    """Call once the block's result is in session_state: a block that raised recomputes on the next run."""
+    st.session_state[f"_sig_{name}"] = sig
+
+@st.fragment
+def palette_block(photo):
+    sig = photo.file_id if photo is not None else None
+    if unchanged("palette", sig):
+        prof.skip("palette")
+    else:
+        with prof.block("palette"):
+            st.session_state.palette = {"hex": [], "error": None}
+            if photo is not None:
+                try:
+                    cols = palette_from_bytes(photo.getvalue(), k=4)  # deterministic, memoized per upload digest
+                    st.session_state.palette["hex"] = [rgb_to_hex(c) for c in cols]
+                except Exception as e:
+                    st.session_state.palette["error"] = str(e)
+            remember("palette", sig)
+    if photo is None:
+        return
+    res = st.session_state.palette
+    if res["error"]:
+        st.warning(f"Couldn't process the image: {res['error']}")
+        return
+    st.caption("Detected palette from photo:")
+    st.write(" ".join(f"`{c}`" for c in res["hex"]))
+    st.image(photo.getvalue(), caption="Your photo (not uploaded anywhere)", use_container_width=True)
 
-# render history
-for m in st.session_state.messages:
-    with st.chat_message(m["role"]):
-        st.markdown(m["content"])
+OFFLINE_LOOKS = {  # ключевые слова поводов — semantic_cache.OCCASIONS (те же корзины, что у семантического кэша)
+    "date": ("dating / романтичный вайб", "тёплые нейтральные, бордовый, молочный"),
+    "interview": ("интервью / смарт-кэжуал", "серый, тёмно-синий, белый"),
+    "party": ("вечеринка", "чёрный, металлик, контрастные акценты"),
+    "everyday": ("ежедневный кэжуал", "базовые нейтральные + 1 акцент"),
+}
 
 def offline_reply(user_text: str) -> str:
-    t = (user_text or "").lower()
-    if any(k in t for k in ["свидан", "dating", "date", "роман"]):
-        vibe = "dating / романтичный вайб"; palette = "тёплые нейтральные, бордовый, молочный"
-    elif any(k in t for k in ["интервью", "собесед", "job", "офис"]):
-        vibe = "интервью / смарт-кэжуал"; palette = "серый, тёмно-синий, белый"
-    elif any(k in t for k in ["вечерин", "club", "party", "ноч"]):
-        vibe = "вечеринка"; palette = "чёрный, металлик, контрастные акценты"
-    else:
-        vibe = "ежедневный кэжуал"; palette = "базовые нейтральные + 1 акцент"
+    vibe, palette = OFFLINE_LOOKS[occasion_of(user_text)]
     return (
         f"Зафиксировала: **{vibe}**.\n\n"
         f"1) Верх — базовый топ/рубашка (палитра: {palette}).\n"
@@ -157,83 +185,241 @@ def offline_reply(user_text: str) -> str:
         f"Подскажи размер/рост/цвета и бюджет — соберу конкретные позиции и ссылки."
     )
 
-def ai_chat_reply() -> str | None:
+def summarize_turns(client, model: str, previous: str, turns: list) -> str:
+    """Rolling summary for the chat context: previous summary + turns that fell out of the window."""
+    convo = "\n".join(f"{m['role']}: {m['content']}" for m in turns)
+    cache = get_llm_cache()
+    key = make_key("chat_summary", model, previous, convo)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    with span("llm_summary", model):
+        rsp = client.chat.completions.create(
+            model=model, temperature=0.2, max_tokens=SUMMARY_TOKENS,
+            messages=[{"role": "system", "content":
+                       "Update the running summary of a styling chat. Keep the facts that matter for advice: "
+                       "occasion, budget, sizes, colors, likes/dislikes, items already suggested. Terse notes."},
+                      {"role": "user", "content": f"Summary so far:\n{previous or '—'}\n\nNew turns:\n{convo}"}],
+        )
+    text = (rsp.choices[0].message.content or "").strip()
+    if text:
+        cache.set(key, text)
+    return text
+
+def ai_chat_reply(placeholder=None) -> str | None:
     if not OPENAI_AVAILABLE:
         return None
     api_key = get_env("OPENAI_API_KEY")
     if not api_key:
         return None
     try:
-        client = OpenAI(api_key=api_key)
+        client = get_openai(api_key)
+        model = get_env("OPENAI_MODEL", "gpt-4o-mini")
         system = {"role": "system", "content":
                   "You are a warm, witty fashion girlfriend. Keep answers concise but vivid. "
                   "Ask 1 clarifying question if needed. Suggest items and explain why they fit the occasion, proportions, and palette."}
-        msgs = [system] + [{"role": m["role"], "content": m["content"]} for m in st.session_state.messages][-16:]
-        resp = client.chat.completions.create(
-            model=get_env("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=msgs,
-            temperature=0.8,
-            top_p=0.9,
-        )
-        return (resp.choices[0].message.content or "").strip()
+        # первый вопрос сессии не зависит от истории — его можно отдать из семантического кэша
+        semantic = get_semantic_cache()
+        user_turns = [m["content"] for m in st.session_state.messages if m["role"] == "user"]
+        first_question = user_turns[0] if len(user_turns) == 1 else None
+        parts = ("chat", model, make_key(system["content"])[:16])
+        if semantic is not None and first_question:
+            similar, _ = semantic.get(first_question, *parts)
+            if similar is not None:
+                observe("llm", 0.0, model, "semantic_hit")
+                return similar
+        # контекст по бюджету токенов: свежие реплики как есть, старые — в скользящее резюме
+        msgs, ctx = ChatContext(st.session_state, model=model).build(
+            system, st.session_state.messages, lambda prev, turns: summarize_turns(client, model, prev, turns))
+        kwargs = dict(model=model, messages=msgs, temperature=0.8, top_p=0.9)
+        usage: dict = {}
+        with span("llm", model):
+            if placeholder is not None:
+                text = stream_completion(client, placeholder, usage=usage, **kwargs)
+            else:
+                resp = client.chat.completions.create(**kwargs)
+                text = (resp.choices[0].message.content or "").strip()
+                if resp.usage:
+                    usage["prompt_tokens"] = resp.usage.prompt_tokens
+        ctx["reported_tokens"] = usage.get("prompt_tokens")
+        st.session_state.chat_context_stats = ctx
+        inc("llm_prompt_tokens", ctx["reported_tokens"] or ctx["prompt_tokens"], model=model)
+        inc("llm_prompt_tokens_legacy_window", ctx["legacy_tokens"], model=model)  # what the last-16 context would cost
+        if semantic is not None and first_question and text:
+            semantic.set(first_question, text, *parts)
+        return text
     except Exception:
         return None
 
-# single chat_input in the whole app:
-user_msg = st.chat_input("Напиши сюда: повод, бюджет, цвета, размер…")
-if user_msg:
-    st.session_state.messages.append({"role": "user", "content": user_msg})
-    with st.chat_message("user"):
-        st.markdown(user_msg)
+@st.fragment
+def chat_block(stream_ai: bool):
+    with prof.block("chat"):
+        st.divider()
+        st.subheader("Ask me anything about your outfit…")
+        if "messages" not in st.session_state:
+            st.session_state.messages = [
+                {"role": "assistant", "content": "Hey! I’m your stylist friend. Tell me the occasion ✨"}
+            ]
+        for m in st.session_state.messages:
+            with st.chat_message(m["role"]):
+                st.markdown(m["content"])
+        if st.session_state.get("chat_context_note"):
+            st.caption(st.session_state.chat_context_note)
 
-    reply = ai_chat_reply()
-    if not reply:
-        reply = offline_reply(user_msg)
+        # single chat_input in the whole app; submitting it reruns this fragment, the reply then the whole page
+        user_msg = st.chat_input("Напиши сюда: повод, бюджет, цвета, размер…")
+        if user_msg:
+            said_before = last_user_text()
+            st.session_state.messages.append({"role": "user", "content": user_msg})
+            with st.chat_message("user"):
+                st.markdown(user_msg)
 
-    st.session_state.messages.append({"role": "assistant", "content": reply})
-    with st.chat_message("assistant"):
-        st.markdown(reply)
+            with st.chat_message("assistant"):
+                reply_box = st.empty()
+                reply = ai_chat_reply(reply_box if stream_ai else None)
+                if not reply:
+                    reply = offline_reply(user_msg)  # also replaces a stream that died partway
+                reply_box.markdown(reply)
+                ctx = st.session_state.pop("chat_context_stats", None)
+                st.session_state.chat_context_note = ctx and (
+                    f"Context: {ctx['reported_tokens'] or '~' + str(ctx['prompt_tokens'])} prompt tokens — "
+                    f"{ctx['turns']} recent turn{'s' if ctx['turns'] != 1 else ''}"
+                    + (f" + summary of {ctx['summarized_turns']}" if ctx["summarized_turns"] else "")
+                    + f" (last-16 window: ~{ctx['legacy_tokens']})")
+            st.session_state.messages.append({"role": "assistant", "content": reply})
+            if last_user_text() != said_before:
+                # the plan reads the latest message; palette and links see unchanged inputs and skip
+                st.rerun(scope="app")
 
-# ---------- Outfit Plan ----------
-colors = [c.strip() for c in (colors_pref.split(",") if colors_pref else []) if c.strip()]
-if palette_hex:
-    colors = list(dict.fromkeys(colors + palette_hex))
+def last_user_text() -> str:
+    for m in reversed(st.session_state.get("messages", [])):
+        if m["role"] == "user":
+            return m["content"]
+    return ""
 
-queries = build_queries(event, vibe, gender, colors, sizes)
-splits = budget_split(int(budget))
+@st.fragment
+def plan_block(prefs: dict, colors: list, said: str, model_name: str, stream_ai: bool):
+    system_prompt = (
+        "You are a warm, witty fashion girlfriend. "
+        "Be concise but vivid. Explain why the pieces fit the occasion, proportions, and palette."
+    )
+    st.subheader("Your Outfit Plan")
+    user_prompt = (
+        f"Occasion: {prefs['event'] or '—'}\n"
+        f"Vibe: {prefs['vibe'] or '—'}\n"
+        f"Gender: {prefs['gender'] or '—'}\n"
+        f"Sizes: {prefs['sizes'] or '—'}\n"
+        f"Colors: {', '.join(colors) or '—'}\n"
+        f"Budget: {prefs['budget']}€\n"
+        f"User says: {said or '—'}"
+    )
+    plan_box = st.empty()
+    sig = (system_prompt, user_prompt, model_name)
+    if unchanged("plan", sig):
+        prof.skip("plan")
+    else:
+        with prof.block("plan"):
+            text = describe_outfit_with_ai(system_prompt, user_prompt, model=model_name,
+                                           placeholder=plan_box if stream_ai else None,
+                                           semantic_text=said or "",
+                                           exact_parts=(prefs["event"].strip().lower(), prefs["vibe"], prefs["gender"],
+                                                        prefs["sizes"], tuple(colors), int(prefs["budget"])))
+            st.session_state.plan = {"text": text}
+            if not text.startswith("("):  # fallback / AI error: not a result, try again on the next run
+                remember("plan", sig)
+    plan_box.write(st.session_state.plan["text"])
 
-system_prompt = (
-    "You are a warm, witty fashion girlfriend. "
-    "Be concise but vivid. Explain why the pieces fit the occasion, proportions, and palette."
-)
+def item_line(it: dict) -> str:
+    title = it.get("title") or "item"
+    line = f"[{title}]({it['url']})" if it.get("url") else title
+    shop = f" · {it['retailer']}" if it.get("retailer") else ""
+    return f"{line} — {it['price']:.2f} {it.get('currency') or '€'}{shop}"
 
-# last user text to season the plan
-last_user_text = ""
-for m in reversed(st.session_state.messages):
-    if m["role"] == "user":
-        last_user_text = m["content"]; break
+def retail_md(results: dict) -> str:
+    lines = []
+    for retailer in sorted(results):
+        res = results[retailer]
+        if res["status"] != "ok":
+            lines.append(f"- **{retailer}**: _{res['status']}_")
+        elif res["products"]:
+            lines.append(f"- **{retailer}**: " + "; ".join(item_line(p) for p in res["products"][:3]))
+    return "\n".join(lines)
 
-user_prompt = (
-    f"Occasion: {event or '—'}\n"
-    f"Vibe: {vibe or '—'}\n"
-    f"Gender: {gender or '—'}\n"
-    f"Sizes: {sizes or '—'}\n"
-    f"Colors: {', '.join(colors) or '—'}\n"
-    f"Budget: {budget}€\n"
-    f"User says: {last_user_text or '—'}"
-)
+@st.fragment
+def links_block(prefs: dict, colors: list):
+    catalog = get_catalog()  # None until `python -m fashion_buddy.catalog build ...` has been run
+    sig = (prefs["event"], prefs["vibe"], prefs["gender"], tuple(colors), prefs["sizes"], int(prefs["budget"]),
+           id(catalog))
+    fresh = not unchanged("links", sig)
+    if not fresh:
+        prof.skip("links")
+    else:
+        with prof.block("links"):
+            queries = build_queries(prefs["event"], prefs["vibe"], prefs["gender"], colors, prefs["sizes"])
+            splits = budget_split(int(prefs["budget"]))
+            # товары из локального каталога: категория, цена в пределах доли бюджета, размер, пол
+            hits = shop_outfit(catalog, queries, splits, sizes=prefs["sizes"], gender=prefs["gender"]) \
+                if catalog is not None else {}
+            # целые комплекты: по одной вещи на категорию, сумма в пределах общего бюджета
+            st.session_state.outfits = best_outfits(
+                catalog_candidates(catalog, queries, int(prefs["budget"]), colors,
+                                   sizes=prefs["sizes"], gender=prefs["gender"]),
+                int(prefs["budget"]), k=3, optional=("Outerwear", "Accessory"),
+            ) if catalog is not None else []
+            st.session_state.links = [
+                (item_name, price, queries[item_name][0], product_links(queries[item_name][0]),
+                 hits.get(item_name, []))
+                for item_name, price in splits
+            ]
+            st.session_state.retail = {}
+    st.divider()
+    if st.session_state.outfits:
+        st.subheader("🧩 Complete outfits within budget")
+        for n, o in enumerate(st.session_state.outfits, 1):
+            st.markdown(f"**Outfit {n}** — {o['price']:.2f}€ · score {o['score']:.2f}")
+            st.markdown("\n".join(f"- {cat}: {item_line(it)}" for cat, it in o["items"].items()))
+    boxes = {}
+    for item_name, price, q, links, items in st.session_state.links:
+        st.markdown(f"### {item_name} — ~{price}€")
+        for it in items:
+            st.markdown(f"- {item_line(it)}")
+        boxes[item_name] = st.empty()
+        if st.session_state.retail.get(item_name):
+            boxes[item_name].markdown(retail_md(st.session_state.retail[item_name]))
+        st.markdown("**Search links:** " + links)
+        st.caption(f"Query: `{q}`")
+    if fresh and RETAILER_SEARCH_URLS:
+        # живой поиск у ритейлеров: все запросы параллельно, каждый ответ дорисовывается сразу
+        # (rerun посреди поиска повторит его — ответы в кэше)
+        with prof.block("retail_search"):
+            for res in search_retailers({name: q for name, _, q, _, _ in st.session_state.links}):
+                got = st.session_state.retail.setdefault(res["item"], {})
+                got[res["retailer"]] = res
+                boxes[res["item"]].markdown(retail_md(got))
+    if fresh:
+        remember("links", sig)
 
-description = describe_outfit_with_ai(system_prompt, user_prompt, model=model_name)
+# ---------- Layout ----------
+prefs = dict(event=event, vibe=vibe, gender=gender, sizes=sizes, budget=budget)
 
-st.subheader("Your Outfit Plan")
-st.write(description)
+palette_block(photo)
+palette_hex = st.session_state.palette["hex"]
 
-st.divider()
-for item_name, price in splits:
-    q = build_queries(event, vibe, gender, colors, sizes)[item_name][0]
-    st.markdown(f"### {item_name} — ~{price}€")
-    st.markdown("**Search links:** " + product_links(q))
-    st.caption(f"Query: `{q}`")
+chat_block(stream_ai)
+
+colors = [c.strip() for c in (colors_pref.split(",") if colors_pref else []) if c.strip()]
+if palette_hex:
+    colors = list(dict.fromkeys(colors + palette_hex))
+
+plan_block(prefs, colors, last_user_text(), model_name, stream_ai)
+links_block(prefs, colors)
 
 st.divider()
 st.caption("Note: Links go to retailers with your search terms. Apply filters (size, color) there.")
+
+prof.end()
+if profile_reruns:
+    with st.sidebar.expander("Rerun profiler", expanded=True):
+        for run in prof.runs()[:8]:
+            st.caption(f"Run {run['run']} · {run['scope']} · {run['total_ms']} ms")
+            st.dataframe(run["blocks"], hide_index=True, use_container_width=True)
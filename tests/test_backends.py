@@ -0,0 +1,82 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from fashion_buddy.backends import MockBackend, TryOnBackend, TryOnResult, run_hedged
+
+
+def jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class Recording(TryOnBackend):
+    """Sleeps until `latency_s` or cancel; remembers how it ended."""
+
+    def __init__(self, name, latency_s):
+        super().__init__()
+        self.name = name
+        self.latency_s = latency_s
+        self.ended = threading.Event()
+        self.outcome = None
+
+    def _run(self, person, garment, cancel=None, **_):
+        try:
+            if cancel is not None and cancel.wait(self.latency_s):
+                self.outcome = "canceled"
+                raise RuntimeError(f"{self.name}: canceled")
+            self.outcome = "done"
+            return TryOnResult(self.name, image=b"x")
+        finally:
+            self.ended.set()
+
+
+def test_abstract_backend_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        TryOnBackend()
+
+
+def test_fast_primary_is_not_hedged():
+    primary, secondary = Recording("a", 0.01), Recording("b", 0.01)
+    res = run_hedged(primary, secondary, b"p", b"g", default_delay_s=1.0)
+    assert res.backend == "a" and not res.hedged
+    assert secondary.outcome is None
+
+
+def test_slow_primary_loses_and_is_canceled():
+    primary, secondary = Recording("slow", 30), Recording("fast", 0.05)
+    t0 = time.monotonic()
+    res = run_hedged(primary, secondary, b"p", b"g", default_delay_s=0.05)
+    assert res.backend == "fast" and res.hedged
+    assert primary.ended.wait(2) and primary.outcome == "canceled"
+    assert time.monotonic() - t0 < 5
+
+
+def test_failed_primary_falls_through_to_secondary():
+    primary = MockBackend("broken", latency_s=0.01, fail_rate=1.0)
+    secondary = MockBackend("ok", latency_s=0.01)
+    res = run_hedged(primary, secondary, jpeg("red"), jpeg("blue"), default_delay_s=1.0)
+    assert res.backend == "ok" and res.attempts == ["broken: broken: simulated failure"]
+
+
+def test_timeout_cancels_both():
+    primary, secondary = Recording("a", 30), Recording("b", 30)
+    with pytest.raises(RuntimeError, match="no backend answered"):
+        run_hedged(primary, secondary, b"p", b"g", default_delay_s=0.01, timeout_s=0.1)
+    assert primary.ended.wait(2) and secondary.ended.wait(2)
+    assert primary.outcome == secondary.outcome == "canceled"
+
+
+def test_segfit_starts_no_attempt_once_canceled(monkeypatch):
+    from fashion_buddy import tryon
+    monkeypatch.setattr(tryon, "call_segfit", lambda *a, **k: pytest.fail("SegFit called after cancel"))
+    cancel = threading.Event()
+    cancel.set()
+    ok, data, _, attempts = tryon.segfit_with_fallback(
+        jpeg("red"), jpeg("blue"), model_type="Balanced", cn_strength=0.8, cn_end=0.5, image_format="jpeg",
+        image_quality=90, seed=-1, cancel=cancel)
+    assert not ok and data == "canceled" and attempts[-1]["status"] == "canceled"
@@ -0,0 +1,74 @@
+import os
+import time
+
+from fashion_buddy.cache import BlobCache, ResultCache, make_key
+
+
+def age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_make_key_is_order_independent_for_dicts():
+    assert make_key({"a": 1, "b": 2}, "x") == make_key({"b": 2, "a": 1}, "x")
+    assert make_key("a", "b") != make_key("b", "a")
+
+
+def test_memory_tier_evicts_least_recently_used():
+    c = ResultCache(max_items=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1  # "b" is now the oldest
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.get("a") == 1 and c.get("c") == 3
+    assert c.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    ResultCache(disk_dir=str(tmp_path)).set("k", {"v": 1})
+    c = ResultCache(disk_dir=str(tmp_path))
+    assert c.get("k") == {"v": 1}
+    assert c.stats()["disk_hits"] == 1
+    assert c.get("k") == {"v": 1}
+    assert c.stats()["hits"] == 1
+
+
+def test_disk_entries_expire_after_ttl(tmp_path):
+    ResultCache(disk_dir=str(tmp_path), ttl_s=60).set("k", "v")
+    age(tmp_path / "k.pkl", 120)
+    c = ResultCache(disk_dir=str(tmp_path), ttl_s=60)
+    assert c.get("k") is None
+    assert not (tmp_path / "k.pkl").exists()
+
+
+def test_disk_tier_evicts_oldest_over_the_cap(tmp_path):
+    c = ResultCache(max_items=1, disk_dir=str(tmp_path), max_disk_bytes=3000)
+    for i in range(3):
+        c.set(f"k{i}", b"x" * 900)
+        age(tmp_path / f"k{i}.pkl", 100 - i)
+    c.get("k0")  # a disk hit refreshes its mtime, so k1 is the oldest now
+    c.set("k3", b"x" * 900)
+    assert not (tmp_path / "k1.pkl").exists()
+    assert (tmp_path / "k0.pkl").exists() and (tmp_path / "k3.pkl").exists()
+    assert c.stats()["disk_bytes"] <= 3000
+
+
+def test_blob_cache_lru_eviction(tmp_path):
+    b = BlobCache(str(tmp_path), max_bytes=300)
+    keys = [make_key(i) for i in range(3)]
+    for i, k in enumerate(keys):
+        b.put(k, bytes([i]) * 100)
+        age(tmp_path / k[:2] / k, 100 - i)
+    assert b.get(keys[0]) == bytes([0]) * 100  # touched: keys[1] is least recently used
+    b.put(make_key(3), b"z" * 100)
+    assert b.get(keys[1]) is None
+    assert b.get(keys[0]) is not None
+    assert b.stats()["bytes"] <= 300
+
+
+def test_blob_cache_ignores_oversized_and_empty(tmp_path):
+    b = BlobCache(str(tmp_path), max_bytes=10)
+    b.put("aa", b"x" * 11)
+    b.put("bb", b"")
+    assert b.get("aa") is None and b.get("bb") is None
@@ -0,0 +1,76 @@
+import pytest
+
+from fashion_buddy.catalog import CatalogIndex, build_index, guess_category, parse_gender, parse_sizes
+
+PRODUCTS = [
+    {"id": "t1", "title": "Navy oxford shirt", "category": "Top", "price": 39.9, "sizes": "S, M", "gender": "men"},
+    {"id": "t2", "title": "White oxford shirt", "category": "Top", "price": 59, "sizes": "M, L", "gender": "women"},
+    {"id": "t3", "title": "Linen shirt navy", "category": "Top", "price": 25, "sizes": "", "gender": ""},
+    {"id": "t4", "title": "Oxford shirt premium", "category": "Top", "price": 120, "sizes": "M"},
+    {"id": "b1", "title": "Navy chinos", "price": "45,50", "sizes": "EU 38|EU 40"},
+    {"id": "s1", "title": "Leather loafers", "price": 80, "sizes": "42"},
+    {"id": "x1", "title": "Broken price", "price": "n/a"},
+]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    out = tmp_path_factory.mktemp("catalog")
+    stats = build_index(PRODUCTS, str(out))
+    assert stats["docs"] == 6
+    return CatalogIndex(str(out))
+
+
+def ids(hits):
+    return [h["id"] for h in hits]
+
+
+def test_parsers():
+    assert parse_sizes("EU 38, M, 42/32, 40 EU") == ["38", "M", "42-32", "40"]
+    assert (parse_gender("Women"), parse_gender("m"), parse_gender("")) == (1, 2, 0)
+    assert guess_category("", "Navy chinos") == 1
+    assert guess_category("", "Mystery item") == 4
+
+
+def test_ranks_by_matched_terms_then_price(index):
+    hits = index.search("navy oxford shirt", "Top", k=10)
+    assert ids(hits)[0] == "t1"
+    assert set(ids(hits)) == {"t1", "t2", "t3", "t4"}
+    assert ids(hits)[1:3] == ["t3", "t2"]  # equal scores: cheaper first
+
+
+def test_price_range(index):
+    assert set(ids(index.search("shirt", "Top", max_price=59))) == {"t1", "t2", "t3"}
+    assert set(ids(index.search("shirt", "Top", min_price=40, max_price=100))) == {"t2"}
+    assert index.search("shirt", "Top", max_price=10) == []
+
+
+def test_gender_filter_keeps_unisex(index):
+    assert set(ids(index.search("shirt", "Top", gender="male"))) == {"t1", "t3", "t4"}
+    assert set(ids(index.search("shirt women", "Top"))) == {"t1", "t2", "t3", "t4"}  # filter word, not a term
+
+
+def test_size_filter_keeps_unsized(index):
+    assert set(ids(index.search("shirt", "Top", sizes="L"))) == {"t2", "t3"}
+    assert ids(index.search("chinos", "Bottom", sizes="EU 40")) == ["b1"]
+    assert ids(index.search("chinos", "Bottom", sizes="40 EU")) == ["b1"]
+
+
+def test_unknown_size_leaves_only_unsized(index):
+    assert ids(index.search("shirt", "Top", sizes="XXXL")) == ["t3"]
+    assert index.search("chinos", "Bottom", sizes="52") == []
+
+
+def test_more_than_64_sizes(tmp_path):
+    shoes = [{"id": f"s{i}", "title": "running shoes", "category": "Shoes", "price": 50 + i,
+              "sizes": f"{30 + i * 0.5:g}"} for i in range(100)]
+    idx = CatalogIndex(build_index(shoes, str(tmp_path))["out"])
+    assert ids(idx.search("shoes", "Shoes", sizes="79.5")) == ["s99"]
+    assert ids(idx.search("shoes", "Shoes", sizes="30, 64")) == ["s0", "s68"]
+
+
+def test_category_and_guessing(index):
+    assert ids(index.search("navy", "Bottom")) == ["b1"]
+    assert ids(index.search("", "Shoes")) == ["s1"]
+    assert index.search("navy", "Unknown") == []
+    assert index.search("navy", "Bottom")[0]["price"] == 45.5
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from fashion_buddy.color_index import ColorIndex, build_color_index, main, similarity
+
+NAVY, CREAM, RED, GREEN = (20, 30, 80), (250, 240, 215), (200, 30, 40), (40, 140, 60)
+
+
+@pytest.fixture
+def index(tmp_path):
+    palettes = np.array([[NAVY, CREAM], [RED, RED], [GREEN, (0, 0, 0)], [NAVY, NAVY]], dtype=np.uint8)
+    weights = np.array([[0.5, 0.5], [0.5, 0.5], [1.0, 0.0], [0.5, 0.5]], dtype=np.float32)
+    build_color_index(["sku-navy-cream", "sku-red", "sku-green", "sku-navy"], palettes, weights, str(tmp_path))
+    return ColorIndex(str(tmp_path))
+
+
+def test_nearest_palette_first(index):
+    hits = index.search(["#141e50", "#faf0d7"], n=2)
+    assert hits[0][0] == "sku-navy-cream" and hits[0][1] < 1.0
+    assert hits[1][0] == "sku-navy"
+    assert [h[0] for h in index.search([RED], n=1)] == ["sku-red"]
+
+
+def test_zero_weight_padding_is_ignored(index):
+    (item, dist), = index.search([GREEN], n=1)
+    assert item == "sku-green" and dist < 1e-3  # the black padding color would add ~ΔE² otherwise
+
+
+def test_restricted_scan_and_lookups(index):
+    rows = index.rows(["sku-red", "missing", "sku-navy"])
+    assert rows[1] == -1
+    hits = index.search_batch([[NAVY]], n=5, rows=rows)[0]
+    assert [h[0] for h in hits] == ["sku-navy", "sku-red"]
+    d = index.distances(["sku-navy", "missing"], [NAVY])
+    assert d[0] < 1e-3 and np.isnan(d[1])
+    assert similarity([0.0])[0] == 1.0
+
+
+def test_batch_matches_single_queries(index):
+    queries = [[RED], [NAVY, CREAM], [GREEN]]
+    assert index.search_batch(queries, n=3) == [index.search(q, n=3) for q in queries]
+
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="duplicate"):
+        build_color_index(["a", "a"], np.zeros((2, 1, 3), dtype=np.uint8), out_dir=str(tmp_path))
+
+
+def test_cli_build_keeps_palette_batch_ids(tmp_path):
+    npz = tmp_path / "p.npz"
+    np.savez(npz, ids=np.array(["a/red.png", "b/red.png"]),
+             palettes=np.array([[RED], [NAVY]], dtype=np.uint8), weights=np.ones((2, 1), dtype=np.float32))
+    main(["build", str(npz), "--out", str(tmp_path / "idx")])
+    idx = ColorIndex(str(tmp_path / "idx"))
+    assert len(idx) == 2 and idx.search([NAVY], n=1)[0][0] == "b/red.png"
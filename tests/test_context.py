@@ -0,0 +1,67 @@
+from fashion_buddy.context import ChatContext, count_tokens, extractive_summary
+
+SYSTEM = {"role": "system", "content": "You are a stylist."}
+
+
+def chat(n, words=40):
+    return [{"role": "user" if i % 2 == 0 else "assistant",
+             "content": f"Turn {i} says something. " + " ".join(["word"] * words)} for i in range(n)]
+
+
+def test_short_chat_is_sent_verbatim():
+    ctx = ChatContext({}, budget=1500)
+    msgs, stats = ctx.build(SYSTEM, chat(3))
+    assert msgs == [SYSTEM] + chat(3)
+    assert stats["summarized_turns"] == 0 and not stats["summary_updated"]
+
+
+def test_long_chat_folds_into_summary_within_budget():
+    state = {}
+    ctx = ChatContext(state, budget=600)
+    calls = []
+
+    def summarize(prev, turns):
+        calls.append(len(turns))
+        return (prev + " " if prev else "") + f"{len(turns)} turns"
+
+    msgs, stats = ctx.build(SYSTEM, chat(30), summarize)
+    assert stats["summary_updated"] and calls
+    assert msgs[1]["role"] == "system" and "turns" in msgs[1]["content"]
+    assert msgs[-1] == chat(30)[-1]
+    assert stats["prompt_tokens"] <= 600
+    assert stats["prompt_tokens"] < stats["legacy_tokens"]
+    assert state["_chat_context"]["upto"] == stats["summarized_turns"] == 30 - stats["turns"]
+
+
+def test_summary_is_reused_until_the_window_fills_again():
+    ctx = ChatContext({}, budget=600)
+    calls = []
+    summarize = lambda prev, turns: calls.append(turns) or "summary"
+    ctx.build(SYSTEM, chat(30), summarize)
+    _, stats = ctx.build(SYSTEM, chat(31), summarize)  # low-water headroom absorbs one more turn
+    assert len(calls) == 1 and not stats["summary_updated"]
+    for n in range(32, 60):
+        ctx.build(SYSTEM, chat(n), summarize)
+    assert 1 < len(calls) < 28
+
+
+def test_failing_summarizer_falls_back_to_extractive():
+    def broken(prev, turns):
+        raise RuntimeError("offline")
+    msgs, _ = ChatContext({}, budget=600).build(SYSTEM, chat(30), broken)
+    assert "user: Turn 0 says something." in msgs[1]["content"]
+
+
+def test_reset_chat_clears_summary():
+    state = {}
+    ctx = ChatContext(state, budget=600)
+    ctx.build(SYSTEM, chat(30))
+    msgs, stats = ctx.build(SYSTEM, chat(2))
+    assert msgs == [SYSTEM] + chat(2) and stats["summarized_turns"] == 0
+
+
+def test_extractive_summary_keeps_newest_within_budget():
+    turns = [{"role": "user", "content": f"Sentence {i} " + "x " * 30 + ". More."} for i in range(20)]
+    s = extractive_summary("", turns, max_tokens=80)
+    assert count_tokens(s) <= 80
+    assert "Sentence 19" in s and "More" not in s
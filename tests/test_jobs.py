@@ -0,0 +1,100 @@
+import pytest
+
+from fashion_buddy import jobs
+from fashion_buddy.jobs import JobError, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=2)
+
+
+def expire_leases(q):
+    with q._db() as db:
+        db.execute("UPDATE jobs SET lease_until = 0 WHERE status='running'")
+
+
+def test_runs_a_job_and_deduplicates_blobs(queue, monkeypatch):
+    monkeypatch.setitem(jobs._handlers, "echo", lambda params, person, garment: person + garment)
+    a = queue.enqueue("echo", {"n": 1}, b"P", b"G")
+    b = queue.enqueue("echo", {"n": 2}, b"P", b"G")
+    assert queue.run_one() and queue.run_one() and not queue.run_one()
+    assert queue.get(a)["status"] == "done" and queue.result(b) == b"PG"
+    with queue._db() as db:
+        assert db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 3  # P, G, PG
+
+
+def test_retries_then_fails(queue, monkeypatch):
+    def boom(*_):
+        raise RuntimeError("flaky")
+    monkeypatch.setitem(jobs._handlers, "boom", boom)
+    job_id = queue.enqueue("boom", {}, b"P", b"G")
+    queue.run_one()
+    assert queue.get(job_id)["status"] == "queued"
+    queue.run_one()
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"]) == ("failed", 2)
+    assert job["error"] == "RuntimeError: flaky"
+
+
+def test_job_error_is_not_retried(queue, monkeypatch):
+    def bad(*_):
+        raise JobError("bad input")
+    monkeypatch.setitem(jobs._handlers, "bad", bad)
+    job_id = queue.enqueue("bad", {}, b"P", b"G")
+    queue.run_one()
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.get(job_id)["attempts"] == 1
+
+
+def test_expired_lease_is_reclaimed(queue):
+    job_id = queue.enqueue("x", {}, b"P", b"G")
+    job, person, garment = queue._claim()  # worker dies holding the lease
+    assert (job["id"], person, garment) == (job_id, b"P", b"G")
+    assert queue._claim() is None
+    expire_leases(queue)
+    job, *_ = queue._claim()
+    assert (job["id"], job["attempts"]) == (job_id, 2)
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(queue):
+    job_id = queue.enqueue("x", {}, b"P", b"G")
+    for _ in range(2):
+        assert queue._claim() is not None
+        expire_leases(queue)
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Lease expired on attempt 2 of 2")
+
+
+def test_purge_drops_old_jobs_and_orphan_blobs(queue, monkeypatch):
+    monkeypatch.setitem(jobs._handlers, "echo", lambda params, person, garment: b"R")
+    queue.enqueue("echo", {}, b"P", b"G")
+    queue.run_one()
+    queue.purge(older_than_s=-1)
+    assert queue.stats() == {}
+    with queue._db() as db:
+        assert db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0] == 0
+
+
+def test_worker_that_lost_its_lease_cannot_finish(queue):
+    job_id = queue.enqueue("x", {}, b"P", b"G")
+    stale, *_ = queue._claim()
+    expire_leases(queue)
+    fresh, *_ = queue._claim()  # another worker took it over
+    assert not queue._finish(stale, result=b"late")
+    assert queue.get(job_id)["status"] == "running"
+    assert queue._finish(fresh, result=b"R")
+    assert queue.get(job_id)["status"] == "done" and queue.result(job_id) == b"R"
+    with queue._db() as db:
+        assert db.execute("SELECT COUNT(*) FROM blobs WHERE data=?", (b"late",)).fetchone()[0] == 0
+
+
+def test_expired_lease_cannot_finish_before_reclaim(queue):
+    job_id = queue.enqueue("x", {}, b"P", b"G")
+    job, *_ = queue._claim()
+    expire_leases(queue)
+    assert not queue._finish(job, error="boom")
+    assert queue.get(job_id)["status"] == "running"
+    assert queue._claim()[0]["id"] == job_id
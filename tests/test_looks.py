@@ -0,0 +1,99 @@
+import io
+import os
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from fashion_buddy.looks import LookStore
+
+
+def jpeg(seed):
+    buf = io.BytesIO()
+    Image.new("RGB", (600, 400), (seed * 40 % 256, 80, 120)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LookStore(str(tmp_path / "looks"), thumb_side=64)
+
+
+def test_content_addressed_with_thumbnail(store):
+    d1, d2 = store.put_bytes(jpeg(1)), store.put_bytes(jpeg(1))
+    assert d1 == d2 and store.image(d1) == jpeg(1)
+    assert max(Image.open(io.BytesIO(store.thumb(d1))).size) <= 64
+
+
+def test_pages_only_show_the_owners_looks(store):
+    d = store.put_bytes(jpeg(1))
+    mine = [store.record(d, owner="alice", backend="segfit") for _ in range(3)]
+    store.record(d, owner="bob")
+    store.record(d, owner=None)
+    rows, nxt = store.page("alice")
+    assert [r["id"] for r in rows] == mine[::-1] and nxt is None
+    assert store.count("alice") == 3 and store.count("bob") == 1
+    assert store.page("carol") == ([], None)
+
+
+def test_keyset_paging_visits_every_look_once(store):
+    d = store.put_bytes(jpeg(1))
+    ids = [store.record(d, owner="alice", meta={"i": i}) for i in range(7)]
+    seen, cursor = [], None
+    while True:
+        rows, cursor = store.page("alice", before_id=cursor, limit=3)
+        seen += [r["id"] for r in rows]
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+    rows, _ = store.page("alice", limit=1)
+    assert rows[0]["meta"] == {"i": 6}
+
+
+def test_starring_and_deleting_are_owner_scoped(store):
+    d = store.put_bytes(jpeg(1))
+    look = store.record(d, owner="alice")
+    with pytest.raises(PermissionError):
+        store.set_saved(look, owner="bob")
+    with pytest.raises(PermissionError):
+        store.delete(look, owner="bob")
+    store.set_saved(look, owner="alice")
+    assert [r["id"] for r in store.page("alice", saved_only=True)[0]] == [look]
+    assert store.count("alice", saved_only=True) == 1
+
+
+def test_files_go_with_the_last_reference(store):
+    d = store.put_bytes(jpeg(2))
+    a, b = store.record(d, owner="alice"), store.record(d, owner="bob")
+    store.delete(a, owner="alice")
+    assert store.image(d) is not None
+    store.delete(b, owner="bob")
+    assert store.image(d) is None and store.thumb(d) is None
+
+
+def test_legacy_store_gains_owner_column(tmp_path):
+    root = tmp_path / "old"
+    os.makedirs(root)
+    db = sqlite3.connect(root / "index.sqlite3")
+    db.executescript("CREATE TABLE looks(id INTEGER PRIMARY KEY AUTOINCREMENT, digest TEXT NOT NULL, backend TEXT, "
+                     "source_url TEXT, meta TEXT NOT NULL DEFAULT '{}', saved INTEGER NOT NULL DEFAULT 0, "
+                     "created_at REAL NOT NULL);"
+                     "CREATE INDEX looks_saved ON looks(saved, id);"
+                     "INSERT INTO looks(digest, created_at) VALUES ('abc', 0);")
+    db.commit()
+    db.close()
+    store = LookStore(str(root))
+    assert store.count("anyone") == 0  # legacy rows have no owner: visible to nobody
+    store.record("abc", owner="alice")
+    assert store.count("alice") == 1
+
+
+def test_segfit_job_logs_a_failed_history_write(monkeypatch, caplog):
+    from fashion_buddy import tryon
+
+    def broken(**_):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(tryon, "segfit_with_fallback", lambda *a, **k: (True, b"img", None, [{"rung": 0}]))
+    monkeypatch.setattr(tryon, "keep_result", broken)
+    assert tryon.segfit_job({"owner": "alice", "seed": -1}, b"p", b"g") == b"img"
+    assert "not saved to look history" in caplog.text and "database is locked" in caplog.text
@@ -0,0 +1,55 @@
+import itertools
+import random
+
+import pytest
+
+from fashion_buddy.outfit import best_outfits
+
+
+def brute_force(candidates, budget, k, optional=()):
+    slots = [(cat, items + [None] if cat in optional else items) for cat, items in candidates.items() if items]
+    outfits = []
+    for combo in itertools.product(*(items for _, items in slots)):
+        chosen = [it for it in combo if it is not None]
+        if sum(it["price"] for it in chosen) <= budget:
+            outfits.append(sum(it["palette"] + it["style"] for it in chosen))
+    return sorted(outfits, reverse=True)[:k]
+
+
+def random_catalog(rng, cats=("Top", "Bottom", "Shoes"), n=6):
+    return {c: [{"id": f"{c}{i}", "price": rng.randint(5, 120), "palette": round(rng.random(), 3),
+                 "style": round(rng.random(), 3)} for i in range(n)] for c in cats}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    cands = random_catalog(rng)
+    budget = rng.randint(40, 300)
+    got = best_outfits(cands, budget, k=5)
+    assert [o["score"] for o in got] == pytest.approx(brute_force(cands, budget, 5), abs=1e-3)
+    for o in got:
+        assert o["price"] <= budget
+        assert set(o["items"]) == set(cands)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_optional_slots_match_brute_force(seed):
+    rng = random.Random(100 + seed)
+    cands = random_catalog(rng, ("Top", "Bottom", "Shoes", "Accessory"), n=4)
+    budget = rng.randint(30, 250)
+    got = best_outfits(cands, budget, k=4, optional=("Accessory",))
+    assert [o["score"] for o in got] == pytest.approx(brute_force(cands, budget, 4, ("Accessory",)), abs=1e-3)
+
+
+def test_fractional_prices_never_exceed_budget():
+    cands = {"Top": [{"price": 49.99, "palette": 1, "style": 1}, {"price": 10.5, "palette": 0, "style": 0}],
+             "Bottom": [{"price": 50.02, "palette": 1, "style": 1}]}
+    got = best_outfits(cands, 100, k=2)
+    assert [o["price"] for o in got] == [60.52]
+
+
+def test_nothing_fits():
+    cands = {"Top": [{"price": 80, "palette": 1, "style": 1}], "Shoes": [{"price": 90, "palette": 1, "style": 1}]}
+    assert best_outfits(cands, 100) == []
+    assert best_outfits({"Top": []}, 100) == []
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from fashion_buddy import palette_batch
+from fashion_buddy.palette_batch import iter_sources, load_palettes, run_batch
+
+
+@pytest.fixture
+def images(tmp_path):
+    root = tmp_path / "imgs"
+    (root / "a").mkdir(parents=True)
+    (root / "b").mkdir()
+    Image.new("RGB", (64, 64), (200, 30, 40)).save(root / "a" / "red.png")
+    Image.new("RGB", (64, 64), (20, 30, 80)).save(root / "b" / "red.png")  # same file name, other folder
+    two = Image.new("RGB", (64, 64), (245, 245, 245))
+    two.paste((20, 20, 20), (0, 0, 64, 16))
+    two.save(root / "a" / "two.png")
+    (root / "broken.jpg").write_bytes(b"not an image")
+    return root
+
+
+def test_sources_keep_paths_unique(images, tmp_path):
+    assert sorted(i for i, _ in iter_sources(str(images))) == ["a/red.png", "a/two.png", "b/red.png", "broken.jpg"]
+    manifest = tmp_path / "m.csv"
+    manifest.write_text("id,path\nsku1,imgs/a/red.png\n,imgs/b/red.png\n")
+    assert [i for i, _ in iter_sources(str(manifest))] == ["sku1", "imgs/b/red.png"]
+
+
+def test_run_batch_drops_padding_and_failures(images, tmp_path):
+    out = str(tmp_path / "p.npz")
+    stats = run_batch(iter_sources(str(images)), out, k=4, workers=1, log=None)
+    assert (stats["images"], stats["failed"]) == (3, 1)
+    pals = load_palettes(out)
+    assert pals["a/red.png"] == [(200, 30, 40)]
+    assert pals["b/red.png"] == [(20, 30, 80)]
+    assert pals["a/two.png"] == [(245, 245, 245), (20, 20, 20)]
+    with np.load(out) as z:
+        assert z["palettes"].shape == (3, 4, 3)
+        assert np.allclose(z["weights"].sum(axis=1), 1.0)
+
+
+def test_sources_are_read_a_window_at_a_time(images, tmp_path, monkeypatch):
+    path = str(images / "a" / "red.png")
+    read = []
+
+    def sources():
+        for i in range(40):
+            read.append(i)
+            yield f"img{i}", path
+
+    seen = []
+    real = palette_batch.palettes_for_stack
+
+    def spy(hists, **kw):
+        seen.append(len(read))
+        return real(hists, **kw)
+    monkeypatch.setattr(palette_batch, "palettes_for_stack", spy)
+    stats = run_batch(sources(), str(tmp_path / "p.npz"), k=2, workers=1, batch_size=4, window=8, log=None)
+    assert stats["images"] == 40
+    assert seen[0] <= 16  # two windows, not the whole input
+    with np.load(tmp_path / "p.npz") as z:
+        assert list(z["ids"]) == [f"img{i}" for i in range(40)]
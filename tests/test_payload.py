@@ -0,0 +1,57 @@
+import base64
+import io
+import json
+
+import numpy as np
+from PIL import Image
+
+from fashion_buddy.payload import b64_len, encode_segfit_inputs, fit_to_budget, segfit_body
+
+
+def noisy_jpeg(w=1200, h=1600, seed=0):
+    rng = np.random.default_rng(seed)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (h, w, 3), dtype=np.uint8)).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def short_side(data):
+    return min(Image.open(io.BytesIO(data)).size)
+
+
+def test_small_input_is_left_alone():
+    data = noisy_jpeg(100, 100)
+    out, info = fit_to_budget(data, len(data) + 1)
+    assert out is data and not info["reencoded"]
+
+
+def test_fits_budget_without_going_below_min_side():
+    data = noisy_jpeg(seed=1)
+    target = len(data) // 3
+    out, info = fit_to_budget(data, target, min_short_side=768)
+    assert len(out) <= target and info["reencoded"] and not info.get("over_budget")
+    assert short_side(out) >= 768
+    assert fit_to_budget(data, target, min_short_side=768) == (out, info)  # memoized
+
+
+def test_impossible_budget_returns_smallest_attempt():
+    data = noisy_jpeg(seed=2)
+    out, info = fit_to_budget(data, 1000, min_short_side=768)
+    assert info["over_budget"] and len(out) < len(data)
+    assert short_side(out) >= 768
+
+
+def test_segfit_body_is_the_json_it_replaces():
+    person, garment = noisy_jpeg(64, 64, 3), noisy_jpeg(64, 64, 4)
+    params = {"model_type": "Balanced", "cn_strength": 0.8, "seed": 7, "base64": True}
+    assert json.loads(segfit_body(person, garment, params)) == {
+        "model_image": base64.b64encode(person).decode(), "outfit_image": base64.b64encode(garment).decode(), **params}
+    assert json.loads(segfit_body(person, garment, {}))["outfit_image"] == base64.b64encode(garment).decode()
+
+
+def test_encoded_inputs_fit_the_request_budget():
+    person, garment = noisy_jpeg(seed=5), noisy_jpeg(seed=6)
+    budget = (b64_len(len(person)) + b64_len(len(garment))) // 2
+    p, g = encode_segfit_inputs(person, garment, budget, min_short_side=512)
+    assert b64_len(len(p)) + b64_len(len(g)) + 512 <= budget
+    assert encode_segfit_inputs(person, garment, 0) == (person, garment)
@@ -0,0 +1,121 @@
+import base64
+import hashlib
+import hmac
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from fashion_buddy import predictions
+from fashion_buddy.predictions import get_handle, reap_orphans, start_prediction, verify_webhook
+
+SECRET = "whsec_" + base64.b64encode(b"0123456789abcdef0123456789abcdef").decode()
+
+
+def sign(body: bytes, msg_id="msg_1", ts=None, secret=SECRET):
+    ts = str(int(time.time()) if ts is None else ts)
+    key = base64.b64decode(secret.removeprefix("whsec_"))
+    sig = base64.b64encode(hmac.new(key, f"{msg_id}.{ts}.".encode() + body, hashlib.sha256).digest()).decode()
+    return {"webhook-id": msg_id, "webhook-timestamp": ts, "webhook-signature": f"v1,{sig}"}
+
+
+class FakePrediction:
+    def __init__(self, pid, script):
+        self.id, self.status, self.logs, self.output, self.error = pid, "starting", "", None, None
+        self.script = list(script)
+        self.canceled = False
+
+    def reload(self):
+        if self.script:
+            self.status, self.output = self.script.pop(0)
+
+    def cancel(self):
+        self.canceled = True
+        self.status = "canceled"
+
+
+class FakeClient:
+    def __init__(self, *scripts):
+        self.predictions = self
+        self.scripts = list(scripts)
+        self.created = []
+
+    def create(self, version, input, **params):
+        p = FakePrediction(f"p{len(self.created)}", self.scripts.pop(0) if self.scripts else [])
+        self.created.append((version, input, params, p))
+        return p
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.delenv("REPLICATE_WEBHOOK_URL", raising=False)
+    monkeypatch.setattr(predictions, "POLL_MIN_S", 0.01)
+    monkeypatch.setattr(predictions, "POLL_MAX_S", 0.02)
+
+
+def test_verify_webhook():
+    body = b'{"id": "p1"}'
+    assert verify_webhook(SECRET, sign(body), body)
+    assert not verify_webhook(SECRET, sign(body), body + b" ")
+    assert not verify_webhook(SECRET, sign(body, secret="whsec_" + base64.b64encode(b"x" * 32).decode()), body)
+    assert not verify_webhook(SECRET, sign(body, ts=int(time.time()) - 3600), body)
+    assert not verify_webhook(SECRET, {}, body) and not verify_webhook(None, sign(body), body)
+    headers = sign(body)
+    headers["webhook-signature"] = "v1,bogus " + headers["webhook-signature"]  # rotated secrets: any may match
+    assert verify_webhook(SECRET, headers, body)
+
+
+def test_handle_polls_until_terminal():
+    client = FakeClient([("processing", None), ("succeeded", ["https://x/out.png"])])
+    h = start_prediction(client, "owner/model:abc123", {"a": 1})
+    assert client.created[0][:3] == ("abc123", {"a": 1}, {})  # no webhook configured
+    assert get_handle(h.id) is h and h.backend == "model"
+    assert h.wait().status == "succeeded" and h.output == ["https://x/out.png"]
+    assert get_handle(h.id) is None
+
+
+def test_wait_cancels_when_asked():
+    h = start_prediction(FakeClient(), "m:v", {})
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    assert h.wait(cancel=cancel).status == "canceled" and h.prediction.canceled
+
+
+def test_reaper_cancels_only_orphans():
+    client = FakeClient()
+    orphan, watched = start_prediction(client, "m:v", {}), start_prediction(client, "m:v", {})
+    now = time.time() + predictions.ORPHAN_AFTER_S + 1
+    watched.last_seen = now
+    orphan.refresh(heartbeat=False)  # a worker thread polling on the page's behalf is not a heartbeat
+    assert reap_orphans(now) == 1
+    assert orphan.prediction.canceled and orphan.status == "canceled"
+    assert not watched.done
+    watched.cancel()
+
+
+def test_webhook_receiver_applies_only_signed_updates(monkeypatch):
+    monkeypatch.setenv("REPLICATE_WEBHOOK_URL", "https://public.example/hook")
+    monkeypatch.setenv("REPLICATE_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setenv("REPLICATE_WEBHOOK_PORT", "0")
+    monkeypatch.setattr(predictions, "_webhook_server", None)
+    monkeypatch.setattr(predictions, "_webhook_failed", False)
+    client = FakeClient()
+    h = start_prediction(client, "m:v", {})
+    server = predictions._webhook_server
+    try:
+        assert client.created[0][2]["webhook"] == "https://public.example/hook"
+
+        def post(body, headers):
+            conn = http.client.HTTPConnection(*server.server_address[:2])
+            conn.request("POST", "/", body, headers)
+            return conn.getresponse().status
+
+        body = json.dumps({"id": h.id, "status": "succeeded", "output": "https://x/o.png"}).encode()
+        assert post(body, {}) == 401 and not h.done
+        assert post(body, sign(body)) == 204
+        assert h.status == "succeeded" and h.output == "https://x/o.png"
+    finally:
+        server.shutdown()
+        server.server_close()
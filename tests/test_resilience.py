@@ -0,0 +1,83 @@
+import pytest
+
+from fashion_buddy import resilience
+from fashion_buddy.resilience import CircuitBreaker, CircuitOpen, backoff_delay
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", c)
+    return c
+
+
+def trip(br):
+    for _ in range(br.fail_threshold):
+        br.before_call()
+        br.record(False)
+
+
+def test_opens_after_consecutive_failures(clock):
+    br = CircuitBreaker("t", fail_threshold=3, reset_after_s=10)
+    br.record(False)
+    br.record(False)
+    br.record(True)  # success resets the count
+    br.record(False)
+    br.record(False)
+    assert br.state == "closed"
+    br.record(False)
+    assert br.state == "open"
+    with pytest.raises(CircuitOpen):
+        br.before_call()
+
+
+def test_half_open_admits_one_trial(clock):
+    br = CircuitBreaker("t", fail_threshold=1, reset_after_s=10)
+    trip(br)
+    clock.now += 10
+    assert br.state == "half-open"
+    br.before_call()
+    with pytest.raises(CircuitOpen):
+        br.before_call()
+    br.record(True)
+    assert br.state == "closed"
+    br.before_call()
+
+
+def test_failed_trial_reopens(clock):
+    br = CircuitBreaker("t", fail_threshold=2, reset_after_s=10)
+    trip(br)
+    clock.now += 10
+    br.before_call()
+    br.record(False)  # one failure is enough once open
+    assert br.state == "open"
+    with pytest.raises(CircuitOpen):
+        br.before_call()
+
+
+def test_lost_trial_is_given_up(clock):
+    br = CircuitBreaker("t", fail_threshold=1, reset_after_s=10)
+    trip(br)
+    clock.now += 10
+    br.before_call()  # this trial never records
+    clock.now += 5
+    with pytest.raises(CircuitOpen):
+        br.before_call()
+    clock.now += 5
+    br.before_call()  # becomes the new trial
+    with pytest.raises(CircuitOpen):
+        br.before_call()
+
+
+def test_backoff_delay_bounds():
+    for attempt in range(10):
+        d = backoff_delay(attempt, base_s=1.0, max_s=20.0)
+        assert 0 <= d <= min(20.0, 2 ** attempt)
@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fashion_buddy import retail_search
+from fashion_buddy.retail_search import normalize_query, parse_products, search_retailers
+
+
+class Shop(BaseHTTPRequestHandler):
+    hits: Counter = Counter()
+
+    def do_GET(self):
+        path, _, qs = self.path.partition("?")
+        shop = path.strip("/").split("/")[0]
+        q = urllib.parse.parse_qs(qs)["q"][0]
+        Shop.hits[shop] += 1
+        if shop == "slow":
+            time.sleep(0.3)
+        if shop == "down":
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = json.dumps({"products": [{"title": f"{shop} {q}", "price": "39,90"}, {"title": "no price"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def shops():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Shop)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    Shop.hits.clear()
+    retail_search._cache.clear()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield {name: f"{base}/{name}/search?q={{q}}" for name in ("fast", "slow", "down")}
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_products_shapes():
+    assert parse_products({"items": [{"name": "Tee", "price": {"value": 9.5, "currency": "USD"}}]}) == [
+        {"title": "Tee", "price": 9.5, "currency": "USD", "url": None, "image": None}]
+    assert parse_products([{"title": "Coat", "price": "€ 120"}, "junk", {"title": "x"}])[0]["price"] == 120.0
+    assert parse_products({"unexpected": 1}) == []
+    assert len(parse_products([{"title": "t", "price": 1}] * 20, limit=3)) == 3
+
+
+def test_fan_out_yields_every_pair_fastest_first(shops):
+    queries = {"Top": "navy shirt", "Shoes": "white sneakers"}
+    results = list(search_retailers(queries, shops))
+    assert len(results) == 6
+    assert {(r["item"], r["retailer"]) for r in results} == {(i, s) for i in queries for s in shops}
+    assert [r["retailer"] for r in results[-2:]] == ["slow", "slow"]
+    by = {(r["item"], r["retailer"]): r for r in results}
+    assert by["Top", "fast"]["products"] == [
+        {"title": "fast navy shirt", "price": 39.9, "currency": "EUR", "url": None, "image": None}]
+    assert by["Top", "down"]["status"] == "http_503" and by["Top", "down"]["products"] == []
+
+
+def test_reordered_query_is_served_from_cache(shops):
+    assert normalize_query("Navy shirt navy TOP") == "navy shirt top"
+    first = list(search_retailers({"Top": "navy shirt top"}, shops))
+    again = list(search_retailers({"Top": "top Shirt navy"}, shops))
+    assert not any(r["cached"] for r in first)
+    assert {r["retailer"]: r["cached"] for r in again} == {"fast": True, "slow": True, "down": False}
+    assert Shop.hits == Counter({"fast": 1, "slow": 1, "down": 2})  # failures aren't cached
+
+
+def test_unreachable_host_is_an_error():
+    results = list(search_retailers({"Top": "anything"}, {"gone": "http://127.0.0.1:9/search?q={q}"}))
+    assert [r["status"] for r in results] == ["error"]
+    assert list(search_retailers({"Top": "x"}, {})) == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from fashion_buddy.semantic_cache import SemanticCache, bucket, budget_band, embed, negates, vibe_of
+
+
+def test_embedding_is_unit_and_ignores_filler():
+    v = embed("What should I wear to a garden wedding?")
+    assert v.dtype == np.float32 and float(np.linalg.norm(v)) == pytest.approx(1.0, abs=1e-5)
+    assert float(embed("garden wedding") @ v) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_bucket_parts():
+    assert vibe_of("a smart casual look") == "smart casual"
+    assert vibe_of("something casual") == "casual"
+    assert budget_band("budget 120") == "≤150" and budget_band("around 2000 eur") == ">1000"
+    assert negates("no dresses please") and not negates("a dress please")
+    assert bucket("date night, no heels") != bucket("date night, heels")
+
+
+def test_near_duplicate_hits_and_threshold():
+    c = SemanticCache(capacity=10, threshold=0.85)
+    c.set("outfit for a summer garden wedding", "A")
+    answer, sim = c.get("what to wear to a summer garden wedding?")
+    assert answer == "A" and sim >= 0.85
+    answer, sim = c.get("outfit for a winter ski trip")
+    assert answer is None and sim < 0.85
+    strict = SemanticCache(capacity=10, threshold=1.01)
+    strict.set("outfit for a summer garden wedding", "A")
+    assert strict.get("outfit for a summer garden wedding")[0] is None
+
+
+def test_buckets_separate_meaning_changes():
+    c = SemanticCache(capacity=10, threshold=0.5)
+    c.set("casual outfit for a date", "casual")
+    assert c.get("smart casual outfit for a date")[0] is None
+    assert c.get("casual outfit for a date", "female")[0] is None  # caller parts are part of the bucket
+    assert c.get("casual outfit for a date without jeans")[0] is None
+
+
+def test_same_request_refreshes_and_lru_evicts():
+    c = SemanticCache(capacity=2, threshold=0.85)
+    c.set("garden wedding", "A")
+    c.set("garden wedding", "A2")
+    assert c.stats()["items"] == 1 and c.get("garden wedding")[0] == "A2"
+    c.set("ski trip", "B")
+    c.get("garden wedding")  # "ski trip" is now least recently used
+    c.set("beach holiday", "C")
+    assert c.get("ski trip")[0] is None
+    assert c.get("garden wedding")[0] == "A2" and c.get("beach holiday")[0] == "C"
+    assert c.stats()["evictions"] == 1
+
+
+def test_bucket_ids_are_not_registered():
+    c = SemanticCache(capacity=4, threshold=0.85)
+    for i in range(50):
+        c.set("garden wedding", f"A{i}", "sizes", i)
+    assert c.stats()["items"] == 4
+    assert c.get("garden wedding", "sizes", 49)[0] == "A49"
+    assert c.get("garden wedding", "sizes", 0)[0] is None
+    assert not any(isinstance(v, dict) for v in vars(c).values())